@@ -1,8 +1,14 @@
 import time
+from threading import Lock, Event as ThreadEvent
 
+import numpy as np
 from serial import SerialException, Serial
 
-from pyrobotics.commandProtocol.command_protocol import ProtocolConnection, Command
+from pyrobotics.commandProtocol.arduino.motion_profile import SEGMENT_DTYPE, ProfileShape, generate_profile
+from pyrobotics.commandProtocol.arduino.pin_debouncer import PinDebouncer
+from pyrobotics.commandProtocol.command_protocol import ProtocolConnection, ProtocolConnectionClient, Command
+from pyrobotics.event import Event
+from pyrobotics.serial.serial_device_monitor import SerialDeviceMonitor
 from pyrobotics.serial.serial_port import SerialPort
 
 
@@ -15,9 +21,13 @@ class ArduinoCommand:
     TYPE_SET_MOTOR_DIRECTION = 0x33
     TYPE_SET_MOTOR_SPEED = 0x34
     TYPE_MOTOR_ROTATE_TURNS = 0x35
+    # [motor index] + trajectory segments (motion_profile.SEGMENT_DTYPE)
+    TYPE_MOTOR_QUEUE_SEGMENTS = 0x36
+    TYPE_MOTOR_CLEAR_QUEUE = 0x37
 
     TYPE_ADD_ABSOLUTE_ENCODER_LISTENER = 0x40
     TYPE_ADD_MOTOR_STATE_LISTENER = 0x41
+    TYPE_SET_ABSOLUTE_ENCODER_BATCH = 0x42
 
     TYPE_SET_ANALOG = 0x50
     TYPE_SET_DIGITAL = 0x51
@@ -36,13 +46,16 @@ class ArduinoCommand:
 
     TYPE_DIGITAL_PIN_VALUE = 0x71
     TYPE_ABSOLUTE_ENCODER_ANGLE = 0x72
+    # [motor index, state] + optional [queue depth, queue capacity, received segments count (uint16)]
     TYPE_MOTOR_STATE = 0x73
+    # N samples (uint32 device time in microseconds, float angle), little-endian
+    TYPE_ABSOLUTE_ENCODER_SAMPLES = 0x74
 
     # Errors
     TYPE_ERROR = 0x60
 
 
-class ArduinoConnection(ProtocolConnection):
+class ArduinoConnection(ProtocolConnectionClient):
 
     # The delay between the connection by serial port and the sending of a successful connection event
     __SLEEP_AFTER_CONNECTION = 0  # seconds
@@ -51,6 +64,9 @@ class ArduinoConnection(ProtocolConnection):
 
     __CONNECT_AND_WATCHDOG_INTERVAL = 1000
 
+    __DEFAULT_RECONNECT_MIN_DELAY = 0.1  # seconds
+    __DEFAULT_RECONNECT_MAX_DELAY = 5.0  # seconds
+
     def __init__(self, port=None, speed=SerialPort.BAUDRATE_115200, auto_connect=False, use_change_pins_time_filter=True):
         super().__init__()
 
@@ -61,24 +77,69 @@ class ArduinoConnection(ProtocolConnection):
         self.__speed = speed
         self.__serial_manager = None
 
+        # Stable identity of the bound device (SerialDevice.get_key()), the port is resolved on connect
+        self.__device_key = None
+
         self.__connect_watchdog_last_time = 0
 
+        # Reconnection. The connection is closed only by the 'close' call, lost serial port is reopened with
+        # exponential backoff
+        self.__is_closed = False
+        self.__close_event = ThreadEvent()
+        self.__is_reconnect_used = False
+        self.__reconnect_min_delay = self.__DEFAULT_RECONNECT_MIN_DELAY
+        self.__reconnect_max_delay = self.__DEFAULT_RECONNECT_MAX_DELAY
+        self.__reconnects_count = 0
+        # Disconnect event is fired once per lost connection, however many reopen attempts follow it
+        self.__is_disconnect_dispatched = False
+
+        # Setup commands (key -> command) in the order of sending. They are replayed after the reconnection
+        self.__setup_commands = dict()
+        self.__setup_commands_lock = Lock()
+
         # Дребезг
-        self.__listeners_list = dict()
-        self.__filter_interval = self.__DEFAULT_FILTER_INTERVAL
+        self.__pins_debouncer = PinDebouncer(self.__DEFAULT_FILTER_INTERVAL)
+        # Last received command of every pin, delivered when the pin value settles
+        self.__pin_commands = [None] * PinDebouncer.PINS_COUNT
         self.__is_used_change_pins_time_filter = use_change_pins_time_filter
 
         if auto_connect:
             self.connect()
 
     def run(self):
+        while True:
+            self.__read_loop()
+            self.__close_serial_port()
+
+            was_authorized = self.__is_auth_on_arduino
+            self.__is_auth_on_arduino = False
+            if self.__is_closed or not self.__is_reconnect_used:
+                break
+
+            # Connection lost. Event handlers are kept, setup commands are replayed after the authorization
+            if was_authorized and not self.__is_disconnect_dispatched:
+                self._is_connected = False
+                super()._dispatch_on_disconnect()
+                self.__is_disconnect_dispatched = True
+
+            if not self.__reopen_serial_port():
+                break
+
+        if not self.__is_disconnect_dispatched:
+            super()._dispatch_on_disconnect()
+            self.__is_disconnect_dispatched = True
+        super()._clear_event_handlers()
 
+    def __read_loop(self):
         while self.__is_serial_port_connected:
             data = self._read()
             if data is not None:
                 # print("DATA : ", data)
                 self._parser.parse(data)
 
+            if self.__pins_debouncer.has_pending():
+                self.__dispatch_settled_pins()
+
             now = time.time() * 1000
 
             if now - self.__connect_watchdog_last_time > self.__CONNECT_AND_WATCHDOG_INTERVAL:
@@ -88,15 +149,42 @@ class ArduinoConnection(ProtocolConnection):
                     self.__send_try_connect_command()
 
                 self.__connect_watchdog_last_time = now
+
+    def __close_serial_port(self):
         try:
             self.__serial_manager.close()
         except SerialException as msg:
             super()._dispatch_on_error(msg)
 
-        super()._dispatch_on_disconnect()
-        super()._clear_event_handlers()
+    # Returns False if the connection was closed while reconnecting
+    def __reopen_serial_port(self):
+        delay = self.__reconnect_min_delay
+        while not self.__close_event.wait(delay):
+            self.__reconnects_count += 1
+            delay = min(delay * 2, self.__reconnect_max_delay)
+            try:
+                if self.__device_key is not None:
+                    self.__port = self.__resolve_device_port()
+                self.__serial_manager = Serial(self.__port, self.__speed, dsrdtr=1, timeout=0)
+            except Exception:
+                # Port is absent (USB re-enumeration) or busy, try again later
+                continue
+
+            self._parser.reset()
+            self.__pins_debouncer.reset()
+            self.__connect_watchdog_last_time = 0
+            self.__is_serial_port_connected = True
+
+            if self.__is_closed:
+                self.__is_serial_port_connected = False
+                self.__close_serial_port()
+                return False
+            return True
+        return False
 
     def connect(self, port=None):
+        if port is None and self.__device_key is not None:
+            port = self.__resolve_device_port()
         if self.__port is None and port is None:
             error_mes = "Protocol connection exception: connection port not received"
             # super()._dispatch_on_error(error_mes)
@@ -114,7 +202,9 @@ class ArduinoConnection(ProtocolConnection):
             self.start()
 
     def close(self):
+        self.__is_closed = True
         self.__is_serial_port_connected = False
+        self.__close_event.set()
 
     def is_connected(self):
         return self.__is_serial_port_connected and self.__is_auth_on_arduino
@@ -122,14 +212,51 @@ class ArduinoConnection(ProtocolConnection):
     def get_port(self):
         return self.__port
 
+    # Bind the connection to the device (SerialDevice or its key). On connect the current port of the device is taken
+    # from the SerialDeviceMonitor cache, so it is found even if the port path changed after reconnection
+    def bind_device(self, device):
+        self.__device_key = device if isinstance(device, tuple) else device.get_key()
+
+    def get_device_key(self):
+        return self.__device_key
+
+    def __resolve_device_port(self):
+        device = SerialDeviceMonitor.get_instance().get_device_by_key(self.__device_key)
+        if device is None:
+            error_mes = "Protocol connection exception: device " + str(self.__device_key) + " not found"
+            raise Exception(error_mes)
+        return device.get_device()
+
+    def send_command(self, command):
+        self._send_command(command)
+
+    # Reconnection. If the serial port is lost, it is reopened with the delay growing from min to max delay (seconds).
+    # After the authorization the setup commands (motors, listeners, pin modes) are sent again in one write and the
+    # connect event is fired. Setup commands are remembered always, so they are replayed also if the reconnection is
+    # turned on after them
+    def set_auto_reconnect(self, is_used, min_delay=None, max_delay=None):
+        self.__is_reconnect_used = is_used
+        if min_delay is not None:
+            self.__reconnect_min_delay = min_delay
+        if max_delay is not None:
+            self.__reconnect_max_delay = max_delay
+
+    def is_auto_reconnect_used(self):
+        return self.__is_reconnect_used
+
+    # Attempts to reopen the serial port
+    def get_reconnects_count(self):
+        return self.__reconnects_count
+
     # Time filter
     def set_use_change_pins_time_filter(self, is_used, filter_interval=None):
         self.__is_used_change_pins_time_filter = is_used
-        if is_used & filter_interval is not None:
-            self.__filter_interval = filter_interval
+        if is_used and filter_interval is not None:
+            self.__pins_debouncer.set_interval(filter_interval)
 
-    def set_change_pins_time_filter_interval(self, value):
-        self.__filter_interval = value
+    # Interval in milliseconds. If pins list is None the interval is set for all pins
+    def set_change_pins_time_filter_interval(self, value, pins=None):
+        self.__pins_debouncer.set_interval(value, pins)
 
     # #########
     # Private
@@ -151,25 +278,61 @@ class ArduinoConnection(ProtocolConnection):
 
         try:
             self.__serial_manager.write(command.get_bytes())
+            super()._dispatch_on_send_command(command)
         except ConnectionError as msg:
             super()._dispatch_on_error(msg)
-            self.close()
+            self.__on_serial_port_lost()
         except SerialException as msg:
             super()._dispatch_on_error(msg)
-            self.close()
+            self.__on_serial_port_lost()
+
+    # Setup commands are remembered for the replay after the reconnection. The command with the same key replaces the
+    # remembered one. With the reconnection the same command is not sent again (handlers of the connect event repeat
+    # the setup after the reconnection). Returns False if the command was skipped
+    def _send_setup_command(self, command, key=None):
+        if key is None:
+            key = bytes(command.get_bytes())
+        with self.__setup_commands_lock:
+            remembered = self.__setup_commands.get(key)
+            if self.__is_reconnect_used and remembered is not None and remembered.get_bytes() == command.get_bytes():
+                return False
+            self._send_command(command)
+            self.__setup_commands[key] = command
+        return True
 
     def _read(self):
         try:
-            bt = self.__serial_manager.read()
-        except SerialException as msg:
+            bt = self.__serial_manager.read(self.__serial_manager.in_waiting or 1)
+        # in_waiting of the unplugged port raises OSError (EIO), not SerialException
+        except (SerialException, OSError) as msg:
             self._dispatch_on_error(msg)
-            self.close()
+            self.__on_serial_port_lost()
         else:
             if bt != '' and len(bt) > 0:
                 return bt
             else:
                 return None
 
+    # The run loop reopens the port if the reconnection is used or finishes
+    def __on_serial_port_lost(self):
+        self.__is_serial_port_connected = False
+
+    def __replay_setup_commands(self):
+        if not self.__is_reconnect_used:
+            return
+        with self.__setup_commands_lock:
+            commands = list(self.__setup_commands.values())
+        if len(commands) == 0:
+            return
+        try:
+            self.__serial_manager.write(b''.join(command.get_bytes() for command in commands))
+            for command in commands:
+                super()._dispatch_on_send_command(command)
+        # The write to the unplugged port raises OSError (EIO), not SerialException
+        except (SerialException, OSError) as msg:
+            super()._dispatch_on_error(msg)
+            self.__on_serial_port_lost()
+
     # Connection
     def __send_try_connect_command(self):
         self._send_command(Command(Command.TYPE_CONNECT, ProtocolConnection.CONNECT_PASSWORD.encode('utf-8')))
@@ -177,12 +340,20 @@ class ArduinoConnection(ProtocolConnection):
     def __send_watchdog_command(self):
         self._send_command(Command(ArduinoCommand.TYPE_WATCH_DOG, bytes([0])))
 
+    # Pins time filter
+    def __dispatch_settled_pins(self):
+        pins, _values, _times = self.__pins_debouncer.poll()
+        for pin in pins:
+            super()._dispatch_on_command(self.__pin_commands[pin])
+
     # Connection listeners
     def _dispatch_on_command(self, command):
         if command.get_type() == Command.TYPE_CONNECT_RESULT:
             if command.get_integer_data() == 1:
                 time.sleep(self.__SLEEP_AFTER_CONNECTION)
+                self.__replay_setup_commands()
                 self.__is_auth_on_arduino = True
+                self.__is_disconnect_dispatched = False
                 self._dispatch_on_connect()
             else:
                 super()._dispatch_on_error("Authentication error. Password incorrect")
@@ -190,18 +361,15 @@ class ArduinoConnection(ProtocolConnection):
 
         elif command.get_type() == ArduinoCommand.TYPE_DIGITAL_PIN_VALUE:
             if self.__is_used_change_pins_time_filter:
+                data = command.get_data()
+                pin = data[0]
+                value = data[1] if len(data) > 1 else 0
 
-                pin = command.get_data()[0]
-                last_change_time = self.__listeners_list.get(pin)
-                current_time = time.time() * 1000
-
-                if last_change_time is not None:
-                    if (current_time - last_change_time) < self.__filter_interval:
-                        return
+                # Deliver values which settled before this change
+                self.__dispatch_settled_pins()
 
-                self.__listeners_list[pin] = current_time
-
-                super()._dispatch_on_command(command)
+                self.__pin_commands[pin] = command.copy()
+                self.__pins_debouncer.update(pin, value)
 
             else:
                 super()._dispatch_on_command(command)
@@ -248,7 +416,8 @@ class ArduinoPinsController(ArduinoConnection):
 
     # Pins
     def set_pin_mode(self, pin, mode):
-        self._send_command(Command(ArduinoCommand.TYPE_SET_PIN_MODE, bytes([pin, mode])))
+        self._send_setup_command(Command(ArduinoCommand.TYPE_SET_PIN_MODE, bytes([pin, mode])),
+                                 (ArduinoCommand.TYPE_SET_PIN_MODE, pin))
 
     def set_digital_pin(self, pin, value):
         self._send_command(Command(ArduinoCommand.TYPE_SET_DIGITAL, bytes([pin, value])))
@@ -263,7 +432,7 @@ class ArduinoPinsController(ArduinoConnection):
     def add_digital_pin_listener(self, pin, pin_mode=None):
         if pin_mode is not None:
             self.set_pin_mode(pin, pin_mode)
-        self._send_command(Command(ArduinoCommand.TYPE_ADD_DIGITAL_LISTENER, bytes([pin])))
+        self._send_setup_command(Command(ArduinoCommand.TYPE_ADD_DIGITAL_LISTENER, bytes([pin])))
 
 
 class ArduinoGeckoDriveG540Controller(ArduinoConnection):
@@ -276,15 +445,62 @@ class ArduinoGeckoDriveG540Controller(ArduinoConnection):
     MOTOR_STATE_STOPPED = 0x00
     MOTOR_STATE_RUNNABLE = 0x01
 
+    # Segments count in one TYPE_MOTOR_QUEUE_SEGMENTS packet (packet length is one byte)
+    MAX_SEGMENTS_PER_FRAME = (255 - 6 - 1) // SEGMENT_DTYPE.itemsize
+
     def __init__(self, port=None, speed=SerialPort.BAUDRATE_115200, auto_connect=False, use_change_pins_time_filter=True):
         super().__init__(port, speed, auto_connect, use_change_pins_time_filter)
 
+        self.__motor_queues = dict()
+        self._motor_state_event = Event('ArduinoGeckoDriveG540Controller.motor_state')
+        self.add_on_command_event_handler(self._on_command_handler)
+        self.add_on_connect_event_handler(self._on_connect_handler)
+
     def add_motor_state_listener(self, motor_index):
-        self._send_command(Command(ArduinoCommand.TYPE_ADD_MOTOR_STATE_LISTENER, bytes([motor_index])))
+        self._send_setup_command(Command(ArduinoCommand.TYPE_ADD_MOTOR_STATE_LISTENER, bytes([motor_index])))
+
+    # Handler receives (motor index, state)
+    def add_motor_state_handler(self, handler):
+        self._motor_state_event.handle(handler)
+
+    def remove_motor_state_handler(self, handler):
+        self._motor_state_event.unhandle(handler)
+
+    def get_motor_state(self, index):
+        return self.__get_motor_queue(index).state
+
+    # Trajectory streaming.
+    # Segments are queued on the host and sent while the board queue has free space. Queue depth is reported by the
+    # board in TYPE_MOTOR_STATE packets, so the motor state listener is added for the motor.
+    def stream_segments(self, index, segments):
+        queue = self.__get_motor_queue(index)
+        with queue.lock:
+            queue.add_segments(np.asarray(segments, dtype=SEGMENT_DTYPE))
+            if not queue.is_listened:
+                queue.is_listened = True
+                self.add_motor_state_listener(index)
+            self.__send_motor_segments(index, queue)
+
+    # Distance in steps, speed in steps per second, acceleration in steps per second^2
+    def stream_profile(self, index, distance, max_speed, acceleration, shape=ProfileShape.TRAPEZOIDAL, segment_time=0.01):
+        self.stream_segments(index, generate_profile(distance, max_speed, acceleration, segment_time, shape))
+
+    def clear_motor_queue(self, index):
+        queue = self.__get_motor_queue(index)
+        with queue.lock:
+            queue.clear()
+            self._send_command(Command(ArduinoCommand.TYPE_MOTOR_CLEAR_QUEUE, bytes([index])))
+
+    # Segments waiting on the host
+    def get_motor_pending_segments_count(self, index):
+        return self.__get_motor_queue(index).get_pending_count()
+
+    def get_motor_queue_depth(self, index):
+        return self.__get_motor_queue(index).depth
 
     # Motors
     def add_motor(self, steps_count, step_pin, dir_pin):
-        self._send_command(Command(ArduinoCommand.TYPE_ADD_MOTOR, bytes([steps_count, step_pin, dir_pin])))
+        self._send_setup_command(Command(ArduinoCommand.TYPE_ADD_MOTOR, bytes([steps_count, step_pin, dir_pin])))
 
     def start_motor(self, index):
         self._send_command(Command(ArduinoCommand.TYPE_START_MOTOR, bytes([index])))
@@ -309,35 +525,215 @@ class ArduinoGeckoDriveG540Controller(ArduinoConnection):
         data = bytes([index]) + speed_bytes
         self._send_command(Command(ArduinoCommand.TYPE_SET_MOTOR_SPEED, data))
 
+    # Private
+
+    def __get_motor_queue(self, index):
+        queue = self.__motor_queues.get(index)
+        if queue is None:
+            queue = _MotorQueue()
+            self.__motor_queues[index] = queue
+        return queue
+
+    def __send_motor_segments(self, index, queue):
+        while True:
+            segments = queue.take_segments(self.MAX_SEGMENTS_PER_FRAME)
+            if segments is None:
+                return
+            self._send_command(Command(ArduinoCommand.TYPE_MOTOR_QUEUE_SEGMENTS, bytes([index]) + segments.astype(SEGMENT_DTYPE).tobytes()))
+
+    # Board queues are empty after the reconnection, the rest of the interrupted trajectories is dropped
+    def _on_connect_handler(self):
+        for queue in self.__motor_queues.values():
+            with queue.lock:
+                queue.clear()
+                queue.reset_board_queue()
+
+    def _on_command_handler(self, command):
+        if command.get_type() == ArduinoCommand.TYPE_MOTOR_STATE:
+            data = command.get_data()
+            index = data[0]
+            queue = self.__get_motor_queue(index)
+            with queue.lock:
+                queue.state = data[1]
+                if len(data) >= 6:
+                    queue.update_board_queue(data[2], data[3], int.from_bytes(data[4:6], byteorder='big'))
+                    self.__send_motor_segments(index, queue)
+            self._motor_state_event.fire(index, queue.state)
+
+
+# Host side of the board trajectory queue of one motor
+class _MotorQueue(object):
+
+    __COUNTER_PERIOD = 2 ** 16
+
+    def __init__(self):
+        self.lock = Lock()
+        self.is_listened = False
+        self.state = None
+
+        self.__segments = np.empty(0, dtype=SEGMENT_DTYPE)
+        self.__offset = 0
+
+        # Board queue. Capacity is unknown until the first state report
+        self.depth = 0
+        self.__capacity = 0
+        self.__sent_count = 0
+        self.__received_count = 0
+
+    def add_segments(self, segments):
+        self.__segments = np.concatenate((self.__segments[self.__offset:], segments))
+        self.__offset = 0
+
+    def clear(self):
+        self.__segments = np.empty(0, dtype=SEGMENT_DTYPE)
+        self.__offset = 0
+
+    def get_pending_count(self):
+        return self.__segments.size - self.__offset
+
+    def reset_board_queue(self):
+        self.depth = 0
+        self.__capacity = 0
+        self.__sent_count = 0
+        self.__received_count = 0
+
+    def update_board_queue(self, depth, capacity, received_count):
+        self.depth = depth
+        self.__capacity = capacity
+        self.__received_count = received_count
+
+    # Returns the next chunk which fits into the board queue or None
+    def take_segments(self, max_count):
+        in_flight = (self.__sent_count - self.__received_count) % self.__COUNTER_PERIOD
+        free = self.__capacity - self.depth - in_flight
+        count = min(free, max_count, self.get_pending_count())
+        if count <= 0:
+            return None
+
+        segments = self.__segments[self.__offset:self.__offset + count]
+        self.__offset += count
+        self.__sent_count = (self.__sent_count + count) % self.__COUNTER_PERIOD
+        return segments
+
 
 class ArduinoEncoderController(ArduinoConnection):
 
+    # Packet data is limited by one byte packet length
+    _MAX_PACKET_DATA_LENGTH = 255 - 6
+
+    __DEVICE_TIME_PERIOD = 2 ** 32  # microseconds, uint32 overflow
+
+    # Sample of TYPE_ABSOLUTE_ENCODER_SAMPLES: board time and the angle of every registered encoder
+    @staticmethod
+    def get_sample_dtype(encoders_count=1):
+        return np.dtype([('time', '<u4'), ('angles', '<f4', (encoders_count,))])
+
+    @classmethod
+    def get_max_samples_per_frame(cls, encoders_count=1):
+        return cls._MAX_PACKET_DATA_LENGTH // cls.get_sample_dtype(encoders_count).itemsize
+
+    # Returns (times, angles) NumPy arrays, angles shape is (samples, encoders)
+    @classmethod
+    def decode_samples(cls, data, encoders_count=1):
+        dtype = cls.get_sample_dtype(encoders_count)
+        samples = np.frombuffer(bytes(data), dtype=dtype, count=len(data) // dtype.itemsize)
+        return samples['time'], samples['angles']
+
     def __init__(self, port=None, speed=SerialPort.BAUDRATE_115200, auto_connect=False, use_change_pins_time_filter=True):
         super().__init__(port, speed, auto_connect, use_change_pins_time_filter)
 
-        self._angle = None
+        # Angles of the encoders in the order of 'add_absolute_encoder_listener' calls
+        self._angles = None
+        self.__encoders_count = 0
+
+        self._angle_change_event = Event('ArduinoEncoderController.angle_change')
+        self._angle_samples_event = Event('ArduinoEncoderController.angle_samples')
         self.add_on_command_event_handler(self._on_command_handler)
+        self.add_on_connect_event_handler(self._on_connect_handler)
 
-        # self.__last_command_time = millis()
+        # Unwrapped device time of the last sample, microseconds
+        self.__device_time = None
+        self.__last_raw_device_time = 0
 
     ############
     # Public
     ############
 
-    def add_absolute_encoder_listener(self, pins_list):
-        self._send_command(Command(ArduinoCommand.TYPE_ADD_ABSOLUTE_ENCODER_LISTENER, bytes(pins_list)))
+    # Every call adds one encoder. The board sends angles of all encoders in one packet
+    def add_absolute_encoder_listener(self, pins_list, samples_per_frame=1):
+        if self._send_setup_command(Command(ArduinoCommand.TYPE_ADD_ABSOLUTE_ENCODER_LISTENER, bytes(pins_list))):
+            self.__encoders_count += 1
+        if samples_per_frame > 1:
+            self.set_absolute_encoder_batch(samples_per_frame)
+
+    def get_encoders_count(self):
+        return self.__encoders_count
+
+    # The board collects samples with its own timestamps and sends them in TYPE_ABSOLUTE_ENCODER_SAMPLES packets
+    def set_absolute_encoder_batch(self, samples_per_frame):
+        max_samples = self.get_max_samples_per_frame(max(self.__encoders_count, 1))
+        if not 1 <= samples_per_frame <= max_samples:
+            error_mes = "Error. Samples per frame value must be between 1 and " + str(max_samples)
+            raise Exception(error_mes)
+        self.__device_time = None
+        self._send_setup_command(Command(ArduinoCommand.TYPE_SET_ABSOLUTE_ENCODER_BATCH, bytes([samples_per_frame])),
+                                 ArduinoCommand.TYPE_SET_ABSOLUTE_ENCODER_BATCH)
+
+    def get_angle(self, encoder_index=0):
+        if self._angles is None:
+            return None
+        return float(self._angles[encoder_index])
 
-    def get_angle(self):
-        return self._angle
+    def get_angles(self):
+        return self._angles
+
+    # Handler receives (angles, arrival time). Angles - NumPy array, one per encoder. Time in seconds from time.monotonic()
+    def add_angle_change_handler(self, handler):
+        self._angle_change_event.handle(handler)
+
+    def remove_angle_change_handler(self, handler):
+        self._angle_change_event.unhandle(handler)
+
+    # Handler receives (times, angles) NumPy arrays. Times in seconds of the board clock, angles shape (samples, encoders)
+    def add_angle_samples_handler(self, handler):
+        self._angle_samples_event.handle(handler)
+
+    def remove_angle_samples_handler(self, handler):
+        self._angle_samples_event.unhandle(handler)
 
     ############
     # Private
     ############
 
+    # The board clock restarts after the reconnection
+    def _on_connect_handler(self):
+        self.__device_time = None
+
     def _on_command_handler(self, command):
         if command.get_type() == ArduinoCommand.TYPE_ABSOLUTE_ENCODER_ANGLE:
-            self._angle = command.get_float_data(4, 0)
-
-            # now = millis()
-            # print("COMMAND DELTA: ", now - self.__last_command_time)
-            # self.__last_command_time = now
+            arrival_time = time.monotonic()
+            data = command.get_data()
+            self._angles = np.frombuffer(bytes(data), dtype='<f4', count=len(data) // 4).astype(np.float64)
+            self._angle_change_event.fire(self._angles, arrival_time)
+
+        elif command.get_type() == ArduinoCommand.TYPE_ABSOLUTE_ENCODER_SAMPLES:
+            raw_times, angles = self.decode_samples(command.get_data(), max(self.__encoders_count, 1))
+            if raw_times.size == 0:
+                return
+            angles = angles.astype(np.float64)
+            self._angles = angles[-1]
+            self._angle_samples_event.fire(self.__unwrap_device_times(raw_times), angles)
+
+    # uint32 microseconds to continuous seconds
+    def __unwrap_device_times(self, raw_times):
+        raw_times = raw_times.astype(np.int64)
+        steps = np.diff(raw_times, prepend=self.__last_raw_device_time)
+        if self.__device_time is None:
+            steps[0] = 0
+            self.__device_time = int(raw_times[0])
+        steps[steps < 0] += self.__DEVICE_TIME_PERIOD
+        times = self.__device_time + np.cumsum(steps)
+
+        self.__device_time = int(times[-1])
+        self.__last_raw_device_time = int(raw_times[-1])
+        return times / 1_000_000
@@ -1,48 +1,83 @@
-import time
-from threading import Thread
+import numpy as np
 
-from pyrobotics.utils.conversion_utils import millis
 from pyrobotics.commandProtocol.arduino.arduino_controllers import ArduinoEncoderController
+from pyrobotics.commandProtocol.arduino.encoder_speed_estimator import EncoderSpeedEstimator
 from pyrobotics.event import Event
 
 
-class EncoderSpeedometer(object):
+class MultiEncoderSpeedometer(object):
 
-    __DEFAULT_ONE_TURN_DISTANCE = 0.8    # meters
+    """Спидометр по нескольким абсолютным энкодерам (колесам) на одном соединении"""
 
-    def __init__(self, pins_list, port=None, one_turn_distance=__DEFAULT_ONE_TURN_DISTANCE):
+    _DEFAULT_ONE_TURN_DISTANCE = 0.8    # meters
+    _DEFAULT_CHANGE_THRESHOLD = 0.5     # turns per minute
+
+    def __init__(self, pins_lists, port=None, one_turn_distance=_DEFAULT_ONE_TURN_DISTANCE,
+                 filter_type=EncoderSpeedEstimator.Filter.MOVING_WINDOW, change_threshold=_DEFAULT_CHANGE_THRESHOLD,
+                 samples_per_frame=1, **filter_params):
         super().__init__()
 
-        self.__speed_change_event = Event()
+        self._speed_change_event = Event('MultiEncoderSpeedometer.speed_change')
 
-        self.__pins_list = pins_list
+        # One pins list per encoder
+        self.__pins_lists = pins_lists
         self.__port = port
 
         self.__encoder_connection = None
-        self.__check_angle_thread = None
 
-        self.__one_turn_distance = one_turn_distance
+        encoders_count = len(pins_lists)
 
-    #  Distance in meters
-    def get_distance(self):
-        distance = 0
-        if self.__check_angle_thread is not None:
-            distance = self.__check_angle_thread.get_distance()
-        return distance
+        # Distance of one turn for every wheel (meters)
+        self.__one_turn_distances = np.full(encoders_count, one_turn_distance, dtype=np.float64)
 
-    # Speed in turns per minute
-    def get_speed(self):
-        speed = 0
-        if self.__check_angle_thread is not None:
-            speed = self.__check_angle_thread.get_speed()
-        return speed
+        # > 1 - the board sends batches of samples with its own timestamps
+        self.__samples_per_frame = samples_per_frame
+
+        self.__estimator = EncoderSpeedEstimator(filter_type, channels_count=encoders_count, **filter_params)
+        self.__change_threshold = change_threshold
+        self.__notified_speeds = np.zeros(encoders_count, dtype=np.float64)
+        self.__distances = np.zeros(encoders_count, dtype=np.float64)
+        self.__prev_turns = np.zeros(encoders_count, dtype=np.float64)
+
+    def get_encoders_count(self):
+        return self.__distances.size
+
+    # Distances in meters
+    def get_distances(self):
+        return self.__distances.copy()
+
+    def get_mean_distance(self):
+        return float(self.__distances.mean())
+
+    # Speeds in turns per minute
+    def get_speeds(self):
+        return self.__estimator.get_speeds()
+
+    def get_mean_speed(self):
+        return float(self.__estimator.get_speeds().mean())
+
+    # Speeds in meters per second
+    def get_linear_speeds(self):
+        return self.__estimator.get_speeds() / 60 * self.__one_turn_distances
 
-    def set_one_turn_distance(self, value):
-        self.__one_turn_distance = value
+    def get_mean_linear_speed(self):
+        return float(self.get_linear_speeds().mean())
+
+    def set_one_turn_distance(self, value, encoder_index=None):
+        if encoder_index is None:
+            self.__one_turn_distances[:] = value
+        else:
+            self.__one_turn_distances[encoder_index] = value
+
+    # Minimal speed change (turns per minute) which fires the speed change event
+    def set_change_threshold(self, value):
+        self.__change_threshold = value
 
     def create_connection(self):
         self.__encoder_connection = ArduinoEncoderController()
         self.__encoder_connection.add_on_connect_event_handler(self._on_connect)
+        self.__encoder_connection.add_angle_change_handler(self._on_angle_change)
+        self.__encoder_connection.add_angle_samples_handler(self._on_angle_samples)
 
     def connect(self, port=None):
         if port is not None:
@@ -56,7 +91,7 @@ class EncoderSpeedometer(object):
         return self.__encoder_connection.get_port()
 
     def add_speed_change_handler(self, handler):
-        self.__speed_change_event.handle(handler)
+        self._speed_change_event.handle(handler)
 
     def add_on_connect_event_handler(self, handler):
         self.__encoder_connection.add_on_connect_event_handler(handler)
@@ -68,96 +103,65 @@ class EncoderSpeedometer(object):
         self.__encoder_connection.add_on_error_event_handler(handler)
 
     def stop(self):
-        if self.__check_angle_thread is not None:
-            self.__check_angle_thread.stop_camera()
+        if self.__encoder_connection is not None:
+            self.__encoder_connection.remove_angle_change_handler(self._on_angle_change)
+            self.__encoder_connection.remove_angle_samples_handler(self._on_angle_samples)
         if self.is_connected():
             self.__encoder_connection.close()
-        self.__check_angle_thread = None
 
     def _on_connect(self):
-        self.__encoder_connection.add_absolute_encoder_listener(self.__pins_list)
-        self.__check_angle_thread = _CheckEncoderAngleThread(self.__encoder_connection, self.__speed_change_event, self.__one_turn_distance)
-        self.__check_angle_thread.start()
-
-
-class _CheckEncoderAngleThread(Thread):
-
-    def __init__(self, encoder_connection, speed_change_event, one_turn_distance):
-        super().__init__()
-
-        self.__prev_angle = None
-
-        self.__check_angle_last_time = None
-        self.__CHECK_ANGLE_INTERVAL = 0.023  # seconds
-
-        self.__is_started = False
-
-        self.__encoder_connection = encoder_connection
-        self.__speed = 0
-
-        self.__total_distance = 0
-        self.__one_turn_distance = one_turn_distance
-
-        self.__speed_change_event = speed_change_event
-
-    def get_speed(self):
-        return self.__speed
+        self.__estimator.reset()
+        self.__prev_turns[:] = 0.0
+        for pins_list in self.__pins_lists:
+            self.__encoder_connection.add_absolute_encoder_listener(pins_list)
+        if self.__samples_per_frame > 1:
+            self.__encoder_connection.set_absolute_encoder_batch(self.__samples_per_frame)
+
+    # Packets sent while the encoders are being added contain fewer angles, they are skipped.
+    # In the batch mode single angles are stamped with the host time, the batches with the board time, so the single
+    # angles sent before the batch setting takes effect are skipped too
+    def _on_angle_change(self, angles, arrival_time):
+        if angles.size != self.get_encoders_count() or self.__samples_per_frame > 1:
+            return
+        self.__estimator.add_sample(arrival_time, angles)
+        self.__on_speeds_update()
+
+    def _on_angle_samples(self, times, angles):
+        if angles.shape[1] != self.get_encoders_count():
+            return
+        self.__estimator.add_samples(times, angles)
+        self.__on_speeds_update()
+
+    def _dispatch_speed_change(self, speeds):
+        self._speed_change_event.fire(speeds)
+
+    def __on_speeds_update(self):
+        # Distance only in the forward direction
+        turns = self.__estimator.get_all_turns()
+        self.__distances += np.maximum(turns - self.__prev_turns, 0.0) * self.__one_turn_distances
+        self.__prev_turns = turns
+
+        speeds = self.__estimator.get_speeds()
+        if np.any(np.abs(speeds - self.__notified_speeds) >= self.__change_threshold):
+            self.__notified_speeds = speeds
+            self._dispatch_speed_change(speeds)
+
+
+class EncoderSpeedometer(MultiEncoderSpeedometer):
+
+    def __init__(self, pins_list, port=None, one_turn_distance=MultiEncoderSpeedometer._DEFAULT_ONE_TURN_DISTANCE,
+                 filter_type=EncoderSpeedEstimator.Filter.MOVING_WINDOW,
+                 change_threshold=MultiEncoderSpeedometer._DEFAULT_CHANGE_THRESHOLD, samples_per_frame=1, **filter_params):
+        super().__init__([pins_list], port, one_turn_distance, filter_type, change_threshold, samples_per_frame,
+                         **filter_params)
 
+    #  Distance in meters
     def get_distance(self):
-        return self.__total_distance
-
-    def stop(self):
-        self.__is_started = False
-
-    def run(self):
-
-        self.__is_started = True
-
-        self.__check_angle_last_time = millis()
-
-        while self.__is_started:
-
-            time_delta = millis() - self.__check_angle_last_time
+        return self.get_mean_distance()
 
-            # Calculate distance
-            if self.__speed > 0:
-                # distance_delta = self.__one_turn_distance * time_delta / (self.__speed * 60 * 1000)
-                distance_delta = self.__one_turn_distance * (self.__speed / 1000 / 60) * time_delta
-                self.__total_distance += distance_delta
-
-            # Calculate speed
-            angle = self.__encoder_connection.get_angle()
-
-            if angle is not None:
-
-                if self.__prev_angle is not None:
-
-                    angle_delta = 0
-
-                    if self.__prev_angle < angle:
-                        angle_delta = self.__prev_angle + 360 - angle
-                        if angle_delta > 180:
-                            angle_delta = self.__prev_angle - angle
-                    elif self.__prev_angle > angle:
-                        angle_delta = self.__prev_angle - angle
-                        if angle_delta > 180:
-                            angle_delta = self.__prev_angle - 360 - angle
-
-                    speed = (angle_delta / 360) / (time_delta / 1000 / 60)
-
-                    if speed != self.__speed:
-                        self.__speed = speed
-                        # print("angle_delta: ", angle_delta)
-                        # print("time_delta: ", time_delta)
-                        # print("SPEED tur/min: ", self.__speed)
-                        # print("SPEED km/h: ", turns_per_minute_to_kilometers_per_hour(self.__speed, 0.04))
-                        # print("angle: ", angle)
-                        # print("prev_angle: ", self.__prev_angle)
-                        # print("======================================")
-                        self.__speed_change_event.fire(self.__speed)
-
-                self.__prev_angle = angle
-
-            self.__check_angle_last_time += time_delta
+    # Speed in turns per minute
+    def get_speed(self):
+        return self.get_mean_speed()
 
-            time.sleep(self.__CHECK_ANGLE_INTERVAL)
+    def _dispatch_speed_change(self, speeds):
+        self._speed_change_event.fire(float(speeds[0]))
@@ -0,0 +1,446 @@
+import heapq
+import os
+import random
+import select
+import time
+import tty
+from collections import deque
+from threading import Thread, Lock
+
+import numpy as np
+
+from pyrobotics.commandProtocol.arduino.arduino_controllers import ArduinoCommand, ArduinoEncoderController
+from pyrobotics.commandProtocol.arduino.motion_profile import SEGMENT_DTYPE
+from pyrobotics.commandProtocol.command_protocol import Command, ProtocolConnection, _Parser
+
+
+class ArduinoSimulator(Thread):
+
+    """Виртуальная плата Arduino на псевдотерминале (Linux). Порт 'get_port()' открывается ArduinoConnection как обычный"""
+
+    __BUFFER_SIZE = 255
+    __READ_SIZE = 4096
+
+    __DEFAULT_ENCODER_RATE = 500        # samples per second
+    __DEFAULT_MOTOR_STATE_RATE = 50     # reports per second
+    __DEFAULT_MOTOR_QUEUE_CAPACITY = 64  # segments
+    __DEFAULT_WATCHDOG_TIMEOUT = 3.0    # seconds
+
+    def __init__(self, encoder_rate=__DEFAULT_ENCODER_RATE, motor_state_rate=__DEFAULT_MOTOR_STATE_RATE,
+                 motor_queue_capacity=__DEFAULT_MOTOR_QUEUE_CAPACITY, watchdog_timeout=__DEFAULT_WATCHDOG_TIMEOUT):
+        super().__init__(daemon=True)
+
+        self.__master_fd, self.__slave_fd = os.openpty()
+        # Binary data without line discipline translations (0x0D, 0x0A) and echo
+        tty.setraw(self.__slave_fd)
+        tty.setraw(self.__master_fd)
+        self.__port = os.ttyname(self.__slave_fd)
+
+        self.__parser = _Parser(self.__BUFFER_SIZE)
+        self.__parser.on_command_event.handle(self.__on_command)
+
+        self.__lock = Lock()
+        self.__is_started = False
+        self.__start_time = time.monotonic()
+
+        self.__is_authorized = False
+        self.__watchdog_timeout = watchdog_timeout
+        self.__last_watchdog_time = 0.0
+
+        # Pins
+        self.__pin_modes = dict()
+        self.__pin_values = dict()
+        self.__listened_pins = set()
+        self.__pin_changes = []  # heap of (time, order, pin, value)
+
+        # Encoders
+        self.__encoder_rate = encoder_rate
+        self.__encoders = []
+        self.__encoder_batch = 1
+        self.__encoder_samples = []
+        self.__next_encoder_time = 0.0
+
+        # Motors
+        self.__motor_state_rate = motor_state_rate
+        self.__motor_queue_capacity = motor_queue_capacity
+        self.__motors = []
+        self.__next_motor_state_time = 0.0
+
+        # Noise and delays
+        self.__response_delay = 0.0
+        self.__response_jitter = 0.0
+        self.__drop_probability = 0.0
+        self.__angle_noise = 0.0
+        self.__outgoing = []  # heap of (time, order, bytes)
+        self.__last_send_time = 0.0
+        self.__order = 0
+
+        # Statistics
+        self.__received_commands_count = 0
+        self.__sent_commands_count = 0
+        self.__dropped_commands_count = 0
+        self.__sent_bytes_count = 0
+
+    def get_port(self):
+        return self.__port
+
+    def stop(self):
+        self.__is_started = False
+
+    def close(self):
+        self.stop()
+        if self.is_alive():
+            self.join()
+        os.close(self.__master_fd)
+        os.close(self.__slave_fd)
+
+    def is_authorized(self):
+        return self.__is_authorized
+
+    # Noise and delays
+
+    # Delay of every packet sent by the board: delay + uniform(0, jitter) seconds. Packets order is kept
+    def set_response_delay(self, delay, jitter=0.0):
+        self.__response_delay = delay
+        self.__response_jitter = jitter
+
+    def set_drop_probability(self, value):
+        self.__drop_probability = value
+
+    # Standard deviation of the encoder angle noise in degrees
+    def set_angle_noise(self, value):
+        self.__angle_noise = value
+
+    # Pins
+
+    # Change an input pin. Bounces - count of extra toggles before the value settles
+    def set_digital_input(self, pin, value, bounces=0, bounce_interval=0.002):
+        now = time.monotonic()
+        with self.__lock:
+            for i in range(bounces):
+                self.__push_pin_change(now + i * bounce_interval, pin, value if (bounces - i) % 2 == 0 else 1 - value)
+            self.__push_pin_change(now + bounces * bounce_interval, pin, value)
+
+    def get_digital_output(self, pin):
+        return self.__pin_values.get(pin)
+
+    def get_pin_mode(self, pin):
+        return self.__pin_modes.get(pin)
+
+    # Encoders
+
+    # Speed in turns per minute, positive - decreasing angle
+    def set_encoder_speed(self, encoder_index, speed):
+        with self.__lock:
+            self.__rotate_encoders(time.monotonic())
+            self.__encoders[encoder_index][1] = speed / 60
+
+    def get_encoders_count(self):
+        return len(self.__encoders)
+
+    # Motors
+
+    def get_motors_count(self):
+        return len(self.__motors)
+
+    def get_motor_position(self, index):
+        return self.__motors[index].position
+
+    # Statistics
+
+    def get_received_commands_count(self):
+        return self.__received_commands_count
+
+    def get_sent_commands_count(self):
+        return self.__sent_commands_count
+
+    def get_dropped_commands_count(self):
+        return self.__dropped_commands_count
+
+    def get_sent_bytes_count(self):
+        return self.__sent_bytes_count
+
+    # Loop
+
+    def run(self):
+        self.__is_started = True
+        while self.__is_started:
+            now = time.monotonic()
+            with self.__lock:
+                self.__update(now)
+                timeout = self.__get_next_event_time(now) - now
+
+            readable, _, _ = select.select([self.__master_fd], [], [], max(timeout, 0.0))
+            if readable:
+                try:
+                    data = os.read(self.__master_fd, self.__READ_SIZE)
+                except OSError:
+                    # Other side of the terminal is closed
+                    data = b''
+                if data:
+                    with self.__lock:
+                        self.__parser.parse(data)
+
+    def __update(self, now):
+        if self.__is_authorized and now - self.__last_watchdog_time > self.__watchdog_timeout:
+            self.__reset()
+
+        while self.__pin_changes and self.__pin_changes[0][0] <= now:
+            _, _, pin, value = heapq.heappop(self.__pin_changes)
+            self.__pin_values[pin] = value
+            if pin in self.__listened_pins:
+                self.__send(ArduinoCommand.TYPE_DIGITAL_PIN_VALUE, bytes([pin, value]), now)
+
+        for motor in self.__motors:
+            motor.update(now)
+
+        if self.__is_authorized and self.__encoders and now >= self.__next_encoder_time:
+            self.__sample_encoders(now)
+
+        if self.__is_authorized and now >= self.__next_motor_state_time:
+            self.__next_motor_state_time = now + 1 / self.__motor_state_rate
+            for index, motor in enumerate(self.__motors):
+                if motor.is_listened:
+                    self.__send(ArduinoCommand.TYPE_MOTOR_STATE, motor.get_state_data(index), now)
+
+        while self.__outgoing and self.__outgoing[0][0] <= now:
+            _, _, packet = heapq.heappop(self.__outgoing)
+            os.write(self.__master_fd, packet)
+            self.__sent_bytes_count += len(packet)
+
+    def __get_next_event_time(self, now):
+        times = [now + 0.1]
+        if self.__pin_changes:
+            times.append(self.__pin_changes[0][0])
+        if self.__outgoing:
+            times.append(self.__outgoing[0][0])
+        if self.__is_authorized:
+            if self.__encoders:
+                times.append(self.__next_encoder_time)
+            if any(motor.is_listened for motor in self.__motors):
+                times.append(self.__next_motor_state_time)
+            if any(motor.is_running() for motor in self.__motors):
+                times.append(now + 0.001)
+        return min(times)
+
+    def __sample_encoders(self, now):
+        self.__next_encoder_time = max(self.__next_encoder_time + 1 / self.__encoder_rate, now)
+
+        elapsed = now - self.__start_time
+        self.__rotate_encoders(now)
+        angles = [angle for angle, _speed, _time in self.__encoders]
+        if self.__angle_noise > 0:
+            angles = [(angle + random.gauss(0, self.__angle_noise)) % 360 for angle in angles]
+
+        if self.__encoder_batch <= 1:
+            self.__send(ArduinoCommand.TYPE_ABSOLUTE_ENCODER_ANGLE, np.asarray(angles, dtype='<f4').tobytes(), now)
+            return
+
+        self.__encoder_samples.append((int(elapsed * 1_000_000) % 2 ** 32, angles))
+        if len(self.__encoder_samples) >= self.__encoder_batch:
+            samples = np.empty(len(self.__encoder_samples), dtype=ArduinoEncoderController.get_sample_dtype(len(angles)))
+            samples['time'] = [sample[0] for sample in self.__encoder_samples]
+            samples['angles'] = [sample[1] for sample in self.__encoder_samples]
+            self.__encoder_samples = []
+            self.__send(ArduinoCommand.TYPE_ABSOLUTE_ENCODER_SAMPLES, samples.tobytes(), now)
+
+    def __send(self, command_type, data, now):
+        if self.__drop_probability > 0 and random.random() < self.__drop_probability:
+            self.__dropped_commands_count += 1
+            return
+
+        send_time = now + self.__response_delay
+        if self.__response_jitter > 0:
+            send_time += random.uniform(0, self.__response_jitter)
+        # Serial line keeps the packets order
+        send_time = max(send_time, self.__last_send_time)
+        self.__last_send_time = send_time
+
+        self.__order += 1
+        heapq.heappush(self.__outgoing, (send_time, self.__order, Command(command_type, data).get_bytes()))
+        self.__sent_commands_count += 1
+
+    # Encoder - [angle, speed, time of the angle], the angle is integrated so a speed change does not make it jump
+    def __rotate_encoders(self, now):
+        for encoder in self.__encoders:
+            angle, speed, angle_time = encoder
+            if now > angle_time:
+                encoder[0] = (angle - speed * 360 * (now - angle_time)) % 360
+                encoder[2] = now
+
+    def __push_pin_change(self, change_time, pin, value):
+        self.__order += 1
+        heapq.heappush(self.__pin_changes, (change_time, self.__order, pin, value))
+
+    def __reset(self):
+        self.__is_authorized = False
+        self.__listened_pins.clear()
+        self.__encoders = []
+        self.__encoder_batch = 1
+        self.__encoder_samples = []
+        self.__motors = []
+
+    # Commands from the host
+
+    def __on_command(self, command):
+        self.__received_commands_count += 1
+        now = time.monotonic()
+        command_type = command.get_type()
+        data = command.get_data()
+
+        if command_type == Command.TYPE_CONNECT:
+            if command.get_string_data() == ProtocolConnection.CONNECT_PASSWORD:
+                self.__reset()
+                self.__is_authorized = True
+                self.__last_watchdog_time = now
+                self.__send(Command.TYPE_CONNECT_RESULT, ProtocolConnection.CONNECT_SUCCESSFUL, now)
+            else:
+                self.__send(Command.TYPE_CONNECT_RESULT, ProtocolConnection.CONNECT_ERROR, now)
+            return
+
+        if not self.__is_authorized:
+            return
+
+        self.__last_watchdog_time = now
+
+        if command_type == ArduinoCommand.TYPE_WATCH_DOG:
+            pass
+
+        # Pins
+        elif command_type == ArduinoCommand.TYPE_SET_PIN_MODE:
+            self.__pin_modes[data[0]] = data[1]
+        elif command_type in (ArduinoCommand.TYPE_SET_DIGITAL, ArduinoCommand.TYPE_SET_ANALOG):
+            self.__pin_values[data[0]] = data[1]
+        elif command_type == ArduinoCommand.TYPE_GET_DIGITAL:
+            self.__send(ArduinoCommand.TYPE_DIGITAL_PIN_VALUE, bytes([data[0], self.__pin_values.get(data[0], 0)]), now)
+        elif command_type == ArduinoCommand.TYPE_ADD_DIGITAL_LISTENER:
+            self.__listened_pins.add(data[0])
+        elif command_type in (ArduinoCommand.TYPE_SERVO_ATTACH, ArduinoCommand.TYPE_SERVO_ROTATE,
+                              ArduinoCommand.TYPE_SERVO_DETACH):
+            pass
+
+        # Encoders
+        elif command_type == ArduinoCommand.TYPE_ADD_ABSOLUTE_ENCODER_LISTENER:
+            self.__encoders.append([random.uniform(0, 360), 0.0, now])
+            self.__encoder_samples = []
+            self.__next_encoder_time = now
+        elif command_type == ArduinoCommand.TYPE_SET_ABSOLUTE_ENCODER_BATCH:
+            self.__encoder_batch = data[0]
+            self.__encoder_samples = []
+
+        # Motors
+        elif command_type == ArduinoCommand.TYPE_ADD_MOTOR:
+            self.__motors.append(_SimulatedMotor(steps_count=data[0], queue_capacity=self.__motor_queue_capacity))
+        elif command_type == ArduinoCommand.TYPE_ADD_MOTOR_STATE_LISTENER:
+            self.__get_motor(data[0]).is_listened = True
+        elif command_type == ArduinoCommand.TYPE_START_MOTOR:
+            self.__get_motor(data[0]).start(now)
+        elif command_type == ArduinoCommand.TYPE_STOP_MOTOR:
+            self.__get_motor(data[0]).stop()
+        elif command_type == ArduinoCommand.TYPE_SET_MOTOR_DIRECTION:
+            self.__get_motor(data[0]).direction = 1 if data[1] else -1
+        elif command_type == ArduinoCommand.TYPE_SET_MOTOR_SPEED:
+            self.__get_motor(data[0]).speed = int.from_bytes(data[1:5], byteorder='big')
+        elif command_type == ArduinoCommand.TYPE_MOTOR_ROTATE_TURNS:
+            self.__get_motor(data[0]).rotate_turns(int.from_bytes(data[1:5], byteorder='big'), now)
+        elif command_type == ArduinoCommand.TYPE_MOTOR_QUEUE_SEGMENTS:
+            self.__get_motor(data[0]).add_segments(np.frombuffer(bytes(data[1:]), dtype=SEGMENT_DTYPE), now)
+        elif command_type == ArduinoCommand.TYPE_MOTOR_CLEAR_QUEUE:
+            self.__get_motor(data[0]).clear_queue()
+
+        else:
+            self.__send(ArduinoCommand.TYPE_ERROR, "Unknown command " + hex(command_type), now)
+
+    def __get_motor(self, index):
+        while len(self.__motors) <= index:
+            self.__motors.append(_SimulatedMotor(queue_capacity=self.__motor_queue_capacity))
+        return self.__motors[index]
+
+
+class _SimulatedMotor(object):
+
+    __DEFAULT_STEPS_COUNT = 200  # steps per turn
+
+    def __init__(self, steps_count=__DEFAULT_STEPS_COUNT, queue_capacity=64):
+        self.steps_count = steps_count or self.__DEFAULT_STEPS_COUNT
+        self.is_listened = False
+
+        self.direction = 1
+        self.speed = 0  # steps per second
+        self.position = 0.0  # steps
+
+        self.__is_running = False
+        self.__target_steps = None
+        self.__last_update_time = None
+
+        # Trajectory queue
+        self.__queue = deque()
+        self.__queue_capacity = queue_capacity
+        self.__received_count = 0
+        self.__segment_end_time = None
+        self.__segment_rate = 0.0
+
+    def is_running(self):
+        return self.__is_running or self.__segment_end_time is not None
+
+    def start(self, now):
+        self.__is_running = True
+        self.__target_steps = None
+        self.__last_update_time = now
+
+    def stop(self):
+        self.__is_running = False
+        self.__target_steps = None
+
+    def rotate_turns(self, turns, now):
+        self.start(now)
+        self.__target_steps = turns * self.steps_count
+
+    def add_segments(self, segments, now):
+        for steps, duration in segments.tolist():
+            if len(self.__queue) < self.__queue_capacity:
+                self.__queue.append((steps, duration / 1000))
+        self.__received_count = (self.__received_count + len(segments)) % 2 ** 16
+        if self.__segment_end_time is None:
+            self.__last_update_time = now
+            self.__next_segment(now)
+
+    def clear_queue(self):
+        self.__queue.clear()
+        self.__segment_end_time = None
+
+    def get_state_data(self, index):
+        state = 0x01 if self.is_running() else 0x00
+        return bytes([index, state, len(self.__queue), self.__queue_capacity]) + \
+            self.__received_count.to_bytes(2, byteorder='big')
+
+    def update(self, now):
+        if self.__segment_end_time is not None:
+            while self.__segment_end_time is not None and now >= self.__segment_end_time:
+                self.__move(self.__segment_end_time - self.__last_update_time, self.__segment_rate)
+                self.__last_update_time = self.__segment_end_time
+                self.__next_segment(self.__segment_end_time)
+            if self.__segment_end_time is not None:
+                self.__move(now - self.__last_update_time, self.__segment_rate)
+                self.__last_update_time = now
+
+        elif self.__is_running:
+            steps = self.speed * (now - self.__last_update_time)
+            if self.__target_steps is not None:
+                steps = min(steps, self.__target_steps)
+                self.__target_steps -= steps
+                if self.__target_steps <= 0:
+                    self.stop()
+            self.position += self.direction * steps
+            self.__last_update_time = now
+
+    def __next_segment(self, start_time):
+        if not self.__queue:
+            self.__segment_end_time = None
+            return
+        steps, duration = self.__queue.popleft()
+        self.__segment_rate = steps / duration
+        self.__segment_end_time = start_time + duration
+
+    def __move(self, dt, rate):
+        self.position += self.direction * rate * dt
@@ -0,0 +1,207 @@
+from enum import Enum
+
+import numpy as np
+
+
+class EncoderSpeedEstimator(object):
+
+    """Оценка скорости абсолютных энкодеров по потоку (время, углы). Все каналы считаются одним шагом"""
+
+    class Filter(Enum):
+        MOVING_WINDOW = "Moving window"
+        ALPHA_BETA = "Alpha-beta"
+        KALMAN = "Kalman"
+
+        @classmethod
+        def get_names(cls):
+            return [filter_type.name for filter_type in cls]
+
+        @classmethod
+        def get_by_name(cls, name):
+            return cls[name]
+
+    __DEFAULT_WINDOW_SIZE = 16
+
+    __DEFAULT_ALPHA = 0.5
+    __DEFAULT_BETA = 0.1
+
+    __DEFAULT_PROCESS_NOISE = 10.0      # (turns/sec^2)^2
+    __DEFAULT_MEASUREMENT_NOISE = 1e-6  # turns^2
+
+    def __init__(self, filter_type: Filter = Filter.MOVING_WINDOW, window_size: int = __DEFAULT_WINDOW_SIZE,
+                 alpha: float = __DEFAULT_ALPHA, beta: float = __DEFAULT_BETA,
+                 process_noise: float = __DEFAULT_PROCESS_NOISE, measurement_noise: float = __DEFAULT_MEASUREMENT_NOISE,
+                 channels_count: int = 1):
+
+        self.__filter_type = filter_type
+
+        self.__alpha = alpha
+        self.__beta = beta
+        self.__process_noise = process_noise
+        self.__measurement_noise = measurement_noise
+
+        # Ring buffer of sample times (seconds) and unwrapped positions (turns) of every channel
+        self.__times = np.zeros(window_size, dtype=np.float64)
+        self.__turns = np.zeros((window_size, channels_count), dtype=np.float64)
+        self.__index = 0
+        self.__count = 0
+
+        self.__prev_angles = None
+        self.__total_turns = np.zeros(channels_count, dtype=np.float64)
+
+        # Filter state. Position in turns, speed in turns per second
+        self.__positions = np.zeros(channels_count, dtype=np.float64)
+        self.__speeds = np.zeros(channels_count, dtype=np.float64)
+        self.__covariance = None
+
+    def reset(self) -> None:
+        self.__index = 0
+        self.__count = 0
+        self.__prev_angles = None
+        self.__total_turns[:] = 0.0
+        self.__positions[:] = 0.0
+        self.__speeds[:] = 0.0
+        self.__covariance = None
+
+    def get_filter_type(self) -> Filter:
+        return self.__filter_type
+
+    def get_channels_count(self) -> int:
+        return self.__total_turns.size
+
+    # Speed in turns per minute
+    def get_speed(self, channel: int = 0) -> float:
+        return float(self.__speeds[channel]) * 60
+
+    def get_speeds(self) -> np.ndarray:
+        return self.__speeds * 60
+
+    # Unwrapped position in turns since the first sample
+    def get_turns(self, channel: int = 0) -> float:
+        return float(self.__total_turns[channel])
+
+    def get_all_turns(self) -> np.ndarray:
+        return self.__total_turns.copy()
+
+    def get_samples_count(self) -> int:
+        return self.__count
+
+    # Timestamp in seconds, angles in degrees (a number or one angle per channel)
+    def add_sample(self, timestamp: float, angles) -> None:
+        angles = np.asarray(angles, dtype=np.float64).reshape(-1)
+        if self.__prev_angles is not None:
+            # Positive direction - decreasing angle
+            self.__total_turns += ((self.__prev_angles - angles + 180) % 360 - 180) / 360
+        self.__prev_angles = angles
+
+        self.__add_positions(timestamp, self.__total_turns.copy())
+
+    # Batch of samples ordered by time. Angles shape is (samples,) or (samples, channels)
+    def add_samples(self, timestamps, angles) -> None:
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        angles = np.asarray(angles, dtype=np.float64).reshape(timestamps.size, -1)
+        if timestamps.size == 0:
+            return
+
+        prev_angles = angles[:1] if self.__prev_angles is None else self.__prev_angles[np.newaxis]
+        prev_angles = np.concatenate((prev_angles, angles[:-1]))
+        turns = self.__total_turns + np.cumsum((prev_angles - angles + 180) % 360 - 180, axis=0) / 360
+
+        self.__prev_angles = angles[-1].copy()
+        self.__total_turns = turns[-1].copy()
+
+        if self.__filter_type == self.Filter.MOVING_WINDOW:
+            self.__add_positions_to_window(timestamps, turns)
+        else:
+            for timestamp, positions in zip(timestamps.tolist(), turns):
+                self.__add_positions(timestamp, positions)
+
+    def __add_positions(self, timestamp: float, positions: np.ndarray) -> None:
+        if self.__count > 0:
+            dt = timestamp - self.__times[self.__index - 1]
+            if dt <= 0:
+                return
+        else:
+            dt = 0.0
+
+        window_size = self.__times.size
+        self.__times[self.__index] = timestamp
+        self.__turns[self.__index] = positions
+        self.__index = (self.__index + 1) % window_size
+        self.__count = min(self.__count + 1, window_size)
+
+        if self.__count == 1:
+            self.__positions[:] = positions
+            self.__speeds[:] = 0.0
+            self.__covariance = None
+        elif self.__filter_type == self.Filter.MOVING_WINDOW:
+            self.__update_moving_window()
+        elif self.__filter_type == self.Filter.ALPHA_BETA:
+            self.__update_alpha_beta(dt, positions)
+        else:
+            self.__update_kalman(dt, positions)
+
+    # Write the batch into the ring buffer and fit the window once
+    def __add_positions_to_window(self, timestamps: np.ndarray, positions: np.ndarray) -> None:
+        # Every sample is later than all samples before it, including the samples already in the buffer
+        last_time = self.__times[self.__index - 1] if self.__count > 0 else -np.inf
+        previous_max = np.maximum.accumulate(np.concatenate(([last_time], timestamps[:-1])))
+        increasing = timestamps > previous_max
+        timestamps = timestamps[increasing]
+        positions = positions[increasing]
+
+        window_size = self.__times.size
+        count = timestamps.size
+        tail = min(count, window_size)
+        indices = (self.__index + count - tail + np.arange(tail)) % window_size
+
+        self.__times[indices] = timestamps[-tail:]
+        self.__turns[indices] = positions[-tail:]
+        self.__index = (self.__index + count) % window_size
+        self.__count = min(self.__count + count, window_size)
+
+        if self.__count > 1:
+            self.__update_moving_window()
+
+    # Least squares slope of the positions in the ring buffer
+    def __update_moving_window(self) -> None:
+        times = self.__times[:self.__count]
+        turns = self.__turns[:self.__count]
+        times = times - times.mean()
+        denominator = np.dot(times, times)
+        if denominator > 0:
+            self.__speeds[:] = np.dot(times, turns - turns.mean(axis=0)) / denominator
+
+    def __update_alpha_beta(self, dt: float, measured: np.ndarray) -> None:
+        predicted = self.__positions + self.__speeds * dt
+        residual = measured - predicted
+        self.__positions[:] = predicted + self.__alpha * residual
+        self.__speeds += self.__beta * residual / dt
+
+    # Constant speed model, state (position, speed) of every channel
+    def __update_kalman(self, dt: float, measured: np.ndarray) -> None:
+        if self.__covariance is None:
+            self.__positions[:] = measured
+            self.__speeds[:] = (self.__turns[self.__index - 1] - self.__turns[self.__index - 2]) / dt
+            r = self.__measurement_noise
+            self.__covariance = (np.full_like(measured, r), np.zeros_like(measured), np.full_like(measured, 2 * r / (dt * dt)))
+            return
+
+        p00, p01, p11 = self.__covariance
+        q = self.__process_noise
+
+        # Predict
+        positions = self.__positions + self.__speeds * dt
+        p00 = p00 + dt * (2 * p01 + dt * p11) + q * dt ** 3 / 3
+        p01 = p01 + dt * p11 + q * dt ** 2 / 2
+        p11 = p11 + q * dt
+
+        # Correct
+        s = p00 + self.__measurement_noise
+        k0 = p00 / s
+        k1 = p01 / s
+        residual = measured - positions
+
+        self.__positions[:] = positions + k0 * residual
+        self.__speeds += k1 * residual
+        self.__covariance = ((1 - k0) * p00, (1 - k0) * p01, p11 - k1 * p01)
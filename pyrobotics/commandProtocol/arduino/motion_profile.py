@@ -0,0 +1,85 @@
+from enum import Enum
+from math import pi, sqrt
+
+import numpy as np
+
+
+# Segment of a stepper motor trajectory: steps count made evenly during the duration (milliseconds)
+SEGMENT_DTYPE = np.dtype([('steps', '>u4'), ('duration', '>u2')])
+
+
+class ProfileShape(Enum):
+    TRAPEZOIDAL = "Trapezoidal"
+    S_CURVE = "S-curve"
+
+    @classmethod
+    def get_names(cls):
+        return [shape.name for shape in cls]
+
+    @classmethod
+    def get_by_name(cls, name):
+        return cls[name]
+
+
+_DEFAULT_SEGMENT_TIME = 0.01  # seconds
+
+
+# Distance in steps, speed in steps per second, acceleration in steps per second^2.
+# Returns array of SEGMENT_DTYPE segments
+def trapezoidal_profile(distance, max_speed, acceleration, segment_time=_DEFAULT_SEGMENT_TIME) -> np.ndarray:
+    return generate_profile(distance, max_speed, acceleration, segment_time, ProfileShape.TRAPEZOIDAL)
+
+
+# Acceleration is the peak acceleration of the smooth (cosine) speed ramps
+def s_curve_profile(distance, max_speed, acceleration, segment_time=_DEFAULT_SEGMENT_TIME) -> np.ndarray:
+    return generate_profile(distance, max_speed, acceleration, segment_time, ProfileShape.S_CURVE)
+
+
+def generate_profile(distance, max_speed, acceleration, segment_time=_DEFAULT_SEGMENT_TIME,
+                     shape=ProfileShape.TRAPEZOIDAL) -> np.ndarray:
+    if distance <= 0 or max_speed <= 0 or acceleration <= 0 or segment_time <= 0:
+        raise Exception("Motion profile error. Distance, speed, acceleration and segment time must be positive")
+
+    # Ramp time is k * speed / acceleration, ramp distance is speed * ramp_time / 2
+    k = 1.0 if shape == ProfileShape.TRAPEZOIDAL else pi / 2
+
+    speed = min(max_speed, sqrt(distance * acceleration / k))
+    ramp_time = k * speed / acceleration
+    ramp_distance = speed * ramp_time / 2
+    cruise_time = (distance - 2 * ramp_distance) / speed
+    total_time = 2 * ramp_time + cruise_time
+
+    times = np.append(np.arange(0.0, total_time, segment_time), total_time)
+
+    positions = np.empty_like(times)
+    accelerating = times < ramp_time
+    decelerating = times > ramp_time + cruise_time
+    cruising = ~accelerating & ~decelerating
+
+    positions[accelerating] = _ramp_position(times[accelerating], speed, ramp_time, shape)
+    positions[cruising] = ramp_distance + speed * (times[cruising] - ramp_time)
+    positions[decelerating] = distance - _ramp_position(total_time - times[decelerating], speed, ramp_time, shape)
+
+    # Rounding of the accumulated values keeps the total steps count and time exact
+    steps = np.diff(np.rint(positions).astype(np.int64))
+    durations = np.diff(np.rint(times * 1000).astype(np.int64))
+
+    valid = durations > 0
+    segments = np.empty(np.count_nonzero(valid), dtype=SEGMENT_DTYPE)
+    segments['steps'] = steps[valid]
+    segments['duration'] = durations[valid]
+    return segments
+
+
+def _ramp_position(times, speed, ramp_time, shape):
+    if shape == ProfileShape.TRAPEZOIDAL:
+        return speed * times ** 2 / (2 * ramp_time)
+    return speed / 2 * (times - ramp_time / pi * np.sin(pi * times / ramp_time))
+
+
+def get_profile_duration(segments: np.ndarray) -> float:
+    return int(segments['duration'].sum()) / 1000
+
+
+def get_profile_distance(segments: np.ndarray) -> int:
+    return int(segments['steps'].sum())
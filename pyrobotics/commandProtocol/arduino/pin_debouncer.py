@@ -0,0 +1,140 @@
+import time
+from typing import Tuple
+
+import numpy as np
+
+
+def _now() -> float:
+    # Monotonic time in milliseconds (float)
+    return time.monotonic() * 1000
+
+
+class PinDebouncer(object):
+
+    """Trailing-edge debounce filter for digital pins. The value is delivered when the pin stays unchanged for the interval"""
+
+    PINS_COUNT = 256
+
+    __DEFAULT_INTERVAL = 220  # milliseconds
+
+    def __init__(self, interval: float = __DEFAULT_INTERVAL, pins_count: int = PINS_COUNT):
+        self.__intervals = np.full(pins_count, interval, dtype=np.float64)
+
+        # Last delivered (settled) value, -1 if unknown
+        self.__values = np.full(pins_count, -1, dtype=np.int16)
+
+        # Value waiting for the end of the interval
+        self.__is_pending = np.zeros(pins_count, dtype=np.bool_)
+        self.__pending_values = np.zeros(pins_count, dtype=np.int16)
+        self.__deadlines = np.zeros(pins_count, dtype=np.float64)
+        self.__pending_count = 0
+
+    # Intervals in milliseconds
+    def set_interval(self, value: float, pins=None) -> None:
+        if pins is None:
+            self.__intervals[:] = value
+        else:
+            self.__intervals[np.asarray(pins, dtype=np.intp)] = value
+
+    def get_interval(self, pin: int) -> float:
+        return float(self.__intervals[pin])
+
+    def get_value(self, pin: int) -> int:
+        return int(self.__values[pin])
+
+    def has_pending(self) -> bool:
+        return self.__pending_count > 0
+
+    def reset(self) -> None:
+        self.__values[:] = -1
+        self.__is_pending[:] = False
+        self.__pending_count = 0
+
+    # Register one pin change. Call 'poll' before it, otherwise an already settled value of the pin is overwritten
+    def update(self, pin: int, value: int, now: float = None) -> None:
+        if now is None:
+            now = _now()
+        if not self.__is_pending[pin]:
+            self.__is_pending[pin] = True
+            self.__pending_count += 1
+        self.__pending_values[pin] = value
+        self.__deadlines[pin] = now + self.__intervals[pin]
+
+    # Register a batch of pin changes.
+    # Returns (pins, values, settle_times) of the values which settled inside the batch, ordered by time
+    def update_many(self, pins, values, times) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        pins = np.asarray(pins, dtype=np.intp)
+        values = np.asarray(values, dtype=np.int16)
+        times = np.asarray(times, dtype=np.float64)
+
+        if pins.size == 0:
+            return self.__empty_result()
+
+        # Group changes by pin, ordered by time inside the group
+        order = np.lexsort((times, pins))
+        pins = pins[order]
+        values = values[order]
+        times = times[order]
+
+        new_pin = pins[1:] != pins[:-1]
+        is_first = np.concatenate(([True], new_pin))
+        is_last = np.concatenate((new_pin, [True]))
+
+        # Values pending before the batch settle if the first change came after their deadline
+        first_pins = pins[is_first]
+        old_mask = self.__is_pending[first_pins] & (self.__deadlines[first_pins] <= times[is_first])
+        old_pins = first_pins[old_mask]
+        old_values = self.__pending_values[old_pins]
+        old_times = self.__deadlines[old_pins]
+
+        # Changes inside the batch settle if the next change of the same pin came after the interval
+        deadlines = times + self.__intervals[pins]
+        next_times = np.concatenate((times[1:], [np.inf]))
+        settled = ~is_last & (next_times >= deadlines)
+
+        # The last change of every pin becomes pending
+        last_pins = pins[is_last]
+        self.__is_pending[last_pins] = True
+        self.__pending_values[last_pins] = values[is_last]
+        self.__deadlines[last_pins] = deadlines[is_last]
+        self.__pending_count = int(np.count_nonzero(self.__is_pending))
+
+        new_pins = pins[settled]
+        new_values = values[settled]
+        self.__values[old_pins] = old_values
+        if new_pins.size > 0:
+            # Keep only the latest settled value of every pin
+            latest = np.concatenate((new_pins[1:] != new_pins[:-1], [True]))
+            self.__values[new_pins[latest]] = new_values[latest]
+
+        result_pins = np.concatenate((old_pins, new_pins))
+        result_values = np.concatenate((old_values, new_values))
+        result_times = np.concatenate((old_times, deadlines[settled]))
+
+        order = np.argsort(result_times, kind='stable')
+        return result_pins[order], result_values[order], result_times[order]
+
+    # Returns (pins, values, settle_times) of the pending values whose interval has expired, ordered by time
+    def poll(self, now: float = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if self.__pending_count == 0:
+            return self.__empty_result()
+        if now is None:
+            now = _now()
+
+        pins = np.flatnonzero(self.__is_pending & (self.__deadlines <= now))
+        if pins.size == 0:
+            return self.__empty_result()
+
+        values = self.__pending_values[pins]
+        times = self.__deadlines[pins]
+
+        self.__is_pending[pins] = False
+        self.__pending_count -= pins.size
+        self.__values[pins] = values
+
+        order = np.argsort(times, kind='stable')
+        return pins[order], values[order], times[order]
+
+    @staticmethod
+    def __empty_result() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.int16), np.empty(0, dtype=np.float64)
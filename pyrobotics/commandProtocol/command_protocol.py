@@ -19,88 +19,191 @@ class Command(object):
     __DEFAULT_FLOAT_BYTES_COUNT = 8
     __DEFAULT_ENCODING = 'utf-8'
 
+    # Packet bytes and the decoded data views are made on the first request
+    __slots__ = ('__type', '__data', '__bytes', '__string_data', '__integer_data', '__float_data')
+
     def __init__(self, command_type, data):
+        self._reset(command_type, data)
+
+    def _reset(self, command_type, data) -> None:
         self.__type = command_type
-        self.__data = data
 
         if type(data) == int:
-            self.__data = data.to_bytes(self.__DEFAULT_INTEGER_BYTES_COUNT, byteorder='big')
+            data = data.to_bytes(self.__DEFAULT_INTEGER_BYTES_COUNT, byteorder='big')
         elif type(data) == str:
-            self.__data = data.encode(self.__DEFAULT_ENCODING)
+            data = data.encode(self.__DEFAULT_ENCODING)
         elif type(data) == float:
-            self.__data = bytearray(struct.pack("f", data))
-
-        packet_len_bytes_count = _Parser.PACKET_LENGTH_BYTES_COUNT
-        packet_len = len(self.__data) + 5 + packet_len_bytes_count
-
-        packet_len_bytes = packet_len.to_bytes(packet_len_bytes_count, byteorder='big', signed=True)
+            data = bytearray(struct.pack("f", data))
 
-        self.__bytes = bytearray(packet_len)
-        self.__bytes[0] = self.START_BYTE_1
-        self.__bytes[1] = self.START_BYTE_2
-        self.__bytes[2:2+packet_len_bytes_count] = packet_len_bytes
-        self.__bytes[2+packet_len_bytes_count] = command_type
-
-        index = 2 + packet_len_bytes_count + 1
-
-        for bt in self.__data:
-            self.__bytes[index] = bt
-            index += 1
+        self.__data = data
+        self.__bytes = None
+        self.__string_data = None
+        self.__integer_data = None
+        self.__float_data = None
 
-        self.__bytes[index] = self.STOP_BYTE_1
-        self.__bytes[index + 1] = self.STOP_BYTE_2
+    # Independent copy, e.g. to keep a command received from the parser which uses a commands pool
+    def copy(self):
+        return Command(self.__type, bytearray(self.__data))
 
     def get_type(self):
         return self.__type
 
     def get_bytes(self):
+        if self.__bytes is None:
+            self.__bytes = self.__build_bytes()
         return self.__bytes
 
     def get_data(self):
         return self.__data
 
     def get_string_data(self, encoding=__DEFAULT_ENCODING):
-        return self.__data.decode(encoding)
+        if encoding != self.__DEFAULT_ENCODING:
+            return self.__data.decode(encoding)
+        if self.__string_data is None:
+            self.__string_data = self.__data.decode(encoding)
+        return self.__string_data
 
     def get_integer_data(self, bytes_count=__DEFAULT_INTEGER_BYTES_COUNT, start_byte=0):
-        return int.from_bytes(self.__data[start_byte:start_byte+bytes_count], byteorder='big')
+        if bytes_count != self.__DEFAULT_INTEGER_BYTES_COUNT or start_byte != 0:
+            return int.from_bytes(self.__data[start_byte:start_byte+bytes_count], byteorder='big')
+        if self.__integer_data is None:
+            self.__integer_data = int.from_bytes(self.__data[:bytes_count], byteorder='big')
+        return self.__integer_data
 
     def get_float_data(self, bytes_count=__DEFAULT_FLOAT_BYTES_COUNT, start_byte=0):
         # return struct.unpack('!f', self.__data[start_byte:start_byte+bytes_count])[0]
         # '!f' do not working with Arduino
-        return struct.unpack('<f', self.__data[start_byte:start_byte+bytes_count])[0]
+        if bytes_count != self.__DEFAULT_FLOAT_BYTES_COUNT or start_byte != 0:
+            return struct.unpack('<f', self.__data[start_byte:start_byte+bytes_count])[0]
+        if self.__float_data is None:
+            self.__float_data = struct.unpack('<f', self.__data[:bytes_count])[0]
+        return self.__float_data
+
+    def __build_bytes(self) -> bytearray:
+        packet_len_bytes_count = _Parser.PACKET_LENGTH_BYTES_COUNT
+        packet_len = len(self.__data) + 5 + packet_len_bytes_count
+
+        packet_bytes = bytearray(packet_len)
+        packet_bytes[0] = self.START_BYTE_1
+        packet_bytes[1] = self.START_BYTE_2
+        packet_bytes[2:2+packet_len_bytes_count] = packet_len.to_bytes(packet_len_bytes_count, byteorder='big')
+        packet_bytes[2+packet_len_bytes_count] = self.__type
+        packet_bytes[3+packet_len_bytes_count:packet_len-2] = self.__data
+        packet_bytes[packet_len-2] = self.STOP_BYTE_1
+        packet_bytes[packet_len-1] = self.STOP_BYTE_2
+        return packet_bytes
+
+
+class CommandPool(object):
+
+    """Список свободных объектов Command для парсера. Обработчики не должны хранить полученные команды (см. copy)"""
+
+    __DEFAULT_MAX_SIZE = 64
+
+    def __init__(self, max_size: int = __DEFAULT_MAX_SIZE):
+        self.__max_size = max_size
+        self.__free = []
+        self.__created_count = 0
+        self.__reused_count = 0
+
+    def acquire(self, command_type, data) -> Command:
+        if self.__free:
+            command = self.__free.pop()
+            command._reset(command_type, data)
+            self.__reused_count += 1
+        else:
+            command = Command(command_type, data)
+            self.__created_count += 1
+        return command
+
+    def release(self, command: Command) -> None:
+        if len(self.__free) < self.__max_size:
+            self.__free.append(command)
+
+    def get_free_count(self) -> int:
+        return len(self.__free)
+
+    def get_created_count(self) -> int:
+        return self.__created_count
+
+    def get_reused_count(self) -> int:
+        return self.__reused_count
 
 
 class _Parser(object):
 
     PACKET_LENGTH_BYTES_COUNT = 1
 
-    def __init__(self, buffer_size):
+    def __init__(self, buffer_size, commands_pool: CommandPool = None):
 
         self.__buffer_size = buffer_size
+        self.__commands_pool = commands_pool
 
         self.__buffer = bytearray(buffer_size)
         self.__bytes_in_buffer = 0
 
+        # Length of the packet being received, 0 until the packet header is received
+        self.__packet_length = 0
+
         self.on_command_event = Event()
 
+    # With the pool the command objects are reused after the handlers return
+    def set_commands_pool(self, commands_pool: CommandPool or None) -> None:
+        self.__commands_pool = commands_pool
+
+    def get_commands_pool(self) -> CommandPool or None:
+        return self.__commands_pool
+
     def parse(self, byte_data) -> None:
 
-        for byte in byte_data:
-            # byte = ord(byte)
+        header_length = 2 + _Parser.PACKET_LENGTH_BYTES_COUNT
+
+        index = 0
+        data_length = len(byte_data)
+        while index < data_length:
+
+            # Packet data is binary and can contain start and stop bytes, so it is copied by the packet length
+            if self.__packet_length > 0:
+                count = min(self.__packet_length - self.__bytes_in_buffer, data_length - index)
+                self.__buffer[self.__bytes_in_buffer:self.__bytes_in_buffer + count] = byte_data[index:index + count]
+                self.__bytes_in_buffer += count
+                index += count
+                if self.__bytes_in_buffer == self.__packet_length:
+                    self.__detect_command()
+                    self.__clear_buffer()
+                continue
 
-            if byte == Command.START_BYTE_2 and self.__bytes_in_buffer > 0 \
+            byte = byte_data[index]
+            index += 1
+
+            # After both start bytes the byte is the packet length, it can be equal to a start byte
+            if self.__bytes_in_buffer >= 2 and self.__buffer[0] == Command.START_BYTE_1 \
+                    and self.__buffer[1] == Command.START_BYTE_2:
+                self.__add_to_buffer(byte)
+                if self.__bytes_in_buffer == header_length:
+                    self.__start_packet()
+            elif byte == Command.START_BYTE_2 and self.__bytes_in_buffer > 0 \
                     and self.__get_buffer_last_byte() == Command.START_BYTE_1:
                 self.__clear_buffer()
                 self.__add_to_buffer(Command.START_BYTE_1)
                 self.__add_to_buffer(Command.START_BYTE_2)
-            elif byte == Command.STOP_BYTE_2 and self.__bytes_in_buffer > 0 \
-                    and self.__get_buffer_last_byte() == Command.STOP_BYTE_1:
-                self.__add_to_buffer(byte)
-                self.__detect_command()
             else:
                 self.__add_to_buffer(byte)
 
+    # Drop the partially received packet (e.g. after the connection was restored)
+    def reset(self) -> None:
+        self.__clear_buffer()
+
+    def __start_packet(self) -> None:
+        packet_length_bytes_count = _Parser.PACKET_LENGTH_BYTES_COUNT
+        packet_length = int.from_bytes(self.__buffer[2:2 + packet_length_bytes_count], byteorder='big')
+
+        if packet_length < 5 + packet_length_bytes_count or packet_length > self.__buffer_size:
+            print("Command protocol parser. Bad packet length!!!")
+            self.__clear_buffer()
+        else:
+            self.__packet_length = packet_length
+
     def __detect_command(self) -> None:
         start1 = self.__buffer[0]
         start2 = self.__buffer[1]
@@ -122,8 +225,12 @@ class _Parser(object):
 
             command_data = self.__buffer[3+packet_length_bytes_count:packet_length-2]
 
-            command = Command(command_type, command_data)
-            self.on_command_event.fire(command)
+            if self.__commands_pool is None:
+                self.on_command_event.fire(Command(command_type, command_data))
+            else:
+                command = self.__commands_pool.acquire(command_type, command_data)
+                self.on_command_event.fire(command)
+                self.__commands_pool.release(command)
         else:
             print("Command protocol parser. Bad command!!!")
             self.__clear_buffer()
@@ -140,8 +247,8 @@ class _Parser(object):
         self.__bytes_in_buffer += 1
 
     def __clear_buffer(self) -> None:
-        self.__buffer = bytearray(self.__buffer_size)
         self.__bytes_in_buffer = 0
+        self.__packet_length = 0
 
 
 class ProtocolConnection(ABC, Thread):
@@ -157,9 +264,13 @@ class ProtocolConnection(ABC, Thread):
         super().__init__()
         self._parser = _Parser(buffer_size)
 
-        self._on_command_event = Event()
+        self._on_command_event = Event('ProtocolConnection.command')
         self._on_error_event = Event()
 
+        # Traffic as it is on the wire: every parsed and every sent command (recorders, monitors)
+        self._on_receive_command_event = Event()
+        self._on_send_command_event = Event()
+
         self._parser.on_command_event.handle(self.__on_parser_detect_command)
 
     # Clear event handlers
@@ -167,6 +278,8 @@ class ProtocolConnection(ABC, Thread):
     def _clear_event_handlers(self) -> None:
         self._on_command_event.clear_handlers()
         self._on_error_event.clear_handlers()
+        self._on_receive_command_event.clear_handlers()
+        self._on_send_command_event.clear_handlers()
 
     @abstractmethod
     def close(self) -> None:
@@ -174,11 +287,34 @@ class ProtocolConnection(ABC, Thread):
 
     # Add Handlers
 
-    def add_on_command_event_handler(self, handler: callable) -> None:
-        self._on_command_event.handle(handler)
+    # With the delivery (see pyrobotics.event) a slow handler does not stall the reading thread. The delivered handler
+    # is called after the command is returned to the commands pool, so it receives a copy of the pooled command
+    def add_on_command_event_handler(self, handler: callable, delivery=None, weak: bool = False) -> None:
+        if delivery is not None:
+            delivery = _CommandCopyDelivery(delivery, self._parser)
+        self._on_command_event.handle(handler, delivery, weak)
+
+    # Received commands are reused, handlers which keep a command must keep its copy (Command.copy()). Handlers with
+    # the delivery receive copies
+    def set_commands_pool(self, commands_pool: CommandPool or None) -> None:
+        self._parser.set_commands_pool(commands_pool)
+
+    def add_on_error_event_handler(self, handler: callable, weak: bool = False) -> None:
+        self._on_error_event.handle(handler, weak=weak)
+
+    # Handler receives every parsed command before the connection processes it
+    def add_on_receive_command_event_handler(self, handler: callable) -> None:
+        self._on_receive_command_event.handle(handler)
+
+    def remove_on_receive_command_event_handler(self, handler: callable) -> None:
+        self._on_receive_command_event.unhandle(handler)
 
-    def add_on_error_event_handler(self, handler: callable) -> None:
-        self._on_error_event.handle(handler)
+    # Handler receives every command written to the connection
+    def add_on_send_command_event_handler(self, handler: callable) -> None:
+        self._on_send_command_event.handle(handler)
+
+    def remove_on_send_command_event_handler(self, handler: callable) -> None:
+        self._on_send_command_event.unhandle(handler)
 
     def _dispatch_on_command(self, command) -> None:
         self._on_command_event.fire(command)
@@ -186,11 +322,28 @@ class ProtocolConnection(ABC, Thread):
     def _dispatch_on_error(self, message) -> None:
         self._on_error_event.fire(message)
 
+    def _dispatch_on_send_command(self, command) -> None:
+        self._on_send_command_event.fire(command)
+
     # Parser detect command listener
     def __on_parser_detect_command(self, command) -> None:
+        self._on_receive_command_event.fire(command)
         self._dispatch_on_command(command)
 
 
+# Commands of the pool are copied in the firing thread, before the delivery
+class _CommandCopyDelivery(object):
+
+    def __init__(self, delivery, parser: _Parser):
+        self.__delivery = delivery
+        self.__parser = parser
+
+    def deliver(self, handler, args, kargs) -> None:
+        if self.__parser.get_commands_pool() is not None:
+            args = tuple(arg.copy() if isinstance(arg, Command) else arg for arg in args)
+        self.__delivery.deliver(handler, args, kargs)
+
+
 class ProtocolConnectionClient(ProtocolConnection):
 
     __next_client_id = 0
@@ -212,11 +365,11 @@ class ProtocolConnectionClient(ProtocolConnection):
     def is_connected(self) -> bool:
         return self._is_connected
 
-    def add_on_connect_event_handler(self, handler: callable) -> None:
-        self._on_connect_event.handle(handler)
+    def add_on_connect_event_handler(self, handler: callable, weak: bool = False) -> None:
+        self._on_connect_event.handle(handler, weak=weak)
 
-    def add_on_disconnect_event_handler(self, handler: callable) -> None:
-        self._on_disconnect_event.handle(handler)
+    def add_on_disconnect_event_handler(self, handler: callable, weak: bool = False) -> None:
+        self._on_disconnect_event.handle(handler, weak=weak)
 
     def _clear_event_handlers(self) -> None:
         super()._clear_event_handlers()
@@ -0,0 +1,70 @@
+import struct
+import sys
+import time
+import tracemalloc
+
+from pyrobotics.commandProtocol.command_protocol import Command, CommandPool, _Parser
+
+
+# Parser throughput and Command memory benchmark.
+# Run: python -m pyrobotics.commandProtocol.command_protocol_benchmark [commands count]
+
+_DEFAULT_COMMANDS_COUNT = 100000
+_ANGLE_COMMAND_TYPE = 0x72
+
+
+def make_stream(commands_count: int) -> bytes:
+    packets = [Command(_ANGLE_COMMAND_TYPE, struct.pack('<f', i % 360)).get_bytes() for i in range(commands_count)]
+    return b''.join(packets)
+
+
+# Returns parsed commands per second
+def measure_parser(stream: bytes, commands_count: int, commands_pool: CommandPool = None, chunk_size: int = 64) -> float:
+    parser = _Parser(255, commands_pool)
+    angles = [0.0]
+
+    def on_command(command):
+        angles[0] += command.get_float_data(4)
+
+    parser.on_command_event.handle(on_command)
+
+    start = time.perf_counter()
+    for offset in range(0, len(stream), chunk_size):
+        parser.parse(stream[offset:offset + chunk_size])
+    return commands_count / (time.perf_counter() - start)
+
+
+# Returns decoded values per second of the repeated get_integer_data() calls
+def measure_cached_decoding(repeats: int) -> float:
+    command = Command(_ANGLE_COMMAND_TYPE, 123456)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        command.get_integer_data()
+    return repeats / (time.perf_counter() - start)
+
+
+# Returns (bytes per command object, peak bytes of the commands kept in memory)
+def measure_memory(commands_count: int) -> (int, int):
+    tracemalloc.start()
+    commands = [Command(_ANGLE_COMMAND_TYPE, bytearray(4)) for _ in range(commands_count)]
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return sys.getsizeof(commands[0]), peak
+
+
+def main(commands_count: int = _DEFAULT_COMMANDS_COUNT) -> None:
+    stream = make_stream(commands_count)
+
+    print("Parser, new commands:    {:>12,.0f} commands/s".format(measure_parser(stream, commands_count)))
+    pool = CommandPool()
+    print("Parser, commands pool:   {:>12,.0f} commands/s".format(measure_parser(stream, commands_count, pool)))
+    print("Pool created/reused:     {:>12} / {}".format(pool.get_created_count(), pool.get_reused_count()))
+    print("Cached integer decoding: {:>12,.0f} calls/s".format(measure_cached_decoding(commands_count)))
+
+    object_size, peak = measure_memory(commands_count)
+    print("Command object size:     {:>12} bytes".format(object_size))
+    print("Memory of {} commands: {:>12,} bytes".format(commands_count, peak))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else _DEFAULT_COMMANDS_COUNT)
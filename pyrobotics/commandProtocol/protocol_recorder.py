@@ -0,0 +1,270 @@
+import mmap
+import struct
+import time
+from enum import Enum
+from threading import Lock, Event as ThreadEvent
+
+import numpy as np
+
+from pyrobotics.commandProtocol.command_protocol import Command, _Parser
+
+
+# Log file layout (little-endian):
+#   header: magic, version, wall clock time of the start (seconds), monotonic time of the start (nanoseconds)
+#   records: time from the start (nanoseconds), direction, packet length, packet bytes as they are on the wire
+_MAGIC = b'PRLG'
+_VERSION = 1
+_HEADER = struct.Struct('<4sHdq')
+_RECORD_HEADER = struct.Struct('<qBH')
+
+
+class Direction(Enum):
+    INBOUND = 0
+    OUTBOUND = 1
+
+    @classmethod
+    def get_names(cls):
+        return [direction.name for direction in cls]
+
+    @classmethod
+    def get_by_name(cls, name):
+        return cls[name]
+
+
+class ProtocolRecorder(object):
+
+    """Запись трафика протокола в бинарный лог. Файл только дописывается, неполная последняя запись игнорируется"""
+
+    # Existing log is continued: its header is checked, an incomplete last record is cut off and the times of the new
+    # records continue the times of the log
+    def __init__(self, path: str):
+        self.__path = path
+        self.__lock = Lock()
+        self.__connections = []
+        self.__records_count = 0
+
+        self.__file = open(path, 'ab')
+        try:
+            if self.__file.tell() == 0:
+                self.__start_time = time.monotonic_ns()
+                self.__file.write(_HEADER.pack(_MAGIC, _VERSION, time.time(), self.__start_time))
+            else:
+                self.__start_time = self.__continue_log()
+        except Exception:
+            self.__file.close()
+            raise
+
+    # The monotonic clock of the log start is not comparable after a reboot, so the time from the start is taken by
+    # the wall clock, not less than the time of the last record
+    def __continue_log(self) -> int:
+        with open(self.__path, 'rb') as file:
+            header = file.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                raise Exception("Protocol log error. File is too short: " + self.__path)
+            magic, version, start_wall_time, _start_time = _HEADER.unpack(header)
+            if magic != _MAGIC or version != _VERSION:
+                raise Exception("Protocol log error. Unknown file format: " + self.__path)
+            end, last_time = _find_log_end(file)
+
+        self.__file.truncate(end)
+        log_time = max(int((time.time() - start_wall_time) * 1e9), last_time)
+        return time.monotonic_ns() - log_time
+
+    def get_path(self) -> str:
+        return self.__path
+
+    def get_records_count(self) -> int:
+        return self.__records_count
+
+    # Record all received and sent commands of the connection
+    def attach(self, connection) -> None:
+        connection.add_on_receive_command_event_handler(self.record_inbound)
+        connection.add_on_send_command_event_handler(self.record_outbound)
+        self.__connections.append(connection)
+
+    def detach(self, connection) -> None:
+        connection.remove_on_receive_command_event_handler(self.record_inbound)
+        connection.remove_on_send_command_event_handler(self.record_outbound)
+        self.__connections.remove(connection)
+
+    def record_inbound(self, command: Command) -> None:
+        self.record(command, Direction.INBOUND)
+
+    def record_outbound(self, command: Command) -> None:
+        self.record(command, Direction.OUTBOUND)
+
+    def record(self, command: Command, direction: Direction, timestamp: int = None) -> None:
+        if timestamp is None:
+            timestamp = time.monotonic_ns()
+        packet = command.get_bytes()
+        with self.__lock:
+            if self.__file is None:
+                return
+            self.__file.write(_RECORD_HEADER.pack(timestamp - self.__start_time, direction.value, len(packet)))
+            self.__file.write(packet)
+            self.__records_count += 1
+
+    def flush(self) -> None:
+        with self.__lock:
+            if self.__file is not None:
+                self.__file.flush()
+
+    def close(self) -> None:
+        for connection in list(self.__connections):
+            self.detach(connection)
+        with self.__lock:
+            if self.__file is not None:
+                self.__file.close()
+                self.__file = None
+
+
+# Offset after the last complete record and the time of this record
+def _find_log_end(file) -> (int, int):
+    size = file.seek(0, 2)
+    offset = _HEADER.size
+    last_time = 0
+    while offset + _RECORD_HEADER.size <= size:
+        file.seek(offset)
+        timestamp, _direction, length = _RECORD_HEADER.unpack(file.read(_RECORD_HEADER.size))
+        if offset + _RECORD_HEADER.size + length > size:
+            break
+        last_time = timestamp
+        offset += _RECORD_HEADER.size + length
+    return offset, last_time
+
+
+class ProtocolPlayer(object):
+
+    """Чтение лога ProtocolRecorder через mmap. Записи индексируются по времени, воспроизведение в _Parser"""
+
+    def __init__(self, path: str):
+        self.__path = path
+        self.__stop_event = ThreadEvent()
+
+        with open(path, 'rb') as file:
+            self.__data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.__data) < _HEADER.size:
+            raise Exception("Protocol log error. File is too short: " + path)
+        magic, version, self.__start_wall_time, self.__start_time = _HEADER.unpack_from(self.__data, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise Exception("Protocol log error. Unknown file format: " + path)
+
+        self.__build_index()
+
+    def get_path(self) -> str:
+        return self.__path
+
+    def get_records_count(self) -> int:
+        return self.__times.size
+
+    # Wall clock time of the recording start (time.time())
+    def get_start_wall_time(self) -> float:
+        return self.__start_wall_time
+
+    # Seconds from the recording start to the last record
+    def get_duration(self) -> float:
+        if self.__times.size == 0:
+            return 0.0
+        return int(self.__times[-1]) / 1e9
+
+    # Times of the records in seconds from the recording start
+    def get_times(self) -> np.ndarray:
+        return self.__times / 1e9
+
+    def get_directions(self) -> np.ndarray:
+        return self.__directions.copy()
+
+    # Index of the first record at or after the time (seconds from the start)
+    def find_record(self, timestamp: float) -> int:
+        return int(np.searchsorted(self.__times, int(timestamp * 1e9), side='left'))
+
+    # Returns (time in seconds, direction, packet bytes)
+    def get_record(self, index: int) -> (float, Direction, bytes):
+        offset = int(self.__offsets[index])
+        length = int(self.__lengths[index])
+        return int(self.__times[index]) / 1e9, Direction(int(self.__directions[index])), \
+            self.__data[offset:offset + length]
+
+    def get_command(self, index: int) -> Command:
+        offset = int(self.__offsets[index])
+        packet_length_bytes_count = _Parser.PACKET_LENGTH_BYTES_COUNT
+        command_type = self.__data[offset + 2 + packet_length_bytes_count]
+        data = self.__data[offset + 3 + packet_length_bytes_count:offset + int(self.__lengths[index]) - 2]
+        return Command(command_type, bytearray(data))
+
+    # Indices of the records between the times (seconds), optionally only of one direction
+    def get_records_range(self, start_time: float = 0.0, end_time: float = None, direction: Direction = None) -> np.ndarray:
+        start = self.find_record(start_time)
+        end = self.__times.size if end_time is None else self.find_record(end_time)
+        indices = np.arange(start, end)
+        if direction is not None:
+            indices = indices[self.__directions[start:end] == direction.value]
+        return indices
+
+    # Feeds the recorded packets into the parser (e.g. a connection parser, so its handlers receive the commands).
+    # Speed 1.0 - real time, None - as fast as possible. Returns the number of played records
+    def play(self, parser: _Parser, speed: float = 1.0, start_time: float = 0.0, end_time: float = None,
+             direction: Direction = Direction.INBOUND) -> int:
+        self.__stop_event.clear()
+        indices = self.get_records_range(start_time, end_time, direction)
+        if indices.size == 0:
+            return 0
+
+        # Deadlines are absolute, the sleep errors do not accumulate
+        first_time = int(self.__times[indices[0]])
+        play_start = time.monotonic_ns()
+
+        played = 0
+        for index in indices.tolist():
+            if speed is not None:
+                deadline = play_start + (int(self.__times[index]) - first_time) / speed
+                delay = (deadline - time.monotonic_ns()) / 1e9
+                if delay > 0 and self.__stop_event.wait(delay):
+                    break
+            elif self.__stop_event.is_set():
+                break
+
+            offset = int(self.__offsets[index])
+            parser.parse(self.__data[offset:offset + int(self.__lengths[index])])
+            played += 1
+        return played
+
+    # Plays the records to the handler which receives Command
+    def play_to_handler(self, handler: callable, speed: float = 1.0, start_time: float = 0.0, end_time: float = None,
+                        direction: Direction = Direction.INBOUND, buffer_size: int = 255) -> int:
+        parser = _Parser(buffer_size)
+        parser.on_command_event.handle(handler)
+        return self.play(parser, speed, start_time, end_time, direction)
+
+    # Stops the playing from another thread
+    def stop(self) -> None:
+        self.__stop_event.set()
+
+    def close(self) -> None:
+        self.__data.close()
+
+    # One pass over the record headers. The incomplete last record (interrupted recording) is skipped
+    def __build_index(self) -> None:
+        size = len(self.__data)
+        times = []
+        directions = []
+        offsets = []
+        lengths = []
+
+        offset = _HEADER.size
+        while offset + _RECORD_HEADER.size <= size:
+            timestamp, direction, length = _RECORD_HEADER.unpack_from(self.__data, offset)
+            packet_offset = offset + _RECORD_HEADER.size
+            if packet_offset + length > size:
+                break
+            times.append(timestamp)
+            directions.append(direction)
+            offsets.append(packet_offset)
+            lengths.append(length)
+            offset = packet_offset + length
+
+        self.__times = np.array(times, dtype=np.int64)
+        self.__directions = np.array(directions, dtype=np.uint8)
+        self.__offsets = np.array(offsets, dtype=np.int64)
+        self.__lengths = np.array(lengths, dtype=np.int32)
@@ -36,6 +36,7 @@ class CommandProtocolSocketClientBase(ProtocolConnectionClient):
 
     def send_command(self, command: Command) -> None:
         self._socket_connection.sendall(command.get_bytes())
+        self._dispatch_on_send_command(command)
 
     def close(self) -> None:
         self._socket_connection.close()
@@ -1,28 +1,648 @@
+import asyncio
+import time
+import traceback
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from functools import partial
+from threading import Lock, Thread, Condition
+
+
 class Event(object):
-    def __init__(self):
-        self.__handlers = set()
 
-    def handle(self, handler):
-        if not self.__handlers.__contains__(handler):
-            self.__handlers.add(handler)
+    """Событие. Обработчики вызываются в порядке подписки. Список обработчиков неизменяемый (copy-on-write),
+    поэтому fire не блокируется и безопасен при одновременных handle/unhandle из других потоков"""
+
+    def __init__(self, name: str = None):
+        self.__handlers = ()
+        self.__lock = Lock()
+        # Weak handler was collected. Dead handlers are removed on the next handle, unhandle or fire: the collection
+        # callback runs inside the garbage collector, possibly while the lock is held, so it must not take the lock
+        self.__is_dirty = False
+
+        # Named events are listed in the EventRegistry
+        self.__name = name
+        if name is not None:
+            EventRegistry.register(self)
+
+        # Handler -> HandlerProfile, None if the profiling is off
+        self.__profiles = None
+        self.__budget = None
+        self.__budget_exceeded_handler = None
+
+    # Delivery - None (the handler is called in the firing thread), ExecutorDelivery, QueueDelivery or AsyncioDelivery.
+    # Weak handler does not keep its object alive and is removed when the object is collected
+    def handle(self, handler, delivery=None, weak=False):
+        if weak:
+            handler = _WeakHandler(handler, self.__mark_dirty)
+        if delivery is not None:
+            handler = _DeliveredHandler(handler, delivery)
+        with self.__lock:
+            self.__prune_locked()
+            if handler not in self.__handlers:
+                self.__handlers = self.__handlers + (handler,)
         return self
 
     def unhandle(self, handler):
-        if self.__handlers.__contains__(handler):
-            self.__handlers.remove(handler)
+        with self.__lock:
+            self.__prune_locked()
+            if handler in self.__handlers:
+                self.__handlers = tuple(h for h in self.__handlers if h != handler)
         return self
 
+    # Handlers added or removed during the firing take effect from the next fire
     def fire(self, *args, **kargs):
+        if self.__is_dirty:
+            self.__prune()
+        if self.__profiles is not None:
+            self.__fire_profiled(args, kargs)
+            return
         for handler in self.__handlers:
             handler(*args, **kargs)
 
+    def get_name(self):
+        return self.__name
+
+    # Profiling. Time of every handler call is measured (for a delivered handler it is the time of the delivery only).
+    # Budget in nanoseconds, the budget exceeded handler receives (event, handler, time), by default a warning is printed
+    def set_profiling(self, is_enabled, budget=None, budget_exceeded_handler=None):
+        self.__budget = budget
+        self.__budget_exceeded_handler = budget_exceeded_handler
+        if not is_enabled:
+            self.__profiles = None
+        elif self.__profiles is None:
+            self.__profiles = dict()
+
+    def is_profiling(self):
+        return self.__profiles is not None
+
+    # Handler -> HandlerProfile
+    def get_profiles(self):
+        profiles = self.__profiles
+        return dict() if profiles is None else dict(profiles)
+
+    def reset_profiles(self):
+        if self.__profiles is not None:
+            self.__profiles = dict()
+
+    def get_handlers(self):
+        if self.__is_dirty:
+            self.__prune()
+        return self.__handlers
+
     def get_handlers_count(self):
-        return len(self.__handlers)
+        return len(self.get_handlers())
+
+    # Handlers which are called out of the firing thread (with a delivery)
+    def has_delivered_handlers(self):
+        return any(isinstance(handler, _DeliveredHandler) for handler in self.get_handlers())
 
     def clear_handlers(self):
-        self.__handlers = []
+        with self.__lock:
+            self.__handlers = ()
+
+    def __fire_profiled(self, args, kargs):
+        profiles = self.__profiles
+        for handler in self.__handlers:
+            start = time.perf_counter_ns()
+            handler(*args, **kargs)
+            duration = time.perf_counter_ns() - start
+
+            profile = profiles.get(handler)
+            if profile is None:
+                profile = profiles.setdefault(handler, HandlerProfile(_get_handler_name(handler)))
+            profile.add(duration)
+
+            if self.__budget is not None and duration > self.__budget:
+                if self.__budget_exceeded_handler is not None:
+                    self.__budget_exceeded_handler(self, handler, duration)
+                else:
+                    print("Event '" + str(self.__name) + "'. Handler " + profile.get_name() + " exceeded the budget: " +
+                          str(duration // 1000) + " us")
+
+    def __mark_dirty(self):
+        self.__is_dirty = True
+
+    def __prune(self):
+        with self.__lock:
+            self.__prune_locked()
+
+    # The flag is cleared before the filtering, so a handler collected meanwhile marks the event again
+    def __prune_locked(self):
+        if self.__is_dirty:
+            self.__is_dirty = False
+            self.__handlers = tuple(h for h in self.__handlers if _is_alive(h))
 
     __iadd__ = handle
     __isub__ = unhandle
     __call__ = fire
     __len__ = get_handlers_count
+
+
+class HandlerProfile(object):
+
+    """Статистика вызовов обработчика. Время в наносекундах, гистограмма по степеням двойки"""
+
+    __BUCKETS_COUNT = 64
+
+    def __init__(self, name: str):
+        self.__name = name
+        self.__calls_count = 0
+        self.__total_time = 0
+        self.__max_time = 0
+        # Bucket i counts the calls with the time in [2^(i-1), 2^i) nanoseconds
+        self.__histogram = [0] * self.__BUCKETS_COUNT
+
+    def add(self, duration: int) -> None:
+        self.__calls_count += 1
+        self.__total_time += duration
+        if duration > self.__max_time:
+            self.__max_time = duration
+        self.__histogram[min(duration.bit_length(), self.__BUCKETS_COUNT - 1)] += 1
+
+    def get_name(self) -> str:
+        return self.__name
+
+    def get_calls_count(self) -> int:
+        return self.__calls_count
+
+    def get_total_time(self) -> int:
+        return self.__total_time
+
+    def get_mean_time(self) -> float:
+        return self.__total_time / self.__calls_count if self.__calls_count > 0 else 0.0
+
+    def get_max_time(self) -> int:
+        return self.__max_time
+
+    # Returns (upper bounds of the buckets, calls counts) without empty buckets at the ends
+    def get_histogram(self) -> ([int], [int]):
+        used = [i for i, count in enumerate(self.__histogram) if count > 0]
+        if not used:
+            return [], []
+        return [2 ** i for i in range(used[0], used[-1] + 1)], self.__histogram[used[0]:used[-1] + 1]
+
+    # Upper bound of the bucket which contains the percentile (0-100), not more than the max time
+    def get_percentile(self, percentile: float) -> int:
+        threshold = self.__calls_count * percentile / 100
+        calls = 0
+        for i, count in enumerate(self.__histogram):
+            calls += count
+            if count > 0 and calls >= threshold:
+                return min(2 ** i, self.__max_time)
+        return 0
+
+    def __str__(self):
+        return "{}: calls {}, mean {:.1f} us, p99 < {:.1f} us, max {:.1f} us".format(
+            self.__name, self.__calls_count, self.get_mean_time() / 1000, self.get_percentile(99) / 1000,
+            self.__max_time / 1000)
+
+
+class EventRegistry(object):
+
+    """Список именованных событий (Event(name)) для профилирования всех обработчиков приложения"""
+
+    __events = weakref.WeakSet()
+    __lock = Lock()
+
+    @classmethod
+    def register(cls, event: Event) -> None:
+        with cls.__lock:
+            cls.__events.add(event)
+
+    # Events with the name or all named events
+    @classmethod
+    def get_events(cls, name: str = None) -> [Event]:
+        with cls.__lock:
+            events = list(cls.__events)
+        return [event for event in events if name is None or event.get_name() == name]
+
+    @classmethod
+    def set_profiling(cls, is_enabled: bool, name: str = None, budget: int = None,
+                      budget_exceeded_handler: callable = None) -> None:
+        for event in cls.get_events(name):
+            event.set_profiling(is_enabled, budget, budget_exceeded_handler)
+
+    # (event name, HandlerProfile) of all profiled events
+    @classmethod
+    def get_profiles(cls, name: str = None) -> [(str, HandlerProfile)]:
+        return [(event.get_name(), profile) for event in cls.get_events(name)
+                for profile in event.get_profiles().values()]
+
+    @classmethod
+    def print_report(cls, name: str = None) -> None:
+        for event_name, profile in sorted(cls.get_profiles(name), key=lambda item: -item[1].get_total_time()):
+            print(event_name, "|", profile)
+
+
+def _get_handler_name(handler) -> str:
+    if isinstance(handler, _DeliveredHandler):
+        handler = handler.handler
+    if isinstance(handler, _WeakHandler):
+        handler = handler.reference()
+    return getattr(handler, '__qualname__', repr(handler))
+
+
+# Weak reference to a bound method (WeakMethod) or a function. It is equal to the referenced handler while it is alive
+class _WeakHandler(object):
+
+    __slots__ = ('reference', 'hash')
+
+    def __init__(self, handler, on_collected):
+        on_collected = weakref.WeakMethod(on_collected)
+
+        def callback(_reference):
+            collected = on_collected()
+            if collected is not None:
+                collected()
+
+        if hasattr(handler, '__self__') and hasattr(handler, '__func__'):
+            self.reference = weakref.WeakMethod(handler, callback)
+        else:
+            self.reference = weakref.ref(handler, callback)
+        self.hash = hash(handler)
+
+    def is_alive(self):
+        return self.reference() is not None
+
+    def __call__(self, *args, **kargs):
+        handler = self.reference()
+        if handler is not None:
+            handler(*args, **kargs)
+
+    def __eq__(self, other):
+        if isinstance(other, _WeakHandler):
+            return self.reference == other.reference
+        handler = self.reference()
+        return handler is not None and handler == other
+
+    def __hash__(self):
+        return self.hash
+
+
+def _is_alive(handler):
+    if isinstance(handler, _DeliveredHandler):
+        handler = handler.handler
+    return not isinstance(handler, _WeakHandler) or handler.is_alive()
+
+
+# Handler with not inline delivery. It is equal to the wrapped handler, so it is removed by Event.unhandle(handler)
+class _DeliveredHandler(object):
+
+    __slots__ = ('handler', 'delivery')
+
+    def __init__(self, handler, delivery):
+        self.handler = handler
+        self.delivery = delivery
+
+    def __call__(self, *args, **kargs):
+        self.delivery.deliver(self.handler, args, kargs)
+
+    def __eq__(self, other):
+        if isinstance(other, _DeliveredHandler):
+            return self.handler == other.handler
+        return self.handler == other
+
+    def __hash__(self):
+        return hash(self.handler)
+
+
+class ExecutorDelivery(object):
+
+    """Доставка в пул потоков. Если пул не передан, создается свой"""
+
+    def __init__(self, executor: ThreadPoolExecutor = None, max_workers: int = None):
+        self.__is_own_executor = executor is None
+        self.__executor = ThreadPoolExecutor(max_workers) if executor is None else executor
+
+        self.__lock = Lock()
+        self.__depth = 0
+        self.__peak_depth = 0
+        self.__delivered_count = 0
+        self.__dropped_count = 0
+
+    def deliver(self, handler, args, kargs) -> None:
+        with self.__lock:
+            self.__depth += 1
+            self.__peak_depth = max(self.__peak_depth, self.__depth)
+        try:
+            self.__executor.submit(self.__call, handler, args, kargs)
+        except RuntimeError:
+            # Executor is shut down
+            with self.__lock:
+                self.__depth -= 1
+                self.__dropped_count += 1
+
+    # Submitted and not finished calls
+    def get_depth(self) -> int:
+        return self.__depth
+
+    def get_peak_depth(self) -> int:
+        return self.__peak_depth
+
+    def get_delivered_count(self) -> int:
+        return self.__delivered_count
+
+    def get_dropped_count(self) -> int:
+        return self.__dropped_count
+
+    def close(self) -> None:
+        if self.__is_own_executor:
+            self.__executor.shutdown(wait=False)
+
+    def __call(self, handler, args, kargs) -> None:
+        try:
+            handler(*args, **kargs)
+        except Exception:
+            traceback.print_exc()
+        finally:
+            with self.__lock:
+                self.__depth -= 1
+                self.__delivered_count += 1
+
+
+class QueueDelivery(Thread):
+
+    """Доставка через очередь ограниченной длины в отдельном потоке. Вызовы выполняются по порядку"""
+
+    class DropPolicy(Enum):
+        DROP_OLDEST = "Drop oldest"
+        DROP_NEWEST = "Drop newest"
+        BLOCK = "Block"
+
+        @classmethod
+        def get_names(cls):
+            return [policy.name for policy in cls]
+
+        @classmethod
+        def get_by_name(cls, name):
+            return cls[name]
+
+    __DEFAULT_MAX_DEPTH = 16
+
+    def __init__(self, max_depth: int = __DEFAULT_MAX_DEPTH, drop_policy: DropPolicy = DropPolicy.DROP_OLDEST,
+                 name: str = None):
+        super().__init__(name=name, daemon=True)
+
+        self.__max_depth = max_depth
+        self.__drop_policy = drop_policy
+
+        self.__queue = deque()
+        self.__condition = Condition()
+        self.__is_running = True
+
+        self.__peak_depth = 0
+        self.__delivered_count = 0
+        self.__dropped_count = 0
+
+        self.start()
+
+    def deliver(self, handler, args, kargs) -> None:
+        with self.__condition:
+            if not self.__is_running:
+                self.__dropped_count += 1
+                return
+
+            if len(self.__queue) >= self.__max_depth:
+                if self.__drop_policy == self.DropPolicy.DROP_NEWEST:
+                    self.__dropped_count += 1
+                    return
+                elif self.__drop_policy == self.DropPolicy.DROP_OLDEST:
+                    self.__queue.popleft()
+                    self.__dropped_count += 1
+                else:
+                    self.__condition.wait_for(lambda: len(self.__queue) < self.__max_depth or not self.__is_running)
+                    if not self.__is_running:
+                        self.__dropped_count += 1
+                        return
+
+            self.__queue.append((handler, args, kargs))
+            self.__peak_depth = max(self.__peak_depth, len(self.__queue))
+            self.__condition.notify_all()
+
+    def run(self) -> None:
+        while True:
+            with self.__condition:
+                self.__condition.wait_for(lambda: len(self.__queue) > 0 or not self.__is_running)
+                if not self.__is_running:
+                    return
+                handler, args, kargs = self.__queue.popleft()
+                self.__condition.notify_all()
+
+            try:
+                handler(*args, **kargs)
+            except Exception:
+                traceback.print_exc()
+            self.__delivered_count += 1
+
+    # Not delivered calls are dropped
+    def stop(self) -> None:
+        with self.__condition:
+            self.__is_running = False
+            self.__dropped_count += len(self.__queue)
+            self.__queue.clear()
+            self.__condition.notify_all()
+
+    def get_depth(self) -> int:
+        return len(self.__queue)
+
+    def get_peak_depth(self) -> int:
+        return self.__peak_depth
+
+    def get_delivered_count(self) -> int:
+        return self.__delivered_count
+
+    def get_dropped_count(self) -> int:
+        return self.__dropped_count
+
+
+class AsyncioDelivery(object):
+
+    """Доставка в цикл asyncio (call_soon_threadsafe), обработчик вызывается в потоке цикла"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.__loop = loop
+
+        self.__lock = Lock()
+        self.__depth = 0
+        self.__peak_depth = 0
+        self.__delivered_count = 0
+        self.__dropped_count = 0
+
+    def deliver(self, handler, args, kargs) -> None:
+        with self.__lock:
+            self.__depth += 1
+            self.__peak_depth = max(self.__peak_depth, self.__depth)
+        try:
+            self.__loop.call_soon_threadsafe(partial(self.__call, handler, args, kargs))
+        except RuntimeError:
+            # Loop is closed
+            with self.__lock:
+                self.__depth -= 1
+                self.__dropped_count += 1
+
+    # Scheduled and not called handlers
+    def get_depth(self) -> int:
+        return self.__depth
+
+    def get_peak_depth(self) -> int:
+        return self.__peak_depth
+
+    def get_delivered_count(self) -> int:
+        return self.__delivered_count
+
+    def get_dropped_count(self) -> int:
+        return self.__dropped_count
+
+    def __call(self, handler, args, kargs) -> None:
+        with self.__lock:
+            self.__depth -= 1
+            self.__delivered_count += 1
+        handler(*args, **kargs)
+
+
+class LatestValueChannel(object):
+
+    """Канал последнего значения. Хранится только последнее опубликованное значение, медленный потребитель
+    пропускает устаревшие значения, очередь не растет"""
+
+    def __init__(self, name: str = None):
+        self.__name = name
+
+        self.__condition = Condition()
+        self.__value = None
+        self.__version = 0
+        self.__is_closed = False
+
+        # Futures of the asyncio waiters, resolved in the loop threads
+        self.__async_waiters = []
+
+        self.__consumers = []
+
+    def get_name(self) -> str:
+        return self.__name
+
+    # Can be used as an event handler: camera.add_frame_change_handler(channel.publish)
+    def publish(self, *args) -> None:
+        with self.__condition:
+            self.__value = args
+            self.__version += 1
+            version = self.__version
+            waiters = self.__async_waiters
+            self.__async_waiters = []
+            self.__condition.notify_all()
+
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_set_future_result, future, (version, args))
+
+    # Last published arguments tuple or None
+    def get_latest(self) -> tuple or None:
+        return self.__value
+
+    # Number of published values
+    def get_version(self) -> int:
+        return self.__version
+
+    # Waits for a value newer than the version. Returns (version, arguments) or None on the timeout or closing
+    def wait(self, version: int = 0, timeout: float = None) -> (int, tuple) or None:
+        with self.__condition:
+            if not self.__condition.wait_for(lambda: self.__version > version or self.__is_closed, timeout):
+                return None
+            if self.__version <= version:
+                return None
+            return self.__version, self.__value
+
+    async def wait_async(self, version: int = 0) -> (int, tuple) or None:
+        loop = asyncio.get_running_loop()
+        with self.__condition:
+            if self.__version > version:
+                return self.__version, self.__value
+            if self.__is_closed:
+                return None
+            future = loop.create_future()
+            self.__async_waiters.append((loop, future))
+        return await future
+
+    # Handler is called in the consumer thread with the newest value
+    def add_consumer(self, handler: callable, name: str = None):
+        consumer = LatestValueConsumer(self, handler, name)
+        with self.__condition:
+            self.__consumers.append(consumer)
+        consumer.start()
+        return consumer
+
+    def remove_consumer(self, consumer) -> None:
+        with self.__condition:
+            if consumer in self.__consumers:
+                self.__consumers.remove(consumer)
+        consumer.stop()
+
+    def is_closed(self) -> bool:
+        return self.__is_closed
+
+    # Values replaced by newer ones before the consumers took them
+    def get_coalesced_count(self) -> int:
+        return sum(consumer.get_coalesced_count() for consumer in list(self.__consumers))
+
+    def close(self) -> None:
+        with self.__condition:
+            self.__is_closed = True
+            consumers = list(self.__consumers)
+            waiters = self.__async_waiters
+            self.__async_waiters = []
+            self.__condition.notify_all()
+        for consumer in consumers:
+            consumer.stop()
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_set_future_result, future, None)
+
+
+class LatestValueConsumer(Thread):
+
+    # The stop flag is checked at least with this interval while there are no new values
+    __WAIT_TIMEOUT = 0.5  # seconds
+
+    def __init__(self, channel: LatestValueChannel, handler: callable, name: str = None):
+        super().__init__(name=name, daemon=True)
+        self.__channel = channel
+        self.__handler = handler
+        self.__is_running = True
+
+        self.__version = channel.get_version()
+        self.__delivered_count = 0
+        self.__coalesced_count = 0
+
+    def run(self) -> None:
+        while self.__is_running:
+            result = self.__channel.wait(self.__version, self.__WAIT_TIMEOUT)
+            if result is None:
+                if self.__channel.is_closed():
+                    return
+                continue
+            if not self.__is_running:
+                return
+            version, args = result
+            self.__coalesced_count += version - self.__version - 1
+            self.__version = version
+
+            try:
+                self.__handler(*args)
+            except Exception:
+                traceback.print_exc()
+            self.__delivered_count += 1
+
+    # The handler is not called after the current call
+    def stop(self) -> None:
+        self.__is_running = False
+
+    def get_delivered_count(self) -> int:
+        return self.__delivered_count
+
+    def get_coalesced_count(self) -> int:
+        return self.__coalesced_count
+
+
+def _set_future_result(future, result):
+    if not future.done():
+        future.set_result(result)
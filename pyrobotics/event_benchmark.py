@@ -0,0 +1,57 @@
+import sys
+import timeit
+from threading import Thread
+
+from pyrobotics.event import Event
+
+
+# Cost of Event.fire() with 0, 1 and 10 handlers, alone and while another thread handles/unhandles.
+# Run: python -m pyrobotics.event_benchmark [fires count]
+
+_DEFAULT_FIRES_COUNT = 1000000
+
+
+def _handler(value):
+    pass
+
+
+# Returns nanoseconds per fire()
+def measure_fire(handlers_count: int, fires_count: int) -> float:
+    event = Event()
+    for _ in range(handlers_count):
+        # Different objects, Event keeps unique handlers
+        event.handle(lambda value: None)
+    return timeit.timeit(lambda: event.fire(1), number=fires_count) / fires_count * 1e9
+
+
+# Fire while another thread changes the handlers. Returns nanoseconds per fire()
+def measure_concurrent_fire(handlers_count: int, fires_count: int) -> float:
+    event = Event()
+    for _ in range(handlers_count):
+        event.handle(lambda value: None)
+
+    is_running = [True]
+
+    def change_handlers():
+        while is_running[0]:
+            event.handle(_handler)
+            event.unhandle(_handler)
+
+    thread = Thread(target=change_handlers, daemon=True)
+    thread.start()
+    try:
+        return timeit.timeit(lambda: event.fire(1), number=fires_count) / fires_count * 1e9
+    finally:
+        is_running[0] = False
+        thread.join()
+
+
+def main(fires_count: int = _DEFAULT_FIRES_COUNT) -> None:
+    for handlers_count in (0, 1, 10):
+        print("{:>2} handlers: {:>8.1f} ns/fire, with concurrent handle/unhandle {:>8.1f} ns/fire".format(
+            handlers_count, measure_fire(handlers_count, fires_count),
+            measure_concurrent_fire(handlers_count, fires_count // 10)))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else _DEFAULT_FIRES_COUNT)
@@ -93,12 +93,12 @@ class PylonCameraWidget(QWidget):
             return
         self.__unset_camera()
         self.__camera = camera
-        self.__camera.add_grab_started_handler(self.__on_camera_start_grabbing)
-        self.__camera.add_grab_stopped_handler(self.__on_camera_stop_grabbing)
-        self.__camera.add_frame_change_handler(self.__on_camera_frame_change)
-        self.__camera.add_opened_handler(self.__on_camera_opened)
-        self.__camera.add_closed_handler(self.__on_camera_closed)
-        self.__camera.add_error_handler(self.__on_camera_error)
+        self.__camera.add_grab_started_handler(self.__on_camera_start_grabbing, weak=True)
+        self.__camera.add_grab_stopped_handler(self.__on_camera_stop_grabbing, weak=True)
+        self.__camera.add_frame_change_handler(self.__on_camera_frame_change, weak=True)
+        self.__camera.add_opened_handler(self.__on_camera_opened, weak=True)
+        self.__camera.add_closed_handler(self.__on_camera_closed, weak=True)
+        self.__camera.add_error_handler(self.__on_camera_error, weak=True)
         if self.__camera.is_open():
             self.__show_settings()
         else:
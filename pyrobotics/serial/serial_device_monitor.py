@@ -0,0 +1,199 @@
+import os
+from threading import Thread, Lock, Event as ThreadEvent
+
+import serial.tools.list_ports as ports_list
+
+from pyrobotics.event import Event
+
+try:
+    from serial.tools.list_ports_linux import SysFS
+except ImportError:
+    SysFS = None
+
+
+class SerialDevice(object):
+
+    """Описание последовательного порта. Ключ (VID, PID, серийный номер, расположение) не меняется при переподключении"""
+
+    def __init__(self, port_info):
+        self.__device = port_info.device
+        self.__name = port_info.name
+        self.__description = port_info.description
+        self.__hwid = port_info.hwid
+        self.__vid = port_info.vid
+        self.__pid = port_info.pid
+        self.__serial_number = port_info.serial_number
+        self.__location = port_info.location
+
+    # Port path, may change after reconnection (/dev/ttyACM0 -> /dev/ttyACM1)
+    def get_device(self) -> str:
+        return self.__device
+
+    def get_name(self) -> str:
+        return self.__name
+
+    def get_description(self) -> str:
+        return self.__description
+
+    def get_hwid(self) -> str:
+        return self.__hwid
+
+    def get_vid(self) -> int:
+        return self.__vid
+
+    def get_pid(self) -> int:
+        return self.__pid
+
+    def get_serial_number(self) -> str:
+        return self.__serial_number
+
+    def get_location(self) -> str:
+        return self.__location
+
+    def is_usb(self) -> bool:
+        return self.__vid is not None
+
+    # Stable identity of the device. Not USB devices are identified by the port path
+    def get_key(self) -> tuple:
+        if not self.is_usb():
+            return None, None, None, self.__device
+        return self.__vid, self.__pid, self.__serial_number, self.__location
+
+    def __str__(self):
+        return self.__device + " (" + self.__description + ")"
+
+
+class SerialDeviceMonitor(Thread):
+
+    """Кэш списка последовательных портов. Обновляется опросом sysfs (Linux) или comports() в фоновом потоке"""
+
+    __SYSFS_TTY_PATH = '/sys/class/tty'
+    __DEFAULT_INTERVAL = 1.0  # seconds
+
+    __instance = None
+    __instance_lock = Lock()
+
+    # Shared monitor. It is started on the first call
+    @classmethod
+    def get_instance(cls):
+        with cls.__instance_lock:
+            if cls.__instance is None:
+                cls.__instance = SerialDeviceMonitor()
+                cls.__instance.start()
+            return cls.__instance
+
+    def __init__(self, interval: float = __DEFAULT_INTERVAL):
+        super().__init__(daemon=True)
+
+        self.__interval = interval
+        self.__lock = Lock()
+        self.__stop_event = ThreadEvent()
+
+        # Port path -> SerialDevice
+        self.__devices = dict()
+        # Ports which are not serial devices (not present internal ports)
+        self.__ignored = set()
+        # Port path -> signature of the inspected device, the port is inspected again when it changes
+        self.__signatures = dict()
+
+        self.__device_added_event = Event()
+        self.__device_removed_event = Event()
+
+        self.refresh()
+
+    def run(self) -> None:
+        while not self.__stop_event.wait(self.__interval):
+            self.refresh()
+
+    def stop(self) -> None:
+        self.__stop_event.set()
+
+    def set_interval(self, value: float) -> None:
+        self.__interval = value
+
+    # Events. Handlers receive SerialDevice
+    def add_device_added_handler(self, handler: callable) -> None:
+        self.__device_added_event.handle(handler)
+
+    def add_device_removed_handler(self, handler: callable) -> None:
+        self.__device_removed_event.handle(handler)
+
+    def remove_device_added_handler(self, handler: callable) -> None:
+        self.__device_added_event.unhandle(handler)
+
+    def remove_device_removed_handler(self, handler: callable) -> None:
+        self.__device_removed_event.unhandle(handler)
+
+    # Devices
+    def get_devices(self) -> [SerialDevice]:
+        with self.__lock:
+            return list(self.__devices.values())
+
+    def get_device_by_key(self, key: tuple) -> SerialDevice or None:
+        with self.__lock:
+            for device in self.__devices.values():
+                if device.get_key() == key:
+                    return device
+        return None
+
+    def find_devices(self, vid: int = None, pid: int = None, serial_number: str = None, location: str = None) -> [SerialDevice]:
+        found = []
+        for device in self.get_devices():
+            if (vid is None or device.get_vid() == vid) and (pid is None or device.get_pid() == pid) and \
+                    (serial_number is None or device.get_serial_number() == serial_number) and \
+                    (location is None or device.get_location() == location):
+                found.append(device)
+        return found
+
+    # Only new ports and ports with a changed signature (other device on the same path) are inspected, known ports
+    # are taken from the cache. A changed device is reported as removed and added
+    def refresh(self) -> None:
+        ports = self.__scan()
+
+        with self.__lock:
+            changed = [port for port, signature in self.__signatures.items()
+                       if port not in ports or ports[port][0] != signature]
+            removed = [self.__devices.pop(port) for port in changed if port in self.__devices]
+            for port in changed:
+                del self.__signatures[port]
+                self.__ignored.discard(port)
+            new_ports = [port for port in ports if port not in self.__signatures]
+
+        added = []
+        ignored = []
+        for port in new_ports:
+            port_info = ports[port][1]
+            if port_info is None:
+                port_info = SysFS(port)
+                if port_info.subsystem == "platform":
+                    ignored.append(port)
+                    continue
+            added.append(SerialDevice(port_info))
+
+        with self.__lock:
+            for device in added:
+                self.__devices[device.get_device()] = device
+            self.__ignored.update(ignored)
+            for port in new_ports:
+                self.__signatures[port] = ports[port][0]
+
+        for device in removed:
+            self.__device_removed_event.fire(device)
+        for device in added:
+            self.__device_added_event.fire(device)
+
+    # Port path -> (signature, port info). Port info is None if it has to be read from sysfs, the signature is the
+    # target and the change time of the sysfs device link then
+    def __scan(self) -> dict:
+        if SysFS is not None and os.path.isdir(self.__SYSFS_TTY_PATH):
+            ports = dict()
+            for name in os.listdir(self.__SYSFS_TTY_PATH):
+                device_path = os.path.join(self.__SYSFS_TTY_PATH, name, 'device')
+                try:
+                    signature = os.path.realpath(device_path), os.stat(device_path).st_ctime_ns
+                except OSError:
+                    # No device link or the device is being removed
+                    continue
+                ports['/dev/' + name] = signature, None
+            return ports
+        return {port_info.device: (port_info.hwid, port_info) for port_info in ports_list.comports()}
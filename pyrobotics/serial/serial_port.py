@@ -1,4 +1,4 @@
-import serial.tools.list_ports as ports_list
+from pyrobotics.serial.serial_device_monitor import SerialDeviceMonitor
 
 
 class SerialPort(object):
@@ -17,14 +17,11 @@ class SerialPort(object):
     BAUDRATE_128000 = 128000
     BAUDRATE_256000 = 256000
 
+    # Ports are taken from the shared SerialDeviceMonitor cache
     @staticmethod
     def get_device_list():
-        device_list = []
-        for port in ports_list.comports():
-            # print(port.device)
-            # print(port.name)
-            # print(port.location)
-            # print(port.description)
-            # print(port.hwid)
-            device_list.append(port.device)
-        return device_list
+        return [device.get_device() for device in SerialDeviceMonitor.get_instance().get_devices()]
+
+    @staticmethod
+    def get_devices():
+        return SerialDeviceMonitor.get_instance().get_devices()
@@ -0,0 +1,76 @@
+class BlockIdCounter(object):
+
+    """Порядковый номер кадра по счетчику камеры (BlockID Basler). Номер не уменьшается: переполнение 16-битного
+    счетчика GigE и перезапуск захвата продолжают последовательность, пропуски номеров - потерянные кадры.
+    Номер триггера - счетчик камеры без перезапусков, он совпадает у камер, запущенных вместе по одному триггеру"""
+
+    # BlockID of the camera which does not provide it
+    NOT_AVAILABLE = 2 ** 64 - 1
+
+    # 16-bit GigE block id runs 1..65535, 0 is not used
+    GIGE_BLOCK_ID_MAX = 0xFFFF
+    __GIGE_DEVICE_CLASS = "BaslerGigE"
+
+    # Block id max - the last value of the counter before the overflow (GIGE_BLOCK_ID_MAX), None for 64-bit counters
+    # (USB3), which do not overflow
+    def __init__(self, block_id_max: int = None):
+        self.__block_id_max = block_id_max
+
+        self.__last_block_id = None
+        self.__last_sequence_number = -1
+        # Trigger ID = block id + overflows count * block id max, it starts again after the counter restart
+        self.__overflow_offset = 0
+        self.__trigger_id = None
+        # Sequence number = trigger ID + restart offset
+        self.__restart_offset = 0
+
+    # Counter for the pylon InstantCamera: GigE cameras have the 16-bit counter
+    @classmethod
+    def for_camera(cls, camera):
+        is_gige = camera.GetDeviceInfo().GetDeviceClass() == cls.__GIGE_DEVICE_CLASS
+        return cls(cls.GIGE_BLOCK_ID_MAX if is_gige else None)
+
+    # Sequence number of the frame with the block id. Without the block id the frames are counted by the host
+    def update(self, block_id: int) -> int:
+        if block_id is None or block_id == self.NOT_AVAILABLE:
+            self.__last_block_id = None
+            self.__trigger_id = None
+            self.__last_sequence_number += 1
+            return self.__last_sequence_number
+
+        last = self.__last_block_id
+        if last is None:
+            # The first frame is numbered by the camera counter, after the frames counted by the host the sequence
+            # is continued
+            self.__overflow_offset = 0
+            self.__restart_offset = 0 if self.__last_sequence_number < 0 else self.__last_sequence_number + 1 - block_id
+        elif block_id <= last:
+            if self.__is_overflow(last, block_id):
+                self.__overflow_offset += self.__block_id_max
+            else:
+                # Camera restarted the grabbing and the counter
+                self.__overflow_offset = 0
+                self.__restart_offset = self.__last_sequence_number + 1 - block_id
+
+        self.__last_block_id = block_id
+        self.__trigger_id = block_id + self.__overflow_offset
+        self.__last_sequence_number = self.__trigger_id + self.__restart_offset
+        return self.__last_sequence_number
+
+    # The last sequence number is the camera counter, not counted by the host
+    def is_counted_by_camera(self) -> bool:
+        return self.__last_block_id is not None
+
+    # Camera counter of the last frame, None if the camera does not provide it. See Frame.get_trigger_id
+    def get_last_trigger_id(self) -> int or None:
+        return self.__trigger_id
+
+    def get_last_sequence_number(self) -> int:
+        return self.__last_sequence_number
+
+    # The counter went on from the max to the small values, the restart goes back much farther
+    def __is_overflow(self, last: int, block_id: int) -> bool:
+        maximum = self.__block_id_max
+        if maximum is None or last > maximum:
+            return False
+        return 0 < block_id + maximum - last <= maximum // 2
@@ -1,11 +1,15 @@
+import time
 from enum import Enum
-from threading import Thread
+from threading import Thread, Lock
 
 from pyrobotics.event import Event
 
 import numpy as np
 
-from pyrobotics.utils.time_utils import millis
+from pyrobotics.video.cameras.frame import Frame
+from pyrobotics.video.cameras.frame_pool import FramePool
+from pyrobotics.video.cameras.frame_ring import FrameRing, FrameConsumer
+from pyrobotics.video.cameras.shared_frame_ring import SharedFrameRing
 
 
 class Camera(object):
@@ -13,6 +17,8 @@ class Camera(object):
     class Type(Enum):
         PYLON = "Basler"
         OPENCV = "OpenCV"
+        FILE = "File"
+        SYNTHETIC = "Synthetic"
 
         @classmethod
         def get_names(cls):
@@ -30,21 +36,36 @@ class Camera(object):
     def get_device_count() -> int:
         pass
 
+    # With dst the channels are swapped into the existing array
     @staticmethod
-    def swap_rb(frame: np.array) -> np.array:
-        return frame[..., ::-1].copy()
+    def swap_rb(frame: np.array, dst: np.array = None) -> np.array:
+        if dst is None:
+            return frame[..., ::-1].copy()
+        np.copyto(dst, frame[..., ::-1])
+        return dst
 
-    def __init__(self, camera_type: Type):
-        device_count = self.get_device_count()
-
-        if device_count == 0:
-            raise ConnectionError("No cameras connected")
+    __DEFAULT_FRAME_RING_CAPACITY = 8
 
+    # Devices are not enumerated here, a missing device is reported by the open
+    def __init__(self, camera_type: Type):
         self.__type = camera_type
         self.__grab_thread = None
 
+        # Reusable frame arrays, None - a new array for every frame
+        self._frame_pool = None
+
+        # Sequence number of the next frame
+        self.__frame_sequence_number = 0
+        self.__frame_camera_id = None
+
+        # Frames for the consumers which are processed out of the grab thread. Created by the first consumer
+        self.__frame_ring = None
+        self.__frame_ring_capacity = self.__DEFAULT_FRAME_RING_CAPACITY
+
         # Events
-        self._frame_change_event = Event()
+        self._frame_change_event = Event('Camera.frame_change')
+        # Frame objects, the same for all cameras
+        self._frame_event = Event('Camera.frame')
         self._started_event = Event()
         self._stopped_event = Event()
         self._opened_event = Event()
@@ -87,28 +108,94 @@ class Camera(object):
     def get_fps(self) -> float:
         pass
 
+    # Frame pool. Frames are reused after the frame change handlers return, a handler which keeps the frame calls
+    # retain_frame and release_frame when the frame is not needed. The pool is not used while any frame handler has
+    # a delivery: the delivered handler is called after the frame is reused
+    def set_use_frame_pool(self, is_used: bool, max_free_count: int = 4) -> None:
+        self._frame_pool = FramePool(max_free_count) if is_used else None
+
+    def get_frame_pool(self) -> FramePool or None:
+        return self._frame_pool
+
+    def retain_frame(self, frame: np.array) -> None:
+        if self._frame_pool is not None:
+            self._frame_pool.retain(frame)
+
+    def release_frame(self, frame: np.array) -> None:
+        if self._frame_pool is not None:
+            self._frame_pool.release(frame)
+
+    # Frame consumers. The grab thread only puts the frame into the ring, every consumer takes frames in its own thread
+    # by its policy, so a slow consumer does not lower the capture fps (except the BLOCK policy). The handler receives
+    # Frame: the ring takes the frame event, whose arrays stay valid after the grab (unlike Pylon grab results of the
+    # frame change event)
+    def set_frame_ring_capacity(self, capacity: int) -> None:
+        self.__frame_ring_capacity = capacity
+
+    def add_frame_consumer(self, handler: callable, policy: FrameRing.Policy = FrameRing.Policy.LATEST_ONLY,
+                           name: str = None) -> FrameConsumer:
+        if self.__frame_ring is None:
+            self.__frame_ring = FrameRing(self.__frame_ring_capacity, self.__retain_frame_array,
+                                          self.__release_frame_array)
+            self._frame_event.handle(self.__frame_ring.put)
+        consumer = FrameConsumer(self.__frame_ring, handler, policy, name)
+        consumer.start()
+        return consumer
+
+    def remove_frame_consumer(self, consumer: FrameConsumer) -> None:
+        consumer.stop()
+
+    def get_frame_ring(self) -> FrameRing or None:
+        return self.__frame_ring
+
+    def __retain_frame_array(self, frame: Frame) -> None:
+        self.retain_frame(frame.get_array())
+
+    def __release_frame_array(self, frame: Frame) -> None:
+        self.release_frame(frame.get_array())
+
+    # Frames for the other processes. The frame is copied into the shared memory ring in the grab thread,
+    # the processes read it by the ring name with SharedFrameReader
+    def add_shared_frame_output(self, frame_size: int, slots_count: int = 4, name: str = None) -> SharedFrameRing:
+        ring = SharedFrameRing(frame_size, slots_count, name)
+        self._frame_event.handle(ring.put)
+        return ring
+
+    def remove_shared_frame_output(self, ring: SharedFrameRing) -> None:
+        self._frame_event.unhandle(ring.put)
+        ring.close()
+
     # Events
-    def add_frame_change_handler(self, handler: callable) -> None:
-        self._frame_change_event.handle(handler)
+    # A slow handler can be delivered out of the grab thread (e.g. QueueDelivery with the drop policy).
+    # Weak handlers (bound methods of widgets etc.) are removed when their objects are collected
+    def add_frame_change_handler(self, handler: callable, delivery=None, weak: bool = False) -> None:
+        self._frame_change_event.handle(handler, delivery, weak)
 
-    def add_grab_started_handler(self, handler: callable) -> None:
-        self._started_event.handle(handler)
+    # Handler receives Frame
+    def add_frame_handler(self, handler: callable, delivery=None, weak: bool = False) -> None:
+        self._frame_event.handle(handler, delivery, weak)
 
-    def add_grab_stopped_handler(self, handler: callable) -> None:
-        self._stopped_event.handle(handler)
+    def add_grab_started_handler(self, handler: callable, weak: bool = False) -> None:
+        self._started_event.handle(handler, weak=weak)
 
-    def add_opened_handler(self, handler: callable) -> None:
-        self._opened_event.handle(handler)
+    def add_grab_stopped_handler(self, handler: callable, weak: bool = False) -> None:
+        self._stopped_event.handle(handler, weak=weak)
 
-    def add_closed_handler(self, handler: callable) -> None:
-        self._closed_event.handle(handler)
+    def add_opened_handler(self, handler: callable, weak: bool = False) -> None:
+        self._opened_event.handle(handler, weak=weak)
 
-    def add_error_handler(self, handler: callable) -> None:
-        self._error_event.handle(handler)
+    def add_closed_handler(self, handler: callable, weak: bool = False) -> None:
+        self._closed_event.handle(handler, weak=weak)
+
+    def add_error_handler(self, handler: callable, weak: bool = False) -> None:
+        self._error_event.handle(handler, weak=weak)
 
     def remove_frame_change_handler(self, handler: callable):
         self._frame_change_event.unhandle(handler)
 
+    def remove_frame_handler(self, handler: callable) -> None:
+        self._frame_event.unhandle(handler)
+
     def remove_grab_started_handler(self, handler: callable) -> None:
         self._started_event.unhandle(handler)
 
@@ -125,6 +212,10 @@ class Camera(object):
         self._error_event.unhandle(handler)
 
     def remove_all_handlers(self):
+        if self.__frame_ring is not None:
+            self.__frame_ring.close()
+            self.__frame_ring = None
+
         # Слушатели _opened_event не очищались когда remove_all_handlers() вызывался из PylonCamera.close()
         # я убрал этот вызов и добавил очистку, надо проверить на что это повлияет
         self._opened_event.clear_handlers()
@@ -133,12 +224,35 @@ class Camera(object):
         self._stopped_event.clear_handlers()
         self._started_event.clear_handlers()
         self._frame_change_event.clear_handlers()
+        self._frame_event.clear_handlers()
 
     # def _dispatch_error(self, message: str):
     #     message = "[CAMERA] " + self.__class__.__name__ + " Error. " + message
     #     print(message)
     #     self._error_event.fire(message)
 
+    # Frames must not be reused while there are handlers called out of the grab thread
+    def _has_delivered_frame_handlers(self) -> bool:
+        return self._frame_change_event.has_delivered_handlers() or self._frame_event.has_delivered_handlers()
+
+    # Frame event. The frame is made only if there are frame handlers
+    def _has_frame_handlers(self) -> bool:
+        return self._frame_event.get_handlers_count() > 0
+
+    # Sequence number - number of the frame given by the camera, by default the dispatched frames are counted.
+    # Trigger ID - frame counter of the camera, see Frame.get_trigger_id
+    def _dispatch_frame(self, array: np.array, capture_time: int, pixel_format: str, sequence_number: int = None,
+                        trigger_id: int = None) -> None:
+        if sequence_number is None:
+            sequence_number = self.__frame_sequence_number
+        self.__frame_sequence_number = sequence_number + 1
+        if self._frame_event.get_handlers_count() == 0:
+            return
+        if self.__frame_camera_id is None:
+            self.__frame_camera_id = self.get_id()
+        self._frame_event.fire(Frame(array, capture_time, sequence_number, self.__frame_camera_id, pixel_format,
+                                     trigger_id))
+
     def __str__(self):
         return self.get_name()
 
@@ -155,31 +269,113 @@ class _GrabThread(Thread):
 
 class FPSMeter(object):
 
-    __CALC_FPS_FRAMES_COUNT = 500
+    """Частота кадров по кольцевому буферу времен последних кадров (perf_counter_ns): мгновенная и по окну,
+    перцентили и джиттер интервалов между кадрами, пропущенные кадры по разрывам порядковых номеров"""
 
-    def __init__(self):
-        self.__fps = 0.0
+    __DEFAULT_WINDOW_SIZE = 120  # frames
 
-        self.__frames_count = 0
-        self.__last_calculation_time = millis()
+    def __init__(self, window_size: int = __DEFAULT_WINDOW_SIZE):
+        self.__window_size = max(window_size, 2)
+        self.__lock = Lock()
+        self.reset()
 
-    def get_fps(self) -> float:
-        self.__calc_fps()
-        return self.__fps
-
-    def add_frame(self) -> None:
-        self.__frames_count += 1
-        if self.__frames_count > self.__CALC_FPS_FRAMES_COUNT:
-            self.__calc_fps()
-
-    def __calc_fps(self) -> None:
-        now = millis()
-        delta = now - self.__last_calculation_time
-        if delta > 0:
-            self.__fps = self.__frames_count / (delta / 1000)
-            self.__last_calculation_time = now
+    def reset(self) -> None:
+        with self.__lock:
+            # Frame times in nanoseconds, the newest at the index - 1
+            self.__times = [0] * self.__window_size
+            self.__index = 0
             self.__frames_count = 0
 
+            self.__last_sequence_number = None
+            self.__dropped_count = 0
+
+    # Called per frame. Frame time - perf_counter_ns() of the frame, by default the call time.
+    # Sequence number - number of the frame given by the camera, gaps are counted as dropped frames
+    def add_frame(self, frame_time: int = None, sequence_number: int = None) -> None:
+        if frame_time is None:
+            frame_time = time.perf_counter_ns()
+        with self.__lock:
+            self.__times[self.__index] = frame_time
+            self.__index = (self.__index + 1) % self.__window_size
+            self.__frames_count += 1
+
+            if sequence_number is not None:
+                last = self.__last_sequence_number
+                # Lower number - the camera is restarted
+                if last is not None and sequence_number > last + 1:
+                    self.__dropped_count += sequence_number - last - 1
+                self.__last_sequence_number = sequence_number
+
+    # FPS of the frames in the window. If the frames stopped, the time without frames (longer than the mean interval)
+    # lowers the fps, so a stalled camera does not show the last value
+    def get_fps(self) -> float:
+        times = self.__get_window()
+        if len(times) < 2:
+            return 0.0
+        elapsed = times[-1] - times[0]
+        mean_interval = elapsed / (len(times) - 1)
+        idle = time.perf_counter_ns() - times[-1]
+        if idle > mean_interval:
+            elapsed += idle - mean_interval
+        return (len(times) - 1) * 1e9 / elapsed if elapsed > 0 else 0.0
+
+    # FPS by the last interval
+    def get_instant_fps(self) -> float:
+        times = self.__get_window()
+        if len(times) < 2 or times[-1] == times[-2]:
+            return 0.0
+        return 1e9 / (times[-1] - times[-2])
+
+    # Intervals between the frames of the window, milliseconds
+    def get_intervals(self) -> [float]:
+        times = self.__get_window()
+        return [(times[i] - times[i - 1]) / 1e6 for i in range(1, len(times))]
+
+    def get_mean_interval(self) -> float:
+        intervals = self.get_intervals()
+        return sum(intervals) / len(intervals) if intervals else 0.0
+
+    # Percentile (0 - 100) of the intervals, milliseconds
+    def get_interval_percentile(self, percentile: float) -> float:
+        return self.get_interval_percentiles((percentile, ))[0]
+
+    def get_interval_percentiles(self, percentiles=(50, 95, 99)) -> [float]:
+        intervals = sorted(self.get_intervals())
+        if not intervals:
+            return [0.0 for _ in percentiles]
+        last = len(intervals) - 1
+        return [intervals[min(int(round(percentile / 100 * last)), last)] for percentile in percentiles]
+
+    # Standard deviation of the intervals, milliseconds
+    def get_jitter(self) -> float:
+        intervals = self.get_intervals()
+        if len(intervals) < 2:
+            return 0.0
+        mean = sum(intervals) / len(intervals)
+        return (sum((interval - mean) ** 2 for interval in intervals) / len(intervals)) ** 0.5
+
+    def get_frames_count(self) -> int:
+        return self.__frames_count
+
+    # Frames missing in the sequence numbers
+    def get_dropped_count(self) -> int:
+        return self.__dropped_count
+
+    def get_dropped_ratio(self) -> float:
+        total = self.__frames_count + self.__dropped_count
+        return self.__dropped_count / total if total > 0 else 0.0
+
+    def get_window_size(self) -> int:
+        return self.__window_size
+
+    # Frame times from the oldest
+    def __get_window(self) -> [int]:
+        with self.__lock:
+            count = min(self.__frames_count, self.__window_size)
+            if count < self.__window_size:
+                return self.__times[:count]
+            return self.__times[self.__index:] + self.__times[:self.__index]
+
 
 # from enum import Enum
 # from threading import Thread
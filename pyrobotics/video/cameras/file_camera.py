@@ -0,0 +1,93 @@
+import os
+
+import cv2
+import numpy as np
+
+from pyrobotics.video.cameras.camera_base import Camera
+from pyrobotics.video.cameras.playback_camera import PlaybackCamera
+
+
+class FileCamera(PlaybackCamera):
+
+    """Камера, воспроизводящая видеофайл или каталог изображений (по имени файла)"""
+
+    IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+
+    def __init__(self, path: str, fps: float = None, is_looped: bool = True, is_preloaded: bool = False,
+                 pixel_format: PlaybackCamera.PixelFormat = PlaybackCamera.PixelFormat.BGR):
+        if not os.path.exists(path):
+            raise ConnectionError("Video source (" + path + ") not found")
+
+        self.__path = path
+        self.__is_directory = os.path.isdir(path)
+        self.__video_capture = None
+        self.__image_paths = []
+        self.__image_index = 0
+
+        super().__init__(Camera.Type.FILE, fps, is_looped, is_preloaded, pixel_format)
+
+    # Source
+    def _open_source(self) -> None:
+        if self.__is_directory:
+            names = sorted(name for name in os.listdir(self.__path) if name.lower().endswith(self.IMAGE_EXTENSIONS))
+            if not names:
+                raise ConnectionError("No images in the directory (" + self.__path + ")")
+            self.__image_paths = [os.path.join(self.__path, name) for name in names]
+            self.__image_index = 0
+            return
+
+        self.__video_capture = cv2.VideoCapture(self.__path)
+        if not self.__video_capture.isOpened():
+            raise ConnectionError("Video file (" + self.__path + ") can not be opened")
+
+    def _close_source(self) -> None:
+        if self.__video_capture is not None:
+            self.__video_capture.release()
+            self.__video_capture = None
+
+    def _read_source_frame(self) -> np.ndarray or None:
+        if self.__is_directory:
+            while self.__image_index < len(self.__image_paths):
+                image_path = self.__image_paths[self.__image_index]
+                self.__image_index += 1
+                frame = cv2.imread(image_path, cv2.IMREAD_COLOR)
+                if frame is not None:
+                    return frame
+                print("[FILE CAMERA] Warning. Image (" + image_path + ") can not be read")
+            return None
+
+        read, frame = self.__video_capture.read()
+        return frame if read else None
+
+    def _rewind_source(self) -> None:
+        if self.__is_directory:
+            self.__image_index = 0
+        else:
+            self.__video_capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    # ###########################
+    # Parameters
+    # ###########################
+
+    def get_id(self) -> str:
+        return self.__path
+
+    def get_name(self) -> str:
+        return "File camera " + self.__path
+
+    def get_path(self) -> str:
+        return self.__path
+
+    # Frame rate of the video file, None for the images and not opened files. Can be given to set_fps
+    def get_source_fps(self) -> float or None:
+        if self.__video_capture is None:
+            return None
+        return self.__video_capture.get(cv2.CAP_PROP_FPS) or None
+
+    # Frames count of the source, 0 if not known
+    def get_source_frames_count(self) -> int:
+        if self.__is_directory:
+            return len(self.__image_paths)
+        if self.__video_capture is None:
+            return 0
+        return max(int(self.__video_capture.get(cv2.CAP_PROP_FRAME_COUNT)), 0)
@@ -0,0 +1,61 @@
+import time
+
+import numpy as np
+
+
+class Frame(object):
+
+    """Кадр с метаданными: время захвата (time.monotonic_ns), порядковый номер, идентификатор камеры и формат
+    пикселей. Одинаковый для всех камер"""
+
+    # Pixel formats (GenICam names)
+    PIXEL_FORMAT_BGR8 = "BGR8"
+    PIXEL_FORMAT_RGB8 = "RGB8"
+    PIXEL_FORMAT_MONO8 = "Mono8"
+
+    __slots__ = ('__array', '__capture_time', '__sequence_number', '__camera_id', '__pixel_format', '__trigger_id')
+
+    def __init__(self, array: np.ndarray, capture_time: int, sequence_number: int, camera_id: str,
+                 pixel_format: str = PIXEL_FORMAT_BGR8, trigger_id: int = None):
+        self.__array = array
+        self.__capture_time = capture_time
+        self.__sequence_number = sequence_number
+        self.__camera_id = camera_id
+        self.__pixel_format = pixel_format
+        self.__trigger_id = trigger_id
+
+    def get_array(self) -> np.ndarray:
+        return self.__array
+
+    # Nanoseconds of time.monotonic_ns()
+    def get_capture_time(self) -> int:
+        return self.__capture_time
+
+    # Seconds from the capture, e.g. the pipeline latency at the current stage
+    def get_age(self) -> float:
+        return (time.monotonic_ns() - self.__capture_time) / 1e9
+
+    # Number of the frame since the camera start. Gaps are dropped frames
+    def get_sequence_number(self) -> int:
+        return self.__sequence_number
+
+    # Frame counter of the camera (e.g. BlockID of Basler cameras), the same for the frames of the cameras triggered
+    # together. None if the camera has no counter and the sequence number is counted by the host
+    def get_trigger_id(self) -> int or None:
+        return self.__trigger_id
+
+    def get_camera_id(self) -> str:
+        return self.__camera_id
+
+    def get_pixel_format(self) -> str:
+        return self.__pixel_format
+
+    def get_width(self) -> int:
+        return self.__array.shape[1]
+
+    def get_height(self) -> int:
+        return self.__array.shape[0]
+
+    def __repr__(self):
+        return "Frame(camera " + str(self.__camera_id) + ", #" + str(self.__sequence_number) + ", " + \
+               self.__pixel_format + ", " + str(self.__array.shape) + ")"
@@ -0,0 +1,84 @@
+from threading import Lock
+
+import numpy as np
+
+
+class FramePool(object):
+
+    """Пул переиспользуемых массивов кадров. Массив возвращается в пул, когда счетчик ссылок становится нулевым.
+    Обработчик, которому кадр нужен после возврата из обработчика, вызывает retain, а затем release"""
+
+    __DEFAULT_MAX_FREE_COUNT = 4
+
+    def __init__(self, max_free_count: int = __DEFAULT_MAX_FREE_COUNT):
+        self.__max_free_count = max_free_count
+        self.__lock = Lock()
+
+        # (shape, dtype) -> free arrays
+        self.__free = dict()
+        # id(array) -> [array, references count]
+        self.__used = dict()
+
+        self.__allocated_count = 0
+        self.__reused_count = 0
+
+    # Returns the array with one reference (of the caller)
+    def acquire(self, shape, dtype=np.uint8) -> np.ndarray:
+        key = (tuple(shape), np.dtype(dtype))
+        with self.__lock:
+            free = self.__free.get(key)
+            if free:
+                array = free.pop()
+                self.__reused_count += 1
+            else:
+                array = None
+                self.__allocated_count += 1
+
+        if array is None:
+            array = np.empty(key[0], dtype=key[1])
+        with self.__lock:
+            self.__used[id(array)] = [array, 1]
+        return array
+
+    # Returns False if the array is not from the pool
+    def retain(self, array: np.ndarray) -> bool:
+        with self.__lock:
+            entry = self.__used.get(id(array))
+            if entry is None:
+                return False
+            entry[1] += 1
+        return True
+
+    def release(self, array: np.ndarray) -> bool:
+        with self.__lock:
+            entry = self.__used.get(id(array))
+            if entry is None:
+                return False
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self.__used[id(array)]
+                free = self.__free.setdefault((array.shape, array.dtype), [])
+                if len(free) < self.__max_free_count:
+                    free.append(array)
+        return True
+
+    def is_pooled(self, array: np.ndarray) -> bool:
+        return id(array) in self.__used
+
+    # Free arrays are dropped, e.g. after the frame size change
+    def clear(self) -> None:
+        with self.__lock:
+            self.__free.clear()
+
+    def get_allocated_count(self) -> int:
+        return self.__allocated_count
+
+    def get_reused_count(self) -> int:
+        return self.__reused_count
+
+    def get_used_count(self) -> int:
+        return len(self.__used)
+
+    def get_free_count(self) -> int:
+        with self.__lock:
+            return sum(len(free) for free in self.__free.values())
@@ -0,0 +1,83 @@
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from pyrobotics.video.cameras.camera_base import Camera
+from pyrobotics.video.cameras.frame_pool import FramePool
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+
+# Allocations and per-frame time of the grab loop with and without the frame pool. The capture is simulated by a copy
+# of a 1080p BGR frame, the RGB mode swaps the channels.
+# Run: python -m pyrobotics.video.cameras.frame_pool_benchmark [frames count]
+
+_DEFAULT_FRAMES_COUNT = 300
+_FRAME_SHAPE = (1080, 1920, 3)
+
+
+def _swap_rb(frame, dst=None):
+    if cv2 is not None:
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=dst)
+    return Camera.swap_rb(frame, dst)
+
+
+# Returns (milliseconds per frame, allocated arrays count, peak traced megabytes)
+def measure_allocating_loop(source: np.ndarray, frames_count: int) -> (float, int, float):
+    def loop():
+        for _ in range(frames_count):
+            frame = source.copy()
+            _swap_rb(frame)
+
+    # Captured frame and the swapped frame
+    return _measure(loop, frames_count) + (2 * frames_count, ) + _measure_peak(loop)
+
+
+def measure_pooled_loop(source: np.ndarray, frames_count: int) -> (float, int, float):
+    pool = FramePool()
+
+    def loop():
+        for _ in range(frames_count):
+            frame = pool.acquire(source.shape)
+            np.copyto(frame, source)
+            rgb_frame = pool.acquire(source.shape)
+            _swap_rb(frame, rgb_frame)
+            pool.release(frame)
+            pool.release(rgb_frame)
+
+    duration = _measure(loop, frames_count)
+    return duration + (pool.get_allocated_count(), ) + _measure_peak(loop)
+
+
+def _measure(loop, frames_count: int) -> (float, ):
+    start = time.perf_counter()
+    loop()
+    return (time.perf_counter() - start) / frames_count * 1000,
+
+
+def _measure_peak(loop) -> (float, ):
+    tracemalloc.start()
+    loop()
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1e6,
+
+
+def main(frames_count: int = _DEFAULT_FRAMES_COUNT) -> None:
+    source = np.random.randint(0, 255, _FRAME_SHAPE, dtype=np.uint8)
+    frame_megabytes = source.nbytes / 1e6
+
+    print("Channels swap: " + ("cv2.cvtColor" if cv2 is not None else "NumPy"))
+    for name, measure in (("New arrays", measure_allocating_loop), ("Frame pool", measure_pooled_loop)):
+        duration, allocated_count, peak = measure(source, frames_count)
+        print("{:11} {:6.2f} ms/frame, {:5} arrays allocated ({:8.1f} MB), peak {:6.1f} MB".format(
+            name + ":", duration, allocated_count, allocated_count * frame_megabytes, peak))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else _DEFAULT_FRAMES_COUNT)
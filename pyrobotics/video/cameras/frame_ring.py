@@ -0,0 +1,227 @@
+import time
+import traceback
+from enum import Enum
+from threading import Thread, Condition
+
+
+class FrameRing(object):
+
+    """Кольцевой буфер кадров между потоком захвата и обработчиками. У каждого потребителя свой курсор и своя
+    политика: только последний кадр, пропуск старых кадров или блокировка захвата"""
+
+    class Policy(Enum):
+        # Consumer takes the newest frame, not taken frames are dropped
+        LATEST_ONLY = "Latest only"
+        # Consumer takes frames in order, frames overwritten by the producer are dropped
+        DROP_OLDEST = "Drop oldest"
+        # Producer waits until the consumer takes the oldest frame
+        BLOCK = "Block"
+
+        @classmethod
+        def get_names(cls):
+            return [policy.name for policy in cls]
+
+        @classmethod
+        def get_by_name(cls, name):
+            return cls[name]
+
+    __DEFAULT_CAPACITY = 8
+
+    # Retain and release receive the frame (the first argument of the put), e.g. Camera.retain_frame and release_frame
+    def __init__(self, capacity: int = __DEFAULT_CAPACITY, retain: callable = None, release: callable = None):
+        self.__capacity = capacity
+        self.__retain = retain
+        self.__release = release
+
+        self.__condition = Condition()
+        # Slot - (frame arguments, put time in nanoseconds)
+        self.__slots = [None] * capacity
+        # Sequence number of the next put frame
+        self.__head = 0
+        self.__is_closed = False
+
+        self.__cursors = []
+
+    def get_capacity(self) -> int:
+        return self.__capacity
+
+    # Number of put frames
+    def get_head(self) -> int:
+        return self.__head
+
+    # Can be used as the frame change handler
+    def put(self, *args) -> None:
+        with self.__condition:
+            self.__condition.wait_for(self.__has_free_slot)
+            if self.__is_closed:
+                return
+
+            index = self.__head % self.__capacity
+            evicted = self.__slots[index]
+            if args and self.__retain is not None:
+                self.__retain(args[0])
+            self.__slots[index] = (args, time.perf_counter_ns())
+            self.__head += 1
+            self.__condition.notify_all()
+
+        if evicted is not None:
+            self.__release_frame(evicted[0])
+
+    def add_cursor(self, policy: Policy = Policy.LATEST_ONLY):
+        cursor = FrameRingCursor(self, policy)
+        with self.__condition:
+            cursor._position = self.__head
+            self.__cursors.append(cursor)
+        return cursor
+
+    def remove_cursor(self, cursor) -> None:
+        with self.__condition:
+            if cursor in self.__cursors:
+                self.__cursors.remove(cursor)
+            self.__condition.notify_all()
+
+    def close(self) -> None:
+        with self.__condition:
+            self.__is_closed = True
+            slots = self.__slots
+            self.__slots = [None] * self.__capacity
+            self.__condition.notify_all()
+        for slot in slots:
+            if slot is not None:
+                self.__release_frame(slot[0])
+
+    def is_closed(self) -> bool:
+        return self.__is_closed
+
+    # Returns (frame arguments, sequence number, put time) or None on the timeout or closing. The frame is retained
+    def _take(self, cursor, timeout: float):
+        with self.__condition:
+            if not self.__condition.wait_for(lambda: self.__head > cursor._position or self.__is_closed, timeout):
+                return None
+            if self.__is_closed:
+                return None
+
+            oldest = max(self.__head - self.__capacity, 0)
+            if cursor.get_policy() == self.Policy.LATEST_ONLY:
+                position = self.__head - 1
+            else:
+                position = max(cursor._position, oldest)
+            cursor._dropped_count += position - cursor._position
+
+            args, put_time = self.__slots[position % self.__capacity]
+            if args and self.__retain is not None:
+                self.__retain(args[0])
+            cursor._position = position + 1
+            self.__condition.notify_all()
+        return args, position, put_time
+
+    def _release(self, args) -> None:
+        self.__release_frame(args)
+
+    def __release_frame(self, args) -> None:
+        if args and self.__release is not None:
+            self.__release(args[0])
+
+    # Blocking consumers must have taken the frame which is overwritten by the next put
+    def __has_free_slot(self) -> bool:
+        if self.__is_closed:
+            return True
+        for cursor in self.__cursors:
+            if cursor.get_policy() == self.Policy.BLOCK and self.__head - cursor._position >= self.__capacity:
+                return False
+        return True
+
+
+class FrameRingCursor(object):
+
+    def __init__(self, ring: FrameRing, policy: FrameRing.Policy):
+        self.__ring = ring
+        self.__policy = policy
+
+        # Sequence number of the next frame, changed by the ring
+        self._position = 0
+        self._dropped_count = 0
+
+        self.__taken_count = 0
+        # Time from the put to the take, nanoseconds
+        self.__last_latency = 0
+        self.__total_latency = 0
+        self.__max_latency = 0
+
+    def get_policy(self) -> FrameRing.Policy:
+        return self.__policy
+
+    # Returns the frame arguments tuple or None on the timeout or closing. The frame is kept until the release call
+    def get(self, timeout: float = None) -> tuple or None:
+        result = self.__ring._take(self, timeout)
+        if result is None:
+            return None
+        args, _position, put_time = result
+
+        latency = time.perf_counter_ns() - put_time
+        self.__taken_count += 1
+        self.__last_latency = latency
+        self.__total_latency += latency
+        self.__max_latency = max(self.__max_latency, latency)
+        return args
+
+    def release(self, args: tuple) -> None:
+        self.__ring._release(args)
+
+    def get_dropped_count(self) -> int:
+        return self._dropped_count
+
+    def get_taken_count(self) -> int:
+        return self.__taken_count
+
+    # Frames put and not taken yet
+    def get_depth(self) -> int:
+        return max(self.__ring.get_head() - self._position, 0)
+
+    def get_last_latency(self) -> int:
+        return self.__last_latency
+
+    def get_mean_latency(self) -> float:
+        return self.__total_latency / self.__taken_count if self.__taken_count > 0 else 0.0
+
+    def get_max_latency(self) -> int:
+        return self.__max_latency
+
+
+class FrameConsumer(Thread):
+
+    """Поток обработки кадров из FrameRing. Обработчик получает аргументы, переданные в put (у Camera - Frame)"""
+
+    # The stop flag is checked at least with this interval while there are no frames
+    __WAIT_TIMEOUT = 0.5  # seconds
+
+    def __init__(self, ring: FrameRing, handler: callable, policy: FrameRing.Policy = FrameRing.Policy.LATEST_ONLY,
+                 name: str = None):
+        super().__init__(name=name, daemon=True)
+        self.__ring = ring
+        self.__handler = handler
+        self.__cursor = ring.add_cursor(policy)
+        self.__is_running = True
+
+    def get_cursor(self) -> FrameRingCursor:
+        return self.__cursor
+
+    def run(self) -> None:
+        while self.__is_running:
+            args = self.__cursor.get(self.__WAIT_TIMEOUT)
+            if args is None:
+                if self.__ring.is_closed():
+                    break
+                continue
+            try:
+                self.__handler(*args)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                self.__cursor.release(args)
+        self.__ring.remove_cursor(self.__cursor)
+
+    def stop(self) -> None:
+        self.__is_running = False
+        # A blocked producer does not wait for the stopped consumer
+        self.__ring.remove_cursor(self.__cursor)
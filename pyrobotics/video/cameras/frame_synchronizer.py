@@ -0,0 +1,239 @@
+from collections import OrderedDict, deque
+from enum import Enum
+from threading import Lock
+
+from pyrobotics.event import Event
+from pyrobotics.video.cameras.frame import Frame
+
+
+class FrameSet(object):
+
+    """Набор кадров разных камер одного момента съемки"""
+
+    def __init__(self, frames: dict, trigger_id: int = None):
+        self.__frames = frames
+        self.__trigger_id = trigger_id
+
+        capture_times = [frame.get_capture_time() for frame in frames.values()]
+        self.__capture_time = min(capture_times)
+        self.__spread = max(capture_times) - self.__capture_time
+
+    # Camera ID -> Frame
+    def get_frames(self) -> dict:
+        return self.__frames
+
+    def get_frame(self, camera_id: str) -> Frame or None:
+        return self.__frames.get(camera_id)
+
+    # Trigger ID of the frames, None for the sets matched by the time
+    def get_trigger_id(self) -> int or None:
+        return self.__trigger_id
+
+    # The earliest capture time of the frames, nanoseconds
+    def get_capture_time(self) -> int:
+        return self.__capture_time
+
+    # Difference of the capture times of the frames, nanoseconds
+    def get_spread(self) -> int:
+        return self.__spread
+
+    def __len__(self):
+        return len(self.__frames)
+
+
+class FrameSynchronizer(object):
+
+    """Сборка кадров нескольких камер в наборы по номеру триггера или по близости времени захвата. Событие
+    вызывается один раз на полный набор, буферы ограничены, кадры без пары считаются"""
+
+    class MatchMode(Enum):
+        # Frames with the same trigger ID. By default it is the frame counter of the camera (Frame.get_trigger_id),
+        # frames of the cameras without the counter are rejected: the numbers counted by the host get out of step
+        # after the first dropped frame
+        TRIGGER_ID = "Trigger ID"
+        # Frames with capture times within the tolerance
+        TIMESTAMP = "Timestamp"
+
+        @classmethod
+        def get_names(cls):
+            return [mode.name for mode in cls]
+
+        @classmethod
+        def get_by_name(cls, name):
+            return cls[name]
+
+    __DEFAULT_TOLERANCE = 0.005  # seconds
+    __DEFAULT_MAX_PENDING = 8
+
+    # Trigger ID getter receives Frame. Max pending - frames of one camera (or incomplete sets) waiting for the match.
+    # Retain and release receive the frame array, e.g. Camera.retain_frame and release_frame of pooled frames
+    def __init__(self, camera_ids: [str], match_mode: MatchMode = MatchMode.TRIGGER_ID,
+                 tolerance: float = __DEFAULT_TOLERANCE, max_pending: int = __DEFAULT_MAX_PENDING,
+                 trigger_id_getter: callable = None, retain: callable = None, release: callable = None):
+        self.__camera_ids = [str(camera_id) for camera_id in camera_ids]
+        self.__match_mode = match_mode
+        self.__tolerance = int(tolerance * 1e9)
+        self.__max_pending = max_pending
+        self.__trigger_id_getter = trigger_id_getter if trigger_id_getter is not None else Frame.get_trigger_id
+        self.__retain = retain
+        self.__release = release
+
+        self.__lock = Lock()
+        # Trigger ID -> {camera ID: Frame}, from the oldest
+        self.__pending_sets = OrderedDict()
+        # Camera ID -> frames by the capture time
+        self.__pending_frames = {camera_id: deque() for camera_id in self.__camera_ids}
+
+        self.__sets_count = 0
+        self.__incomplete_sets_count = 0
+        # Camera ID -> frames dropped without the set
+        self.__unmatched_counts = {camera_id: 0 for camera_id in self.__camera_ids}
+        self.__unknown_count = 0
+        # Camera ID -> frames without the trigger ID
+        self.__rejected_counts = {camera_id: 0 for camera_id in self.__camera_ids}
+
+        self.__frame_set_event = Event('FrameSynchronizer.frame_set')
+
+    # Handler receives FrameSet. Frames of the set are released after the handlers
+    def add_frame_set_handler(self, handler: callable, delivery=None, weak: bool = False) -> None:
+        self.__frame_set_event.handle(handler, delivery, weak)
+
+    def remove_frame_set_handler(self, handler: callable) -> None:
+        self.__frame_set_event.unhandle(handler)
+
+    # Can be used as the frame handler of the cameras
+    def put(self, frame: Frame) -> None:
+        camera_id = str(frame.get_camera_id())
+        if camera_id not in self.__pending_frames:
+            self.__unknown_count += 1
+            return
+
+        trigger_id = None
+        if self.__match_mode == FrameSynchronizer.MatchMode.TRIGGER_ID:
+            trigger_id = self.__trigger_id_getter(frame)
+            if trigger_id is None:
+                self.__reject(camera_id)
+                return
+        self.__retain_frame(frame)
+
+        with self.__lock:
+            if self.__match_mode == FrameSynchronizer.MatchMode.TRIGGER_ID:
+                frame_set, dropped = self.__match_trigger_id(camera_id, frame, trigger_id)
+            else:
+                frame_set, dropped = self.__match_timestamp(camera_id, frame)
+            for dropped_frame in dropped:
+                self.__unmatched_counts[str(dropped_frame.get_camera_id())] += 1
+
+        for dropped_frame in dropped:
+            self.__release_frame(dropped_frame)
+        if frame_set is None:
+            return
+        try:
+            self.__frame_set_event.fire(frame_set)
+        finally:
+            for set_frame in frame_set.get_frames().values():
+                self.__release_frame(set_frame)
+
+    # Pending frames are dropped, e.g. after the restart of the cameras
+    def reset(self) -> None:
+        with self.__lock:
+            dropped = [frame for frames in self.__pending_sets.values() for frame in frames.values()]
+            dropped += [frame for frames in self.__pending_frames.values() for frame in frames]
+            self.__pending_sets.clear()
+            for frames in self.__pending_frames.values():
+                frames.clear()
+        for frame in dropped:
+            self.__release_frame(frame)
+
+    # Statistics
+    def get_sets_count(self) -> int:
+        return self.__sets_count
+
+    # Sets which did not get frames of all cameras
+    def get_incomplete_sets_count(self) -> int:
+        return self.__incomplete_sets_count
+
+    # Camera ID -> frames dropped without the set
+    def get_unmatched_counts(self) -> dict:
+        return dict(self.__unmatched_counts)
+
+    def get_unmatched_count(self) -> int:
+        return sum(self.__unmatched_counts.values())
+
+    # Frames of the cameras which are not in the camera IDs
+    def get_unknown_count(self) -> int:
+        return self.__unknown_count
+
+    # Camera ID -> frames rejected in the TRIGGER_ID mode, the camera does not provide the trigger ID
+    def get_rejected_counts(self) -> dict:
+        return dict(self.__rejected_counts)
+
+    def get_rejected_count(self) -> int:
+        return sum(self.__rejected_counts.values())
+
+    def get_pending_count(self) -> int:
+        with self.__lock:
+            if self.__match_mode == FrameSynchronizer.MatchMode.TRIGGER_ID:
+                return sum(len(frames) for frames in self.__pending_sets.values())
+            return sum(len(frames) for frames in self.__pending_frames.values())
+
+    # Sets are complete in the order of the triggers, so the older incomplete sets will not be completed
+    def __match_trigger_id(self, camera_id: str, frame: Frame, trigger_id: int) -> (FrameSet or None, [Frame]):
+        dropped = []
+        frames = self.__pending_sets.get(trigger_id)
+        if frames is None:
+            frames = self.__pending_sets[trigger_id] = dict()
+        previous = frames.get(camera_id)
+        if previous is not None:
+            dropped.append(previous)
+        frames[camera_id] = frame
+
+        if len(frames) < len(self.__camera_ids):
+            while len(self.__pending_sets) > self.__max_pending:
+                dropped += self.__drop_oldest_set()
+            return None, dropped
+
+        while next(iter(self.__pending_sets)) != trigger_id:
+            dropped += self.__drop_oldest_set()
+        del self.__pending_sets[trigger_id]
+        self.__sets_count += 1
+        return FrameSet(frames, trigger_id), dropped
+
+    def __reject(self, camera_id: str) -> None:
+        if self.__rejected_counts[camera_id] == 0:
+            print("[FRAME SYNCHRONIZER] Warning. Camera", camera_id, "does not provide the trigger ID, its frames are "
+                  "rejected. Use the TIMESTAMP mode or a trigger ID getter")
+        self.__rejected_counts[camera_id] += 1
+
+    def __drop_oldest_set(self) -> [Frame]:
+        _trigger_id, frames = self.__pending_sets.popitem(last=False)
+        self.__incomplete_sets_count += 1
+        return list(frames.values())
+
+    # The oldest head frame is dropped while it is farther than the tolerance from the newest head frame
+    def __match_timestamp(self, camera_id: str, frame: Frame) -> (FrameSet or None, [Frame]):
+        dropped = []
+        queue = self.__pending_frames[camera_id]
+        queue.append(frame)
+        if len(queue) > self.__max_pending:
+            dropped.append(queue.popleft())
+
+        while all(self.__pending_frames.values()):
+            heads = [frames[0] for frames in self.__pending_frames.values()]
+            newest = max(head.get_capture_time() for head in heads)
+            oldest = min(heads, key=Frame.get_capture_time)
+            if newest - oldest.get_capture_time() > self.__tolerance:
+                dropped.append(self.__pending_frames[str(oldest.get_camera_id())].popleft())
+                continue
+            frames = {camera_id: frames.popleft() for camera_id, frames in self.__pending_frames.items()}
+            self.__sets_count += 1
+            return FrameSet(frames), dropped
+        return None, dropped
+
+    def __retain_frame(self, frame: Frame) -> None:
+        if self.__retain is not None:
+            self.__retain(frame.get_array())
+
+    def __release_frame(self, frame: Frame) -> None:
+        if self.__release is not None:
+            self.__release(frame.get_array())
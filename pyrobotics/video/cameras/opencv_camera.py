@@ -1,8 +1,12 @@
+import time
 from enum import Enum
+from threading import Thread, Condition
 
 import cv2
 
 from pyrobotics.video.cameras.camera_base import Camera
+from pyrobotics.video.cameras.frame import Frame
+from pyrobotics.video.cameras.video_device_enumerator import VideoDeviceEnumerator
 
 
 class OpenCVCamera(Camera):
@@ -19,8 +23,60 @@ class OpenCVCamera(Camera):
         def get_by_name(cls, name):
             return cls[name]
 
+    class GrabMode(Enum):
+        # Grab and decode in the grab thread, the next frame is grabbed after the handlers
+        READ = "Read"
+        # Capture thread grabs frames without decoding, the grab thread decodes the latest grabbed frame when
+        # the handlers are done. Old frames do not wait in the driver buffer
+        GRAB_RETRIEVE = "Grab and retrieve"
+
+        @classmethod
+        def get_names(cls):
+            return [mode.name for mode in cls]
+
+        @classmethod
+        def get_by_name(cls, name):
+            return cls[name]
+
+    # Properties are applied in this order, the size and fps depend on the pixel format of the device
+    __PROPERTIES_ORDER = (cv2.CAP_PROP_FOURCC, cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT, cv2.CAP_PROP_FPS,
+                          cv2.CAP_PROP_BUFFERSIZE)
+
+    # Wait of the grabbed frame, the stop flag is checked with this interval
+    __RETRIEVE_TIMEOUT = 0.5  # seconds
+
+    # Count of the probed devices without V4L2, None - not probed
+    __probed_device_count = None
+
+    # Number of devices with the indexes 0, 1, ... without gaps, as the open of the indexes one by one finds them.
+    # Capture nodes may be not contiguous (every USB camera adds a metadata node), get_device_indexes() lists all
+    @classmethod
+    def get_device_count(cls) -> int:
+        count = 0
+        for index in cls.get_device_indexes():
+            if index != count:
+                break
+            count += 1
+        return count
+
+    # V4L2 capture devices are listed by /dev/video* and sysfs. Other systems probe the indexes by the open,
+    # the result is cached until invalidate_devices()
+    @classmethod
+    def get_device_indexes(cls) -> [int]:
+        enumerator = VideoDeviceEnumerator.get_instance()
+        if enumerator.is_supported():
+            return enumerator.get_capture_indexes()
+        if cls.__probed_device_count is None:
+            cls.__probed_device_count = cls.__probe_device_count()
+        return list(range(cls.__probed_device_count))
+
+    @classmethod
+    def invalidate_devices(cls) -> None:
+        VideoDeviceEnumerator.get_instance().invalidate()
+        cls.__probed_device_count = None
+
     @staticmethod
-    def get_device_count() -> int:
+    def __probe_device_count() -> int:
         max_tested = 100
         for i in range(max_tested):
             temp_camera = cv2.VideoCapture(i)
@@ -28,14 +84,24 @@ class OpenCVCamera(Camera):
                 temp_camera.release()
                 continue
             return i
+        return max_tested
 
-    def __init__(self, camera_index: int = -1, pixel_format: PixelFormat = PixelFormat.BGR):
+    def __init__(self, camera_index: int = -1, pixel_format: PixelFormat = PixelFormat.BGR,
+                 grab_mode: GrabMode = GrabMode.READ):
 
         self.__camera_index = camera_index
         self.__video_capture = None
         self.__is_grabbing = False
 
         self.__pixel_format = pixel_format
+        self.__grab_mode = grab_mode
+        self.__capture_thread = None
+
+        # Property ID -> value, set to the opened capture and applied again on the open
+        self.__properties = dict()
+
+        # Shape of the frames read into the frame pool arrays, known after the first frame
+        self.__frame_shape = None
 
         super().__init__(Camera.Type.OPENCV)
 
@@ -45,6 +111,9 @@ class OpenCVCamera(Camera):
         if self.__video_capture is None or not self.__video_capture.isOpened():
             error_message = "Camera with index (" + str(self.__camera_index) + ") not found"
             raise ConnectionError(error_message)
+        for property_id in self.__PROPERTIES_ORDER:
+            if property_id in self.__properties:
+                self.__apply_property(property_id, self.__properties[property_id])
 
     def start(self) -> None:
         if not self.is_open():
@@ -52,24 +121,86 @@ class OpenCVCamera(Camera):
         super().start()
 
     def is_open(self) -> bool:
-        return self.__video_capture.isOpened()
+        return self.__video_capture is not None and self.__video_capture.isOpened()
 
     def is_grabbing(self) -> bool:
         return self.__is_grabbing
 
     def _loop(self) -> None:
         self.__is_grabbing = True
+        if self.__grab_mode == OpenCVCamera.GrabMode.GRAB_RETRIEVE:
+            self.__capture_thread = _CaptureThread(self.__video_capture)
+            self.__capture_thread.start()
         self._started_event.fire(self)
         while self.__is_grabbing:
-            read, frame = self.__video_capture.read()
+            if self._frame_pool is not None and not self._has_delivered_frame_handlers():
+                self.__read_to_pool(self._frame_pool)
+                continue
+
+            read, frame, capture_time, sequence_number = self.__read()
             if read:
                 if self.__pixel_format == OpenCVCamera.PixelFormat.RGB:
                     frame = self.swap_rb(frame)
-                self._frame_change_event.fire(frame)
+                self.__dispatch_frame(frame, capture_time, sequence_number)
 
+        if self.__capture_thread is not None:
+            self.__capture_thread.stop()
+            self.__capture_thread.join()
+            self.__capture_thread = None
         self._stopped_event.fire(self)
         self.__is_grabbing = False
 
+    # Returns (read, frame, capture time, sequence number or None)
+    def __read(self, image=None) -> tuple:
+        if self.__capture_thread is not None:
+            return self.__capture_thread.retrieve(image, self.__RETRIEVE_TIMEOUT)
+        if image is None:
+            read, frame = self.__video_capture.read()
+        else:
+            read, frame = self.__video_capture.read(image=image)
+        return read, frame, time.monotonic_ns(), None
+
+    # Frame is read into the pooled array and returned to the pool after the handlers
+    def __read_to_pool(self, pool) -> None:
+        if self.__frame_shape is None:
+            read, frame, capture_time, sequence_number = self.__read()
+            if read:
+                self.__frame_shape = frame.shape
+                if self.__pixel_format == OpenCVCamera.PixelFormat.RGB:
+                    frame = self.swap_rb(frame)
+                self.__dispatch_frame(frame, capture_time, sequence_number)
+            return
+
+        frame = pool.acquire(self.__frame_shape)
+        read, image, capture_time, sequence_number = self.__read(frame)
+        if not read:
+            pool.release(frame)
+            return
+        if image is not frame:
+            # Frame size changed, OpenCV allocated a new array. Next frames are read into arrays of the new size
+            pool.release(frame)
+            pool.clear()
+            self.__frame_shape = None
+            return
+
+        if self.__pixel_format == OpenCVCamera.PixelFormat.RGB:
+            rgb_frame = pool.acquire(self.__frame_shape)
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb_frame)
+            pool.release(frame)
+            frame = rgb_frame
+
+        try:
+            self.__dispatch_frame(frame, capture_time, sequence_number)
+        finally:
+            pool.release(frame)
+
+    def __dispatch_frame(self, frame, capture_time, sequence_number) -> None:
+        self._frame_change_event.fire(frame)
+        if self.__pixel_format == OpenCVCamera.PixelFormat.RGB:
+            self._dispatch_frame(frame, capture_time, Frame.PIXEL_FORMAT_RGB8, sequence_number)
+        else:
+            self._dispatch_frame(frame, capture_time, Frame.PIXEL_FORMAT_BGR8, sequence_number)
+
     def stop(self):
         self.__is_grabbing = False
 
@@ -106,3 +237,158 @@ class OpenCVCamera(Camera):
 
     def get_pixel_format(self) -> PixelFormat:
         return self.__pixel_format
+
+    # Grab mode, applied on the start
+    def set_grab_mode(self, grab_mode: GrabMode) -> None:
+        self.__grab_mode = grab_mode
+
+    def get_grab_mode(self) -> GrabMode:
+        return self.__grab_mode
+
+    # Frames grabbed by the capture thread but not retrieved, because the handlers were busy
+    def get_skipped_frames_count(self) -> int:
+        capture_thread = self.__capture_thread
+        return capture_thread.get_skipped_count() if capture_thread is not None else 0
+
+    # _______________________________________________
+    # Свойства устройства. Заданные до открытия применяются при открытии.
+    # Возвращают False, если устройство не приняло значение
+    # _______________________________________________
+
+    # Frames queued in the driver. 1 - the lowest latency
+    def set_buffer_size(self, size: int) -> bool:
+        return self.__set_property(cv2.CAP_PROP_BUFFERSIZE, size)
+
+    def get_buffer_size(self) -> int:
+        return int(self.__get_property(cv2.CAP_PROP_BUFFERSIZE))
+
+    # Four characters code of the device pixel format, e.g. "MJPG" for the high fps of USB cameras
+    def set_fourcc(self, fourcc: str) -> bool:
+        return self.__set_property(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+
+    def get_fourcc(self) -> str:
+        code = int(self.__get_property(cv2.CAP_PROP_FOURCC))
+        return "".join(chr((code >> (8 * i)) & 0xFF) for i in range(4))
+
+    def set_mjpg(self) -> bool:
+        return self.set_fourcc("MJPG")
+
+    def set_resolution(self, width: int, height: int) -> bool:
+        width_set = self.__set_property(cv2.CAP_PROP_FRAME_WIDTH, width)
+        height_set = self.__set_property(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        return width_set and height_set
+
+    def get_resolution(self) -> (int, int):
+        return int(self.__get_property(cv2.CAP_PROP_FRAME_WIDTH)), int(self.__get_property(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    def set_fps(self, fps: float) -> bool:
+        return self.__set_property(cv2.CAP_PROP_FPS, fps)
+
+    def __set_property(self, property_id: int, value) -> bool:
+        self.__properties[property_id] = value
+        if not self.is_open():
+            return True
+        return self.__apply_property(property_id, value)
+
+    def __get_property(self, property_id: int):
+        if self.is_open():
+            return self.__video_capture.get(property_id)
+        return self.__properties.get(property_id, 0)
+
+    def __apply_property(self, property_id: int, value) -> bool:
+        is_set = self.__video_capture.set(property_id, value)
+        if not is_set:
+            print("[OPENCV CAMERA] Warning. Camera", self.__camera_index, "does not support the property", property_id,
+                  "value", value)
+        return is_set
+
+
+class _CaptureThread(Thread):
+
+    """Поток захвата кадров без декодирования. Декодируется только последний захваченный кадр, когда обработчики
+    готовы принять следующий"""
+
+    # Delay after the failed grab, e.g. the camera is disconnected
+    __ERROR_DELAY = 0.01  # seconds
+
+    def __init__(self, video_capture):
+        super().__init__(daemon=True)
+        self.__video_capture = video_capture
+
+        # The grab and the retrieve do not run at the same time, the grab overwrites the frame being decoded
+        self.__condition = Condition()
+        self.__is_running = True
+        self.__is_grabbing_frame = False
+        self.__is_retrieving = False
+        self.__is_retrieve_waiting = False
+
+        self.__grabbed_count = 0
+        self.__retrieved_count = 0
+        self.__skipped_count = 0
+        self.__capture_time = 0
+
+    def run(self) -> None:
+        while True:
+            with self.__condition:
+                # The waiting retrieve takes the grabbed frame before the next grab
+                self.__condition.wait_for(self.__can_grab)
+                if not self.__is_running:
+                    break
+                self.__is_grabbing_frame = True
+
+            grabbed = self.__video_capture.grab()
+            capture_time = time.monotonic_ns()
+
+            with self.__condition:
+                self.__is_grabbing_frame = False
+                if grabbed:
+                    self.__grabbed_count += 1
+                    self.__capture_time = capture_time
+                self.__condition.notify_all()
+            if not grabbed:
+                time.sleep(self.__ERROR_DELAY)
+
+    # Decodes the latest grabbed frame which is not retrieved yet. Returns (read, frame, capture time, sequence number)
+    def retrieve(self, image, timeout: float) -> tuple:
+        with self.__condition:
+            self.__is_retrieve_waiting = True
+            is_grabbed = self.__condition.wait_for(self.__can_retrieve, timeout)
+            self.__is_retrieve_waiting = False
+            if not is_grabbed or not self.__is_running:
+                self.__condition.notify_all()
+                return False, None, 0, None
+
+            self.__skipped_count += self.__grabbed_count - self.__retrieved_count - 1
+            self.__retrieved_count = self.__grabbed_count
+            capture_time = self.__capture_time
+            self.__is_retrieving = True
+
+        try:
+            if image is None:
+                read, frame = self.__video_capture.retrieve()
+            else:
+                read, frame = self.__video_capture.retrieve(image=image)
+        finally:
+            with self.__condition:
+                self.__is_retrieving = False
+                self.__condition.notify_all()
+        return read, frame, capture_time, self.__retrieved_count - 1
+
+    def stop(self) -> None:
+        with self.__condition:
+            self.__is_running = False
+            self.__condition.notify_all()
+
+    def get_skipped_count(self) -> int:
+        return self.__skipped_count
+
+    def __can_grab(self) -> bool:
+        if not self.__is_running:
+            return True
+        has_new_frame = self.__grabbed_count > self.__retrieved_count
+        return not self.__is_retrieving and not (self.__is_retrieve_waiting and has_new_frame)
+
+    def __can_retrieve(self) -> bool:
+        if not self.__is_running:
+            return True
+        return self.__grabbed_count > self.__retrieved_count and not self.__is_grabbing_frame
@@ -0,0 +1,184 @@
+import time
+from enum import Enum
+
+import numpy as np
+
+from pyrobotics.video.cameras.camera_base import Camera, FPSMeter
+from pyrobotics.video.cameras.frame import Frame
+
+
+class PlaybackCamera(Camera):
+
+    """Основа камер без устройства (файлы, сгенерированные кадры). Кадры выдаются с заданной частотой или
+    без ограничения частоты, с теми же событиями, что и у OpenCVCamera"""
+
+    class PixelFormat(Enum):
+        RGB = "RGB"
+        BGR = "BGR"
+
+        @classmethod
+        def get_names(cls):
+            return [pix_format.name for pix_format in cls]
+
+        @classmethod
+        def get_by_name(cls, name):
+            return cls[name]
+
+    # Fps - None for the unthrottled playback. Looped - the source is played again from the start after the end.
+    # Preloaded - all frames are read into the memory on the open, the playback does not decode frames
+    def __init__(self, camera_type: Camera.Type, fps: float = None, is_looped: bool = True, is_preloaded: bool = False,
+                 pixel_format: PixelFormat = PixelFormat.BGR):
+        self.__fps = fps
+        self.__is_looped = is_looped
+        self.__is_preloaded = is_preloaded
+        self.__pixel_format = pixel_format
+
+        self.__is_open = False
+        self.__is_grabbing = False
+        self.__preloaded_frames = None
+        self.__preloaded_index = 0
+        self.__played_count = 0
+        self.__fps_meter = FPSMeter()
+
+        super().__init__(camera_type)
+
+    # Source. Frames are BGR arrays
+    def _open_source(self) -> None:
+        pass
+
+    def _close_source(self) -> None:
+        pass
+
+    # Returns the next frame or None after the last frame
+    def _read_source_frame(self) -> np.ndarray or None:
+        pass
+
+    def _rewind_source(self) -> None:
+        pass
+
+    # Control
+    def open(self) -> None:
+        if self.__is_open:
+            return
+        self._open_source()
+        if self.__is_preloaded:
+            self.__preload()
+        self.__is_open = True
+        self._opened_event.fire(self)
+
+    def start(self) -> None:
+        if not self.is_open():
+            self.open()
+        super().start()
+
+    def stop(self) -> None:
+        self.__is_grabbing = False
+
+    def close(self) -> None:
+        super().close()
+        if not self.__is_open:
+            return
+        self.__is_open = False
+        self.__preloaded_frames = None
+        self._close_source()
+        self._closed_event.fire(self)
+
+    def is_open(self) -> bool:
+        return self.__is_open
+
+    def is_grabbing(self) -> bool:
+        return self.__is_grabbing
+
+    # Frames are fired at the absolute times start + n / fps, so the handlers time does not shift the rate.
+    # After a stall longer than the interval the schedule restarts from the current time
+    def _loop(self) -> None:
+        self.__is_grabbing = True
+        self._started_event.fire(self)
+
+        next_time = time.monotonic_ns()
+        while self.__is_grabbing:
+            frame = self.__next_frame()
+            if frame is None:
+                break
+
+            if self.__fps:
+                interval = int(1e9 / self.__fps)
+                delay = next_time - time.monotonic_ns()
+                if delay > 0:
+                    time.sleep(delay / 1e9)
+                elif delay < -interval:
+                    next_time = time.monotonic_ns()
+                next_time += interval
+
+            capture_time = time.monotonic_ns()
+            if self.__pixel_format == PlaybackCamera.PixelFormat.RGB:
+                frame = self.swap_rb(frame)
+                pixel_format = Frame.PIXEL_FORMAT_RGB8
+            else:
+                pixel_format = Frame.PIXEL_FORMAT_BGR8
+            self._frame_change_event.fire(frame)
+            self._dispatch_frame(frame, capture_time, pixel_format)
+            self.__played_count += 1
+            self.__fps_meter.add_frame()
+
+        self.__is_grabbing = False
+        self._stopped_event.fire(self)
+
+    # Preloaded frames are given to the handlers without the copy, handlers do not change them
+    def __next_frame(self) -> np.ndarray or None:
+        if self.__preloaded_frames is not None:
+            if self.__preloaded_index >= len(self.__preloaded_frames):
+                if not self.__is_looped or not self.__preloaded_frames:
+                    return None
+                self.__preloaded_index = 0
+            frame = self.__preloaded_frames[self.__preloaded_index]
+            self.__preloaded_index += 1
+            return frame
+
+        frame = self._read_source_frame()
+        if frame is None and self.__is_looped:
+            self._rewind_source()
+            frame = self._read_source_frame()
+        return frame
+
+    def __preload(self) -> None:
+        frames = []
+        frame = self._read_source_frame()
+        while frame is not None:
+            frames.append(frame)
+            frame = self._read_source_frame()
+        self.__preloaded_frames = frames
+        self.__preloaded_index = 0
+        size = sum(frame.nbytes for frame in frames)
+        print("[PLAYBACK CAMERA]", self.get_name(), "preloaded", len(frames), "frames,", round(size / 1e6, 1), "MB")
+
+    # ###########################
+    # Parameters
+    # ###########################
+
+    def get_fps(self) -> float:
+        if self.__fps:
+            return self.__fps
+        return self.__fps_meter.get_fps()
+
+    # None - unthrottled
+    def set_fps(self, fps: float or None) -> None:
+        self.__fps = fps
+
+    def set_looped(self, is_looped: bool) -> None:
+        self.__is_looped = is_looped
+
+    def is_looped(self) -> bool:
+        return self.__is_looped
+
+    def is_preloaded(self) -> bool:
+        return self.__is_preloaded
+
+    def get_played_count(self) -> int:
+        return self.__played_count
+
+    def set_pixel_format(self, pixel_format: PixelFormat) -> None:
+        self.__pixel_format = pixel_format
+
+    def get_pixel_format(self) -> PixelFormat:
+        return self.__pixel_format
@@ -1,3 +1,4 @@
+import time
 from datetime import datetime
 from enum import Enum
 from typing import Tuple
@@ -7,7 +8,9 @@ from pypylon.genicam import GenericException
 from pypylon.pylon import DeviceInfo
 
 from pyrobotics.event import Event
+from pyrobotics.video.cameras.block_id_counter import BlockIdCounter
 from pyrobotics.video.cameras.camera_base import Camera
+from pyrobotics.video.cameras.frame import Frame
 
 
 class PylonCamera(Camera):
@@ -158,7 +161,7 @@ class PylonCamera(Camera):
         self.__grab_strategy = None
         self.set_grab_strategy(PylonCamera.GrabStrategy.LATEST_IMAGE_ONLY)
 
-        grab_handler = _GrabEventHandler(frame_change_event=self._frame_change_event)
+        grab_handler = _GrabEventHandler(frame_change_event=self._frame_change_event, camera=self)
         configuration_handler = _ConfigurationEventHandler(camera=self, grab_started_event=self._started_event, grab_stopped_event=self._stopped_event, camera_opened_event=self._opened_event, camera_closed_event=self._closed_event)
 
         self.__pylon_camera.RegisterImageEventHandler(grab_handler, pylon.RegistrationMode_Append, pylon.Cleanup_Delete)
@@ -419,10 +422,13 @@ class PylonCamera(Camera):
 
 class _GrabEventHandler(pylon.ImageEventHandler):
 
-    def __init__(self, frame_change_event: Event):
+    def __init__(self, frame_change_event: Event, camera: PylonCamera):
         super().__init__()
 
         self.__frame_change_event = frame_change_event
+        self.__camera = camera
+        # Created on the first frame, the counter size depends on the transport layer of the camera
+        self.__block_id_counter = None
 
     def OnImagesSkipped(self, camera, count_of_skipped_images):
         pass
@@ -438,8 +444,18 @@ class _GrabEventHandler(pylon.ImageEventHandler):
         # serial = camera.DeviceSerialNumber.GetValue()
 
         if grab_result.GrabSucceeded():
-            time = datetime.now()
-            self.__frame_change_event.fire(grab_result, camera.DeviceSerialNumber.GetValue(), time)
+            capture_time = time.monotonic_ns()
+            frame_time = datetime.now()
+            self.__frame_change_event.fire(grab_result, camera.DeviceSerialNumber.GetValue(), frame_time)
+
+            # The grab result is valid only in this call, so the frame is converted here if it is needed.
+            # The sequence number is taken from the camera frame counter, so the frames lost before the host have gaps
+            array = PylonCamera.convert(grab_result) if self.__camera._has_frame_handlers() else None
+            if self.__block_id_counter is None:
+                self.__block_id_counter = BlockIdCounter.for_camera(camera)
+            sequence_number = self.__block_id_counter.update(grab_result.BlockID)
+            trigger_id = self.__block_id_counter.get_last_trigger_id()
+            self.__camera._dispatch_frame(array, capture_time, Frame.PIXEL_FORMAT_RGB8, sequence_number, trigger_id)
         else:
             try:
                 print("[PYLON CAMERA] Grab Error: ", grab_result.ErrorCode, grab_result.ErrorDescription)
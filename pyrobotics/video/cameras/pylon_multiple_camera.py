@@ -1,13 +1,16 @@
+import time
 from datetime import datetime
 from enum import Enum
 from threading import Thread
-from time import sleep
 from typing import Tuple
 
 from pypylon import pylon
 from pypylon.pylon import AccessException
 
 from pyrobotics.event import Event
+from pyrobotics.video.cameras.block_id_counter import BlockIdCounter
+from pyrobotics.video.cameras.frame import Frame
+from pyrobotics.video.cameras.trigger_scheduler import TriggerScheduler
 
 
 class PylonMultipleCamera(object):
@@ -52,6 +55,11 @@ class PylonMultipleCamera(object):
     def get_device_count(cls) -> int:
         return len(pylon.TlFactory.GetInstance().EnumerateDevices())
 
+    TRIGGER_SOURCE_SOFTWARE = 'Software'
+
+    __DEFAULT_TRIGGER_SPIN_THRESHOLD = 0.0  # milliseconds
+
+    # Trigger interval in milliseconds
     def __init__(self, cameras_count: int = 0, is_trigger: bool = False, trigger_interval: float = 0.0):
         super().__init__()
 
@@ -59,7 +67,12 @@ class PylonMultipleCamera(object):
         self.__cameras_list = None
         self.__trigger = None
         self.__is_trigger_mode = False
+        self.__is_trigger_configured = False
         self.__trigger_interval = trigger_interval
+        self.__trigger_source = self.TRIGGER_SOURCE_SOFTWARE
+        # Milliseconds from the trigger period start for every camera, None - all cameras at the start
+        self.__trigger_phase_offsets = None
+        self.__trigger_spin_threshold = self.__DEFAULT_TRIGGER_SPIN_THRESHOLD
         self.__cameras_count = 0
         self.__grab_strategy = pylon.GrabStrategy_LatestImageOnly
 
@@ -67,7 +80,8 @@ class PylonMultipleCamera(object):
         self.__converter.OutputPixelFormat = pylon.PixelType_RGB8packed
         self.__converter.OutputBitAlignment = pylon.OutputBitAlignment_MsbAligned
 
-        self.__frame_change_event = Event()
+        self.__frame_change_event = Event('PylonMultipleCamera.frame_change')
+        self.__frame_event = Event('PylonMultipleCamera.frame')
         self.__grab_started_event = Event()
         self.__grab_stopped_event = Event()
         # self.__camera_opened_event = Event()
@@ -98,7 +112,8 @@ class PylonMultipleCamera(object):
 
         self.__cameras_list = pylon.InstantCameraArray(cameras_count)
 
-        grab_handler = _GrabEventHandler(frame_change_event=self.__frame_change_event)
+        grab_handler = _GrabEventHandler(frame_change_event=self.__frame_change_event, frame_event=self.__frame_event,
+                                         converter=self.convert)
         configuration_handler = _ConfigurationEventHandler(grab_started_event=self.__grab_started_event,
                                                            grab_stopped_event=self.__grab_stopped_event)
 
@@ -192,30 +207,93 @@ class PylonMultipleCamera(object):
     def add_frame_change_handler(self, handler) -> None:
         self.__frame_change_event.handle(handler)
 
+    # Handler receives Frame, camera ID is the serial number
+    def add_frame_handler(self, handler, delivery=None, weak: bool = False) -> None:
+        self.__frame_event.handle(handler, delivery, weak)
+
+    def remove_frame_handler(self, handler) -> None:
+        self.__frame_event.unhandle(handler)
+
     def add_grab_started_handler(self, handler) -> None:
         self.__grab_started_event.handle(handler)
 
     def add_grab_stopped_handler(self, handler) -> None:
         self.__grab_stopped_event.handle(handler)
 
-    # Trigger
+    # Trigger. The software trigger is called by the scheduler with the interval from the absolute period start,
+    # so the trigger time does not shift the rate. Interval in milliseconds
     def set_trigger_interval(self, value: float):
         self.__trigger_interval = value
         if self.__trigger is not None:
-            self.__trigger.set_interval(value)
+            self.__trigger.set_interval(value / 1000)
+
+    def get_trigger_interval(self) -> float:
+        return self.__trigger_interval
+
+    # Frame start trigger source: TRIGGER_SOURCE_SOFTWARE or the input line of the hardware trigger ("Line1" ...)
+    def set_trigger_source(self, source: str) -> None:
+        self.__trigger_source = source
+        if self.__is_trigger_configured:
+            self._stop_trigger()
+            self.set_trigger_mode(self.__is_trigger_mode)
+
+    def get_trigger_source(self) -> str:
+        return self.__trigger_source
+
+    # Delay of the software trigger of every camera from the period start, milliseconds
+    def set_trigger_phase_offsets(self, offsets: [float]) -> None:
+        self.__trigger_phase_offsets = list(offsets)
+        if self.__trigger is not None:
+            self.__trigger.set_phase_offsets([offset / 1000 for offset in offsets])
+
+    # The last part of the wait before the software trigger which is spent in the busy loop. It gives the sub
+    # millisecond accuracy at the cost of a busy CPU core, e.g. 2 ms. By default 0 - only the sleep. Milliseconds
+    def set_trigger_spin_threshold(self, value: float) -> None:
+        self.__trigger_spin_threshold = value
+        if self.__trigger is not None:
+            self.__trigger.set_spin_threshold(value / 1000)
 
     def set_trigger_mode(self, value: bool) -> None:
-        if value and self.__trigger is None:
-            self.__trigger = _SoftwareTrigger(self.__cameras_list, self.__trigger_interval)
-        if value and self.__cameras_list.IsGrabbing():
-            self.__trigger.start()
+        self.__is_trigger_mode = value
         if not value:
             self._stop_trigger()
-        self.__is_trigger_mode = value
+            return
+        # Trigger is configured on the start of the grabbing
+        if self.__is_trigger_configured or not self.__cameras_list.IsGrabbing():
+            return
+
+        for camera in self.__cameras_list:
+            camera.TriggerMode.SetValue('On')
+            camera.AcquisitionMode.SetValue('Continuous')
+            camera.TriggerSelector.SetValue('FrameStart')
+            camera.TriggerSource.SetValue(self.__trigger_source)
+            camera.TriggerActivation.SetValue('RisingEdge')
+            # camera.TriggerActivation.SetValue('FallingEdge')
+        self.__is_trigger_configured = True
+
+        if self.__trigger_source != self.TRIGGER_SOURCE_SOFTWARE:
+            return
+        triggers = [camera.TriggerSoftware.Execute for camera in self.__cameras_list]
+        phase_offsets = None
+        if self.__trigger_phase_offsets is not None:
+            phase_offsets = [offset / 1000 for offset in self.__trigger_phase_offsets]
+        self.__trigger = TriggerScheduler(triggers, self.__trigger_interval / 1000, phase_offsets,
+                                          self.__trigger_spin_threshold / 1000)
+        self.__trigger.start()
 
     def is_trigger_mode(self) -> bool:
         return self.__is_trigger_mode
 
+    # Software trigger scheduler with the actual trigger times and the lateness statistics, None if it is not running
+    def get_trigger_scheduler(self) -> TriggerScheduler or None:
+        return self.__trigger
+
+    # Actual software trigger times of the camera, nanoseconds of time.monotonic_ns() (as the Frame capture time)
+    def get_trigger_times(self, camera_index: int) -> [int]:
+        if self.__trigger is None:
+            return []
+        return self.__trigger.get_trigger_times(camera_index)
+
     # Grab strategy
     def set_grab_strategy(self, strategy: GrabStrategy):
         self.__grab_strategy = strategy.value
@@ -359,8 +437,17 @@ class PylonMultipleCamera(object):
 
     def _stop_trigger(self):
         if self.__trigger is not None:
-            self.__trigger.stop_camera()
+            self.__trigger.stop()
+            self.__trigger.join()
             self.__trigger = None
+        if not self.__is_trigger_configured:
+            return
+        for camera in self.__cameras_list:
+            try:
+                camera.TriggerMode.SetValue('Off')
+            except AccessException:
+                print("[PYLON CAMERA] camera.TriggerMode AccessException")
+        self.__is_trigger_configured = False
 
 
 class _CameraGrabThread(Thread):
@@ -377,57 +464,18 @@ class _CameraGrabThread(Thread):
                 print("[PYLON CAMERA] Grab thread error.", e)
 
 
-class _SoftwareTrigger(Thread):
-
-    def __init__(self, cameras_list, trigger_interval=0.0):
-        super().__init__()
-        self.__cameras = cameras_list
-        self.__trigger_interval = trigger_interval
-        self.__is_started = False
-
-    # param value in milliseconds
-    def set_interval(self, value: int) -> None:
-        self.__trigger_interval = value
-
-    def stop(self) -> None:
-        for camera in self.__cameras:
-            # AccessException
-            try:
-                # if camera.IsOpened():
-                #     camera.TriggerMode.SetValue('Off')
-                camera.TriggerMode.SetValue('Off')
-            except AccessException:
-                print("[PYLON CAMERA] camera.TriggerMode AccessException")
-
-        self.__is_started = False
-
-    def run(self) -> None:
-        self.__is_started = True
-
-        for camera in self.__cameras:
-            camera.TriggerMode.SetValue('On')
-            camera.AcquisitionMode.SetValue('Continuous')
-            camera.TriggerSelector.SetValue('FrameStart')
-            camera.TriggerSource.SetValue('Software')
-            camera.TriggerActivation.SetValue('RisingEdge')
-            # camera.TriggerActivation.SetValue('FallingEdge')
-
-        while self.__is_started:
-            for camera in self.__cameras:
-                try:
-                    camera.TriggerSoftware.Execute()
-                except Exception:
-                    print("[PYLON CAMERA] _SoftwareTrigger error")
-            if self.__trigger_interval > 0.0:
-                sleep(self.__trigger_interval/1000)
-
-
 class _GrabEventHandler(pylon.ImageEventHandler):
 
-    def __init__(self, frame_change_event: Event):
+    def __init__(self, frame_change_event: Event, frame_event: Event, converter: callable):
         super().__init__()
 
         self.__frame_change_event = frame_change_event
+        self.__frame_event = frame_event
+        self.__converter = converter
+
+        # Serial number -> BlockIdCounter. Sequence numbers are taken from the camera frame counters, so the frames
+        # lost before the host have gaps
+        self.__block_id_counters = dict()
 
     def OnImagesSkipped(self, camera, count_of_skipped_images):
         pass
@@ -443,8 +491,20 @@ class _GrabEventHandler(pylon.ImageEventHandler):
         # serial = camera.DeviceSerialNumber.GetValue()
 
         if grab_result.GrabSucceeded():
-            time = datetime.now()
-            self.__frame_change_event.fire(grab_result, camera.DeviceSerialNumber.GetValue(), time)
+            capture_time = time.monotonic_ns()
+            frame_time = datetime.now()
+            serial_number = camera.DeviceSerialNumber.GetValue()
+            self.__frame_change_event.fire(grab_result, serial_number, frame_time)
+
+            block_id_counter = self.__block_id_counters.get(serial_number)
+            if block_id_counter is None:
+                block_id_counter = self.__block_id_counters[serial_number] = BlockIdCounter.for_camera(camera)
+            sequence_number = block_id_counter.update(grab_result.BlockID)
+            trigger_id = block_id_counter.get_last_trigger_id()
+            # The grab result is valid only in this call, so the frame is converted here if it is needed
+            if self.__frame_event.get_handlers_count() > 0:
+                self.__frame_event.fire(Frame(self.__converter(grab_result), capture_time, sequence_number,
+                                              serial_number, Frame.PIXEL_FORMAT_RGB8, trigger_id))
         else:
             print("[PYLON CAMERA] Grab Error: ", grab_result.ErrorCode, grab_result.ErrorDescription)
 
@@ -0,0 +1,243 @@
+import struct
+import time
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+from pyrobotics.video.cameras.frame import Frame
+
+
+# Memory layout:
+#   ring header | slot 0 header | slot 0 data | slot 1 header | slot 1 data | ...
+# Ring header: magic, version, slots count, slot data size, written frames count (head)
+# Slot header: write count, ring position, capture time, frame sequence number, trigger id (-1 if None), height,
+#              width, channels, dtype, pixel format, camera id
+# The write count is odd while the writer copies the frame into the slot (seqlock), so a reader checks it before
+# and after the use of the slot array
+
+_MAGIC = b'PFSR'
+_VERSION = 2
+
+_RING_HEADER = struct.Struct('<4sHxxIQQ')
+_RING_HEADER_SIZE = 64
+_HEAD_OFFSET = struct.calcsize('<4sHxxIQ')
+
+_SLOT_HEADER = struct.Struct('<QQqqqIII4s8s32s')
+_SLOT_HEADER_SIZE = 128
+_WRITE_COUNT = struct.Struct('<Q')
+
+# Slot data is aligned for the SIMD code of the readers
+_DATA_ALIGNMENT = 64
+
+
+def _align(size: int) -> int:
+    return (size + _DATA_ALIGNMENT - 1) // _DATA_ALIGNMENT * _DATA_ALIGNMENT
+
+
+class SharedFrameRing(object):
+
+    """Кольцевой буфер кадров в разделяемой памяти. Кадры копируются в слоты без сериализации, а процессы
+    обработки читают их через SharedFrameReader как массивы numpy без копирования"""
+
+    __DEFAULT_SLOTS_COUNT = 4
+
+    # Frame size - max bytes of one frame, e.g. width * height * 3
+    def __init__(self, frame_size: int, slots_count: int = __DEFAULT_SLOTS_COUNT, name: str = None):
+        self.__slots_count = slots_count
+        self.__slot_data_size = _align(frame_size)
+        self.__slot_size = _SLOT_HEADER_SIZE + self.__slot_data_size
+
+        self.__memory = shared_memory.SharedMemory(name=name, create=True,
+                                                   size=_RING_HEADER_SIZE + self.__slot_size * slots_count)
+        self.__buffer = self.__memory.buf
+        _RING_HEADER.pack_into(self.__buffer, 0, _MAGIC, _VERSION, slots_count, self.__slot_data_size, 0)
+
+        self.__head = 0
+        self.__dropped_count = 0
+        self.__is_closed = False
+
+    # Name for SharedFrameReader in the other process
+    def get_name(self) -> str:
+        return self.__memory.name
+
+    def get_slots_count(self) -> int:
+        return self.__slots_count
+
+    def get_frame_size(self) -> int:
+        return self.__slot_data_size
+
+    # Number of written frames
+    def get_head(self) -> int:
+        return self.__head
+
+    # Frames larger than the slot
+    def get_dropped_count(self) -> int:
+        return self.__dropped_count
+
+    # Can be used as the frame handler of the camera
+    def put(self, frame: Frame) -> None:
+        if self.__is_closed:
+            return
+        array = frame.get_array()
+        if array.nbytes > self.__slot_data_size:
+            self.__dropped_count += 1
+            print("[SHARED FRAME RING] Frame", array.shape, "is larger than the slot,", self.__slot_data_size, "bytes")
+            return
+
+        position = self.__head
+        offset = _RING_HEADER_SIZE + (position % self.__slots_count) * self.__slot_size
+        write_count = _WRITE_COUNT.unpack_from(self.__buffer, offset)[0]
+        _WRITE_COUNT.pack_into(self.__buffer, offset, write_count + 1)
+
+        height = array.shape[0]
+        width = array.shape[1] if array.ndim > 1 else 1
+        channels = array.shape[2] if array.ndim > 2 else 1
+        trigger_id = frame.get_trigger_id()
+        _SLOT_HEADER.pack_into(self.__buffer, offset, write_count + 1, position, frame.get_capture_time(),
+                               frame.get_sequence_number(), -1 if trigger_id is None else trigger_id, height, width,
+                               channels, array.dtype.str.encode(),
+                               frame.get_pixel_format().encode(), str(frame.get_camera_id()).encode())
+        data = np.ndarray(array.shape, array.dtype, self.__buffer, offset + _SLOT_HEADER_SIZE)
+        np.copyto(data, array)
+
+        _WRITE_COUNT.pack_into(self.__buffer, offset, write_count + 2)
+        self.__head = position + 1
+        struct.pack_into('<Q', self.__buffer, _HEAD_OFFSET, self.__head)
+
+    # Shared memory is removed, readers keep their mappings until they close
+    def close(self) -> None:
+        if self.__is_closed:
+            return
+        self.__is_closed = True
+        self.__buffer = None
+        self.__memory.close()
+        self.__memory.unlink()
+
+    def is_closed(self) -> bool:
+        return self.__is_closed
+
+
+class SharedFrame(Frame):
+
+    """Кадр из слота SharedFrameRing. Массив указывает на разделяемую память и действителен, пока писатель не
+    перезапишет слот: после обработки is_valid() показывает, что кадр не был перезаписан"""
+
+    __slots__ = ('__reader', '__slot_offset', '__write_count', '__position')
+
+    def __init__(self, reader, slot_offset: int, write_count: int, position: int, array: np.ndarray, capture_time: int,
+                 sequence_number: int, camera_id: str, pixel_format: str, trigger_id: int = None):
+        super().__init__(array, capture_time, sequence_number, camera_id, pixel_format, trigger_id)
+        self.__reader = reader
+        self.__slot_offset = slot_offset
+        self.__write_count = write_count
+        self.__position = position
+
+    # Position in the ring, i.e. number of frames written before this frame
+    def get_position(self) -> int:
+        return self.__position
+
+    def is_valid(self) -> bool:
+        return self.__reader._get_write_count(self.__slot_offset) == self.__write_count
+
+    # Frame which is not changed by the writer
+    def copy(self) -> Frame:
+        return Frame(self.get_array().copy(), self.get_capture_time(), self.get_sequence_number(),
+                     self.get_camera_id(), self.get_pixel_format(), self.get_trigger_id())
+
+
+class SharedFrameReader(object):
+
+    """Чтение кадров SharedFrameRing в процессе обработки. Кадры не копируются"""
+
+    # Interval of the head polling while there are no new frames
+    __POLL_INTERVAL = 0.001  # seconds
+
+    def __init__(self, name: str):
+        self.__memory = _attach(name)
+        self.__buffer = self.__memory.buf
+
+        magic, version, self.__slots_count, self.__slot_data_size, _head = _RING_HEADER.unpack_from(self.__buffer, 0)
+        if magic != _MAGIC or version != _VERSION:
+            self.__memory.close()
+            raise Exception("Shared memory " + name + " is not a frame ring")
+        self.__slot_size = _SLOT_HEADER_SIZE + self.__slot_data_size
+
+        # Ring position of the next frame
+        self.__position = self.get_head()
+        self.__read_count = 0
+        self.__dropped_count = 0
+
+    def get_head(self) -> int:
+        return struct.unpack_from('<Q', self.__buffer, _HEAD_OFFSET)[0]
+
+    # Latest - the newest frame, not read frames are dropped. Otherwise frames are read in order, frames overwritten
+    # by the writer are dropped. Returns None on the timeout
+    def get(self, timeout: float = None, latest: bool = True) -> SharedFrame or None:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            head = self.get_head()
+            if head > self.__position:
+                if latest:
+                    position = head - 1
+                else:
+                    # The oldest slot is skipped, the writer can be copying the next frame into it
+                    position = max(self.__position, head - self.__slots_count + 1)
+                frame = self.__read_slot(position)
+                if frame is not None:
+                    self.__dropped_count += position - self.__position
+                    self.__position = position + 1
+                    self.__read_count += 1
+                    return frame
+                # The slot is rewritten at the moment, the next head is read
+                continue
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(self.__POLL_INTERVAL)
+
+    def get_read_count(self) -> int:
+        return self.__read_count
+
+    def get_dropped_count(self) -> int:
+        return self.__dropped_count
+
+    # All frames of the reader must be deleted before, their arrays use the memory
+    def close(self) -> None:
+        self.__buffer = None
+        try:
+            self.__memory.close()
+        except BufferError:
+            print("[SHARED FRAME READER] Memory is used by frames and will be closed on their deletion")
+
+    def _get_write_count(self, slot_offset: int) -> int:
+        return _WRITE_COUNT.unpack_from(self.__buffer, slot_offset)[0]
+
+    def __read_slot(self, position: int) -> SharedFrame or None:
+        offset = _RING_HEADER_SIZE + (position % self.__slots_count) * self.__slot_size
+        (write_count, slot_position, capture_time, sequence_number, trigger_id, height, width, channels, dtype,
+         pixel_format, camera_id) = _SLOT_HEADER.unpack_from(self.__buffer, offset)
+        if write_count % 2 == 1 or slot_position != position:
+            return None
+
+        shape = (height, width, channels) if channels > 1 else (height, width)
+        array = np.ndarray(shape, np.dtype(dtype.rstrip(b'\0').decode()), self.__buffer, offset + _SLOT_HEADER_SIZE)
+        array.flags.writeable = False
+        return SharedFrame(self, offset, write_count, position, array, capture_time, sequence_number,
+                           camera_id.rstrip(b'\0').decode(), pixel_format.rstrip(b'\0').decode(),
+                           None if trigger_id < 0 else trigger_id)
+
+
+# The reader does not own the memory. Until Python 3.13 the attached memory is registered in the resource tracker,
+# which unlinks it on the exit of the reader process (or removes the registration of the writer sharing the tracker),
+# so the registration is skipped
+def _attach(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
@@ -0,0 +1,93 @@
+from enum import Enum
+
+import numpy as np
+
+from pyrobotics.video.cameras.camera_base import Camera
+from pyrobotics.video.cameras.playback_camera import PlaybackCamera
+
+
+class SyntheticCamera(PlaybackCamera):
+
+    """Камера со сгенерированными кадрами для тестов и замеров без устройства. Номер кадра последовательности
+    записан в зеленый канал двух первых пикселей, чтобы обработчики могли проверить порядок кадров"""
+
+    class Pattern(Enum):
+        # Vertical bar moving from the left to the right
+        MOVING_BAR = "Moving bar"
+        # Horizontal gradient shifting with the frame number
+        GRADIENT = "Gradient"
+        # Random noise, the worst case for the compression
+        NOISE = "Noise"
+
+        @classmethod
+        def get_names(cls):
+            return [pattern.name for pattern in cls]
+
+        @classmethod
+        def get_by_name(cls, name):
+            return cls[name]
+
+    __DEFAULT_FRAMES_COUNT = 60
+    __BAR_WIDTH = 16
+
+    # Frames count - length of the generated sequence, it is played again when the camera is looped
+    def __init__(self, width: int = 640, height: int = 480, pattern: Pattern = Pattern.MOVING_BAR,
+                 frames_count: int = __DEFAULT_FRAMES_COUNT, fps: float = None, is_looped: bool = True,
+                 is_preloaded: bool = False, pixel_format: PlaybackCamera.PixelFormat = PlaybackCamera.PixelFormat.BGR):
+        self.__width = width
+        self.__height = height
+        self.__pattern = pattern
+        self.__frames_count = frames_count
+        self.__frame_index = 0
+        self.__random = np.random.default_rng(0)
+
+        super().__init__(Camera.Type.SYNTHETIC, fps, is_looped, is_preloaded, pixel_format)
+
+    # Source
+    def _read_source_frame(self) -> np.ndarray or None:
+        if self.__frame_index >= self.__frames_count:
+            return None
+        frame = self.__generate(self.__frame_index)
+        self.__frame_index += 1
+        return frame
+
+    def _rewind_source(self) -> None:
+        self.__frame_index = 0
+
+    def __generate(self, index: int) -> np.ndarray:
+        if self.__pattern == SyntheticCamera.Pattern.NOISE:
+            frame = self.__random.integers(0, 256, (self.__height, self.__width, 3), dtype=np.uint8)
+        elif self.__pattern == SyntheticCamera.Pattern.GRADIENT:
+            row = ((np.arange(self.__width) + index * 4) % 256).astype(np.uint8)
+            frame = np.empty((self.__height, self.__width, 3), dtype=np.uint8)
+            frame[...] = row[np.newaxis, :, np.newaxis]
+        else:
+            frame = np.zeros((self.__height, self.__width, 3), dtype=np.uint8)
+            position = index * self.__BAR_WIDTH % max(self.__width - self.__BAR_WIDTH, 1)
+            frame[:, position:position + self.__BAR_WIDTH] = 255
+
+        # The green channel is at the same place in BGR and RGB frames
+        frame[0, 0, 1] = index & 0xFF
+        frame[0, 1, 1] = (index >> 8) & 0xFF
+        return frame
+
+    # Number of the frame in the sequence written by the generator, for both pixel formats
+    @staticmethod
+    def get_frame_index(frame: np.ndarray) -> int:
+        return int(frame[0, 0, 1]) | (int(frame[0, 1, 1]) << 8)
+
+    # ###########################
+    # Parameters
+    # ###########################
+
+    def get_id(self) -> str:
+        return "synthetic-" + self.__pattern.name.lower()
+
+    def get_name(self) -> str:
+        return "Synthetic camera " + self.__pattern.value + " " + str(self.__width) + "x" + str(self.__height)
+
+    def get_resolution(self) -> (int, int):
+        return self.__width, self.__height
+
+    def get_pattern(self) -> Pattern:
+        return self.__pattern
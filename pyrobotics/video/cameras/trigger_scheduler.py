@@ -0,0 +1,147 @@
+import time
+import traceback
+from collections import deque
+from threading import Thread, Event as ThreadEvent
+
+from pyrobotics.event import Event
+
+
+class TriggerScheduler(Thread):
+
+    """Периодический вызов триггеров камер по абсолютным срокам (time.monotonic_ns) без накопления ошибки.
+    Активное ожидание перед сроком (по умолчанию выключено) дает точность меньше миллисекунды. У каждого триггера свой
+    сдвиг фазы, фактическое время каждого вызова сохраняется"""
+
+    __DEFAULT_SPIN_THRESHOLD = 0.0  # seconds
+    __DEFAULT_HISTORY_SIZE = 1000
+
+    # Triggers - callables without arguments. Interval in seconds, 0 - triggers are called without pauses.
+    # Phase offsets - seconds from the period start for every trigger. Spin threshold - the last part of the wait
+    # which is spent in the busy loop instead of the sleep. By default 0 - only the sleep, the busy loop takes a CPU
+    # core and is enabled when the sub millisecond accuracy is needed
+    def __init__(self, triggers: [callable], interval: float, phase_offsets: [float] = None,
+                 spin_threshold: float = __DEFAULT_SPIN_THRESHOLD, history_size: int = __DEFAULT_HISTORY_SIZE):
+        super().__init__(daemon=True)
+
+        self.__triggers = list(triggers)
+        self.__interval = int(interval * 1e9)
+        self.__phase_offsets = [0] * len(self.__triggers)
+        self.__spin_threshold = int(spin_threshold * 1e9)
+        if phase_offsets is not None:
+            self.set_phase_offsets(phase_offsets)
+
+        self.__stop_event = ThreadEvent()
+
+        # Trigger index -> actual call times, nanoseconds
+        self.__trigger_times = [deque(maxlen=history_size) for _ in self.__triggers]
+        self.__triggers_count = 0
+        self.__skipped_periods_count = 0
+        self.__errors_count = 0
+        # Actual time - deadline, nanoseconds
+        self.__total_lateness = 0
+        self.__max_lateness = 0
+
+        self.__trigger_event = Event('TriggerScheduler.trigger')
+
+    # Changes take effect from the next period
+    def set_interval(self, interval: float) -> None:
+        self.__interval = int(interval * 1e9)
+
+    def get_interval(self) -> float:
+        return self.__interval / 1e9
+
+    def set_phase_offsets(self, phase_offsets: [float]) -> None:
+        if len(phase_offsets) != len(self.__triggers):
+            raise Exception("Phase offsets count (" + str(len(phase_offsets)) + ") is not equal to the triggers count (" +
+                            str(len(self.__triggers)) + ")")
+        self.__phase_offsets = [int(offset * 1e9) for offset in phase_offsets]
+
+    def set_spin_threshold(self, spin_threshold: float) -> None:
+        self.__spin_threshold = int(spin_threshold * 1e9)
+
+    # Handler receives (trigger index, deadline, actual time), nanoseconds of time.monotonic_ns(). Called in the
+    # scheduler thread, so it must be short
+    def add_trigger_handler(self, handler: callable, delivery=None, weak: bool = False) -> None:
+        self.__trigger_event.handle(handler, delivery, weak)
+
+    def remove_trigger_handler(self, handler: callable) -> None:
+        self.__trigger_event.unhandle(handler)
+
+    def stop(self) -> None:
+        self.__stop_event.set()
+
+    def is_stopped(self) -> bool:
+        return self.__stop_event.is_set()
+
+    def run(self) -> None:
+        period_start = time.monotonic_ns()
+        while not self.__stop_event.is_set():
+            interval = self.__interval
+            order = sorted(range(len(self.__triggers)), key=lambda index: self.__phase_offsets[index])
+            for index in order:
+                deadline = period_start + self.__phase_offsets[index]
+                if not self.__wait_until(deadline):
+                    return
+                actual_time = time.monotonic_ns()
+                try:
+                    self.__triggers[index]()
+                except Exception:
+                    self.__errors_count += 1
+                    traceback.print_exc()
+                self.__add_trigger_time(index, deadline, actual_time)
+
+            period_start += interval
+            # Periods which are already over are skipped, the triggers are not called in a burst
+            now = time.monotonic_ns()
+            if interval > 0 and now > period_start + interval:
+                skipped = (now - period_start) // interval
+                self.__skipped_periods_count += skipped
+                period_start += skipped * interval
+            elif interval == 0:
+                period_start = now
+
+    # Returns False if the scheduler is stopped
+    def __wait_until(self, deadline: int) -> bool:
+        remaining = deadline - time.monotonic_ns()
+        if remaining > self.__spin_threshold:
+            if self.__stop_event.wait((remaining - self.__spin_threshold) / 1e9):
+                return False
+        while time.monotonic_ns() < deadline:
+            pass
+        return not self.__stop_event.is_set()
+
+    def __add_trigger_time(self, index: int, deadline: int, actual_time: int) -> None:
+        self.__trigger_times[index].append(actual_time)
+        self.__triggers_count += 1
+        lateness = actual_time - deadline
+        self.__total_lateness += lateness
+        self.__max_lateness = max(self.__max_lateness, lateness)
+        if self.__trigger_event.get_handlers_count() > 0:
+            self.__trigger_event.fire(index, deadline, actual_time)
+
+    # Statistics
+
+    # Actual call times of the trigger, nanoseconds of time.monotonic_ns(), the latest history size calls
+    def get_trigger_times(self, index: int) -> [int]:
+        return list(self.__trigger_times[index])
+
+    # Intervals between the calls of the trigger, milliseconds
+    def get_trigger_intervals(self, index: int) -> [float]:
+        times = self.get_trigger_times(index)
+        return [(times[i] - times[i - 1]) / 1e6 for i in range(1, len(times))]
+
+    def get_triggers_count(self) -> int:
+        return self.__triggers_count
+
+    def get_skipped_periods_count(self) -> int:
+        return self.__skipped_periods_count
+
+    def get_errors_count(self) -> int:
+        return self.__errors_count
+
+    # Time of the call after the deadline, milliseconds
+    def get_mean_lateness(self) -> float:
+        return self.__total_lateness / self.__triggers_count / 1e6 if self.__triggers_count > 0 else 0.0
+
+    def get_max_lateness(self) -> float:
+        return self.__max_lateness / 1e6
@@ -0,0 +1,182 @@
+import os
+import re
+import struct
+from threading import Lock
+
+try:
+    import fcntl
+except ImportError:
+    # Not POSIX system (Windows), the enumerator is not supported
+    fcntl = None
+
+
+class VideoDevice(object):
+
+    """Видеоустройство V4L2 (/dev/videoN). Индекс совпадает с индексом камеры OpenCV"""
+
+    # V4L2 capabilities
+    CAP_VIDEO_CAPTURE = 0x00000001
+    CAP_VIDEO_CAPTURE_MPLANE = 0x00001000
+    CAP_META_CAPTURE = 0x00800000
+    CAP_STREAMING = 0x04000000
+
+    def __init__(self, path: str, index: int, name: str, sysfs_index: int = 0, driver: str = None,
+                 bus_info: str = None, capabilities: int = None):
+        self.__path = path
+        self.__index = index
+        self.__name = name
+        self.__sysfs_index = sysfs_index
+        self.__driver = driver
+        self.__bus_info = bus_info
+        self.__capabilities = capabilities
+
+    def get_path(self) -> str:
+        return self.__path
+
+    def get_index(self) -> int:
+        return self.__index
+
+    def get_name(self) -> str:
+        return self.__name
+
+    def get_driver(self) -> str or None:
+        return self.__driver
+
+    # E.g. "usb-0000:00:14.0-1", the same for all nodes of one camera
+    def get_bus_info(self) -> str or None:
+        return self.__bus_info
+
+    # Device capabilities, None if the device can not be opened (no access rights)
+    def get_capabilities(self) -> int or None:
+        return self.__capabilities
+
+    def has_capability(self, capability: int) -> bool:
+        return self.__capabilities is not None and self.__capabilities & capability != 0
+
+    # Node gives video frames. Without the capabilities the first node of the device is a capture node
+    # (UVC cameras have the second node for the metadata)
+    def is_capture(self) -> bool:
+        if self.__capabilities is None:
+            return self.__sysfs_index == 0
+        return self.has_capability(self.CAP_VIDEO_CAPTURE | self.CAP_VIDEO_CAPTURE_MPLANE)
+
+    def __str__(self):
+        return self.__path + " (" + self.__name + ")"
+
+
+class VideoDeviceEnumerator(object):
+
+    """Список видеоустройств по /dev/video* и sysfs без открытия камер через OpenCV. Список кэшируется, пока
+    не изменятся узлы /dev/video* или не будет вызван invalidate()"""
+
+    # ioctl VIDIOC_QUERYCAP, struct v4l2_capability
+    __VIDIOC_QUERYCAP = 0x80685600
+    __CAPABILITY = struct.Struct('<16s32s32sIII12x')
+    __CAP_DEVICE_CAPS = 0x80000000
+
+    __NODE_NAME_PATTERN = re.compile(r'^video(\d+)$')
+
+    __instance = None
+    __instance_lock = Lock()
+
+    @classmethod
+    def get_instance(cls):
+        with cls.__instance_lock:
+            if cls.__instance is None:
+                cls.__instance = VideoDeviceEnumerator()
+            return cls.__instance
+
+    def __init__(self, dev_path: str = '/dev', sysfs_path: str = '/sys/class/video4linux'):
+        self.__dev_path = dev_path
+        self.__sysfs_path = sysfs_path
+
+        self.__lock = Lock()
+        # (node name, node change time) of the cached list
+        self.__nodes = None
+        self.__devices = []
+
+    # V4L2 is available (Linux). Otherwise devices can be found only by opening them
+    def is_supported(self) -> bool:
+        return fcntl is not None and os.path.isdir(self.__sysfs_path)
+
+    def get_devices(self) -> [VideoDevice]:
+        nodes = self.__list_nodes()
+        with self.__lock:
+            if nodes != self.__nodes:
+                self.__devices = [self.__read_device(name, index) for name, index, _time in nodes]
+                self.__nodes = nodes
+            return list(self.__devices)
+
+    def get_capture_devices(self) -> [VideoDevice]:
+        return [device for device in self.get_devices() if device.is_capture()]
+
+    # Indexes for cv2.VideoCapture
+    def get_capture_indexes(self) -> [int]:
+        return [device.get_index() for device in self.get_capture_devices()]
+
+    # The list is read again on the next call
+    def invalidate(self) -> None:
+        with self.__lock:
+            self.__nodes = None
+
+    # Sorted (node name, index, change time). udev recreates the node of the reconnected device
+    def __list_nodes(self) -> tuple:
+        nodes = []
+        try:
+            names = os.listdir(self.__dev_path)
+        except OSError:
+            return ()
+        for name in names:
+            match = self.__NODE_NAME_PATTERN.match(name)
+            if match is None:
+                continue
+            try:
+                change_time = os.stat(os.path.join(self.__dev_path, name)).st_ctime_ns
+            except OSError:
+                continue
+            nodes.append((name, int(match.group(1)), change_time))
+        nodes.sort(key=lambda node: node[1])
+        return tuple(nodes)
+
+    def __read_device(self, name: str, index: int) -> VideoDevice:
+        sysfs_device_path = os.path.join(self.__sysfs_path, name)
+        device_name = self.__read_sysfs_attribute(sysfs_device_path, 'name') or name
+        sysfs_index = self.__read_sysfs_attribute(sysfs_device_path, 'index')
+        sysfs_index = int(sysfs_index) if sysfs_index is not None and sysfs_index.isdigit() else 0
+
+        path = os.path.join(self.__dev_path, name)
+        capability = self.__query_capability(path)
+        if capability is None:
+            return VideoDevice(path, index, device_name, sysfs_index)
+        driver, _card, bus_info, _version, capabilities, device_capabilities = capability
+        if capabilities & self.__CAP_DEVICE_CAPS:
+            capabilities = device_capabilities
+        return VideoDevice(path, index, device_name, sysfs_index, self.__decode(driver), self.__decode(bus_info),
+                           capabilities)
+
+    # The open of the node does not start the streaming and takes microseconds
+    def __query_capability(self, path: str) -> tuple or None:
+        try:
+            descriptor = os.open(path, os.O_RDWR | os.O_NONBLOCK)
+        except OSError:
+            return None
+        try:
+            buffer = bytearray(self.__CAPABILITY.size)
+            fcntl.ioctl(descriptor, self.__VIDIOC_QUERYCAP, buffer)
+            return self.__CAPABILITY.unpack(buffer)
+        except OSError:
+            return None
+        finally:
+            os.close(descriptor)
+
+    @staticmethod
+    def __read_sysfs_attribute(device_path: str, attribute: str) -> str or None:
+        try:
+            with open(os.path.join(device_path, attribute)) as file:
+                return file.read().strip()
+        except OSError:
+            return None
+
+    @staticmethod
+    def __decode(value: bytes) -> str:
+        return value.rstrip(b'\0').decode(errors='replace')
@@ -0,0 +1,78 @@
+import sys
+import time
+
+from pyrobotics.video.cameras.video_device_enumerator import VideoDeviceEnumerator
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+
+# Camera startup time: V4L2 enumeration (first and cached list) against the probe of the indexes by cv2.VideoCapture,
+# which OpenCVCamera used before, and the OpenCVCamera construction.
+# Run: python -m pyrobotics.video.cameras.video_device_enumerator_benchmark [repeats count]
+
+_DEFAULT_REPEATS_COUNT = 100
+_MAX_PROBED_INDEX = 100
+
+
+# Returns milliseconds of the first enumeration (new enumerator) and of the cached one
+def measure_enumeration(repeats_count: int) -> (float, float):
+    start = time.perf_counter()
+    for _ in range(repeats_count):
+        VideoDeviceEnumerator().get_capture_devices()
+    first = (time.perf_counter() - start) / repeats_count * 1000
+
+    enumerator = VideoDeviceEnumerator()
+    enumerator.get_capture_devices()
+    start = time.perf_counter()
+    for _ in range(repeats_count):
+        enumerator.get_capture_devices()
+    cached = (time.perf_counter() - start) / repeats_count * 1000
+    return first, cached
+
+
+# Returns (milliseconds, found devices count)
+def measure_probe() -> (float, int):
+    start = time.perf_counter()
+    count = _MAX_PROBED_INDEX
+    for i in range(_MAX_PROBED_INDEX):
+        capture = cv2.VideoCapture(i)
+        if capture is None or not capture.isOpened():
+            count = i
+            break
+        capture.release()
+    return (time.perf_counter() - start) * 1000, count
+
+
+def measure_construction(repeats_count: int) -> float:
+    from pyrobotics.video.cameras.opencv_camera import OpenCVCamera
+
+    start = time.perf_counter()
+    for _ in range(repeats_count):
+        OpenCVCamera(0)
+    return (time.perf_counter() - start) / repeats_count * 1000
+
+
+def main(repeats_count: int = _DEFAULT_REPEATS_COUNT) -> None:
+    enumerator = VideoDeviceEnumerator()
+    if enumerator.is_supported():
+        for device in enumerator.get_devices():
+            print("{:14} {:32} capture: {}".format(device.get_path(), device.get_name(), device.is_capture()))
+        first, cached = measure_enumeration(repeats_count)
+        print("V4L2 enumeration:        {:10.3f} ms".format(first))
+        print("V4L2 cached enumeration: {:10.3f} ms".format(cached))
+    else:
+        print("V4L2 is not available")
+
+    if cv2 is None:
+        print("OpenCV is not installed, the probe is skipped")
+        return
+    duration, count = measure_probe()
+    print("VideoCapture probe:      {:10.3f} ms, {} devices".format(duration, count))
+    print("OpenCVCamera():          {:10.3f} ms".format(measure_construction(repeats_count)))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else _DEFAULT_REPEATS_COUNT)
@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('termios')
+
+from pyrobotics.commandProtocol.arduino.arduino_controllers import ArduinoCommand, ArduinoEncoderController, \
+    ArduinoPinsController
+from pyrobotics.commandProtocol.arduino.arduino_simulator import ArduinoSimulator
+
+
+TIMEOUT = 5.0  # seconds
+
+
+@pytest.fixture
+def simulator():
+    simulator = ArduinoSimulator()
+    simulator.start()
+    yield simulator
+    simulator.close()
+
+
+def _connect(connection, port) -> threading.Event:
+    connected = threading.Event()
+    connection.add_on_connect_event_handler(connected.set)
+    connection.connect(port)
+    return connected
+
+
+def _wait_for(condition) -> bool:
+    deadline = time.monotonic() + TIMEOUT
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_handshake(simulator):
+    connection = ArduinoPinsController(use_change_pins_time_filter=False)
+    try:
+        assert _connect(connection, simulator.get_port()).wait(TIMEOUT)
+        assert connection.is_connected()
+        assert simulator.is_authorized()
+    finally:
+        connection.close()
+
+
+def test_digital_pin_round_trip(simulator):
+    connection = ArduinoPinsController(use_change_pins_time_filter=False)
+    values = []
+    received = threading.Event()
+
+    def on_command(command):
+        if command.get_type() == ArduinoCommand.TYPE_DIGITAL_PIN_VALUE:
+            values.append(tuple(command.get_data()[:2]))
+            received.set()
+
+    connection.add_on_command_event_handler(on_command)
+    try:
+        assert _connect(connection, simulator.get_port()).wait(TIMEOUT)
+        connection.set_digital_pin(13, ArduinoPinsController.HIGH)
+        connection.get_digital_pin(13)
+        assert received.wait(TIMEOUT)
+        assert values[0] == (13, ArduinoPinsController.HIGH)
+        assert simulator.get_digital_output(13) == ArduinoPinsController.HIGH
+    finally:
+        connection.close()
+
+
+def test_encoder_angles(simulator):
+    connection = ArduinoEncoderController()
+    connected = _connect(connection, simulator.get_port())
+    try:
+        assert connected.wait(TIMEOUT)
+        connection.add_absolute_encoder_listener([2, 3, 4])
+        assert _wait_for(lambda: simulator.get_encoders_count() == 1)
+        simulator.set_encoder_speed(0, 60)
+        assert _wait_for(lambda: connection.get_angle() is not None)
+
+        first = connection.get_angle()
+        assert _wait_for(lambda: connection.get_angle() != first)
+        assert 0 <= connection.get_angle() < 360
+    finally:
+        connection.close()
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from pyrobotics.commandProtocol.arduino.pin_debouncer import PinDebouncer
+
+
+# Recorded pin change traces: (pin, value, time in milliseconds), per-pin intervals and the settled outputs
+# (pin, value, settle time) expected after the end of the trace
+
+# Button press and release on pin 2 with the contact bounce
+BUTTON_BOUNCE = {
+    'intervals': {2: 20},
+    'trace': [(2, 1, 0.0), (2, 0, 1.2), (2, 1, 2.5), (2, 0, 3.1), (2, 1, 4.0),
+              (2, 0, 150.0), (2, 1, 150.8), (2, 0, 151.5)],
+    'expected': [(2, 1, 24.0), (2, 0, 171.5)],
+}
+
+# Glitch shorter than the interval on a stable pin: the glitch is filtered, the value is delivered again
+SHORT_GLITCH = {
+    'intervals': {5: 20},
+    'trace': [(5, 1, 0.0), (5, 0, 100.0), (5, 1, 105.0)],
+    'expected': [(5, 1, 20.0), (5, 1, 125.0)],
+}
+
+# Two pins with different intervals, changes are interleaved
+INTERLEAVED_PINS = {
+    'intervals': {2: 20, 3: 10},
+    'trace': [(2, 1, 0.0), (3, 1, 1.0), (3, 0, 2.0), (2, 0, 3.0), (2, 1, 6.0), (3, 1, 30.0)],
+    'expected': [(3, 0, 12.0), (2, 1, 26.0), (3, 1, 40.0)],
+}
+
+TRACES = [BUTTON_BOUNCE, SHORT_GLITCH, INTERLEAVED_PINS]
+
+
+def _make_debouncer(intervals: dict) -> PinDebouncer:
+    debouncer = PinDebouncer()
+    for pin, interval in intervals.items():
+        debouncer.set_interval(interval, [pin])
+    return debouncer
+
+
+def _to_list(pins, values, times) -> list:
+    return [(int(pin), int(value), float(time)) for pin, value, time in zip(pins, values, times)]
+
+
+# The whole trace in one batch, then everything still pending is flushed
+def _replay_batch(debouncer: PinDebouncer, trace: list) -> list:
+    pins, values, times = zip(*trace)
+    delivered = _to_list(*debouncer.update_many(pins, values, times))
+    delivered += _to_list(*debouncer.poll(np.inf))
+    return sorted(delivered, key=lambda output: output[2])
+
+
+# Changes one by one as they come from the board, polled before every change
+def _replay_stream(debouncer: PinDebouncer, trace: list) -> list:
+    delivered = []
+    for pin, value, time in trace:
+        delivered += _to_list(*debouncer.poll(time))
+        debouncer.update(pin, value, time)
+    delivered += _to_list(*debouncer.poll(np.inf))
+    return delivered
+
+
+@pytest.mark.parametrize('trace', TRACES)
+def test_batch_replay_settles_expected_values(trace):
+    debouncer = _make_debouncer(trace['intervals'])
+    assert _replay_batch(debouncer, trace['trace']) == trace['expected']
+    assert not debouncer.has_pending()
+
+
+@pytest.mark.parametrize('trace', TRACES)
+def test_stream_replay_settles_expected_values(trace):
+    debouncer = _make_debouncer(trace['intervals'])
+    assert _replay_stream(debouncer, trace['trace']) == trace['expected']
+    assert not debouncer.has_pending()
+
+
+def test_settled_values_are_kept():
+    debouncer = _make_debouncer(INTERLEAVED_PINS['intervals'])
+    _replay_batch(debouncer, INTERLEAVED_PINS['trace'])
+    assert debouncer.get_value(2) == 1
+    assert debouncer.get_value(3) == 1
+    assert debouncer.get_value(4) == -1